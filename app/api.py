@@ -4,78 +4,292 @@
 FastAPI route definitions for generating creative plans from text, image, video, or surprise prompts.
 """
 
-from fastapi import APIRouter, HTTPException, File, UploadFile
+import asyncio
+import json
+from contextlib import AsyncExitStack
+from typing import List, Literal, Optional, Union
+from fastapi import APIRouter, Header, HTTPException, File, Form, Query, Response, UploadFile
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from app.logger import logger
-from app.models import PlanRequest, CreativePlan
-from app.planner.core import plan_from_brief
-from app.planner.llm_openai import generate_surprise_brief
-from app.planner.image_captioning import caption_image
-from app.planner.video_captioning import caption_video
+from app.jobs import job_queue, QueueFullError
+from app.metrics import registry
+from app.models import BatchPlanRequest, JobRequest, JobStatus, PlanRequest, CreativePlan
+from app.plan_store import PLAN_STORE_ENABLED, etag_matches, plan_store
+from app.uploads import SpooledUpload, UnsupportedMediaTypeError, UploadTooLargeError, spool_upload
+from app.planner.admission import OverloadedError, plan_admission
+from app.planner.deadline import Deadline
+from app.planner.trace import PlanTrace
+from app.planner.core import (
+    coalesced_plan_from_brief, coalesced_plan_variants_from_brief, plan_batch, plan_from_image, plan_from_video, stream_plan_from_brief,
+)
+from app.planner.surprise_pool import surprise_pool
+from app.planner.video_keyframes import keyframes_available
 
 router = APIRouter()
 
-@router.post("/plans", response_model=CreativePlan)
-async def generate_plan(request: PlanRequest):
+# Default number of plans generated at once by POST /plans/batch
+BATCH_CONCURRENCY = 8
+
+# Seconds clients and CDNs may reuse a stored plan before revalidating it
+PLAN_CACHE_MAX_AGE = 3600
+
+def _shed(error: OverloadedError) -> HTTPException:
+    """
+    Maps shed load (full admission queue, open circuit breaker) to 429/503 with Retry-After.
+    """
+    logger.warning("Shedding request (%d): %s", error.status_code, error)
+    return HTTPException(status_code=error.status_code, detail=str(error),
+                         headers={"Retry-After": str(error.retry_after)})
+
+@router.post("/plans", response_model=Union[CreativePlan, List[CreativePlan]])
+async def generate_plan(request: PlanRequest, response: Response):
     """
     Generate a creative video plan from an unstructured text input.
+    The X-Plan-Mode, X-Plan-Stages and X-Plan-Stages-Skipped headers report how it was produced.
+    The plan is saved and X-Plan-ID gives its ID for GET /plans/{id}.
+    With `variants: k`, returns a list of k alternative plans that share one essence,
+    brainstorm and selection pass; X-Plan-ID then lists their IDs in order.
+    Under overload the request is shed with 429/503 and Retry-After.
+    When a near-duplicate of an earlier brief is reused, X-Near-Duplicate reports
+    what was reused ("plan" or "prefix") and the estimated similarity;
+    `allow_near_duplicate: false` always generates from scratch.
     """
+    if request.variants and request.mode in ("single", "trends"):
+        raise HTTPException(status_code=400, detail="variants requires the chain planning mode")
     try:
-        plan = await plan_from_brief(request.input)
-        return plan
+        trace = PlanTrace()
+        async with plan_admission.slot():
+            if request.variants:
+                plans = await coalesced_plan_variants_from_brief(request.input, request.variants,
+                                                                 request.latency_budget_ms, trace)
+            else:
+                plans = [await coalesced_plan_from_brief(request.input, request.mode, request.latency_budget_ms,
+                                                         trace, reuse=request.allow_near_duplicate)]
+        response.headers["X-Plan-Mode"] = trace.mode
+        response.headers["X-Plan-Stages"] = ",".join(trace.stages_run)
+        response.headers["X-Plan-Stages-Skipped"] = ",".join(trace.stages_skipped)
+        if trace.near_duplicate:
+            response.headers["X-Near-Duplicate"] = f"{trace.near_duplicate};similarity={trace.similarity:.2f}"
+    except OverloadedError as e:
+        raise _shed(e)
     except Exception as e:
         logger.exception("Error generating plan from text input")
         raise HTTPException(status_code=500, detail=str(e))
 
+    traces = [trace.branch(index) for index in range(len(plans))] if request.variants else [trace]
+    await _save_plans(response, request.input, plans, traces)
+    return plans if request.variants else plans[0]
+
+async def _save_plans(response: Response, input: str, plans: List[CreativePlan], traces: List[PlanTrace]) -> None:
+    """
+    Saves finished plans and lists their IDs in X-Plan-ID. A plan that could not be saved is still returned.
+    """
+    if not PLAN_STORE_ENABLED:
+        return
+    try:
+        stored = []
+        for plan, trace in zip(plans, traces):
+            stored.append(await asyncio.to_thread(plan_store.save, input, trace.mode, plan.model_dump(),
+                                                  trace.stage_outputs, trace.timings))
+        response.headers["X-Plan-ID"] = ",".join(record.id for record in stored)
+    except Exception:
+        logger.exception("Failed to save plan")
+
+@router.post("/plans/stream")
+async def stream_plan(request: PlanRequest):
+    """
+    Generate a creative video plan as a Server-Sent Events stream.
+    Emits `stage` events as each chain stage finishes, `token` and `field` events
+    while the final JSON plan streams in, then a `plan` (or `error`) event.
+    Admission is decided before the stream starts, so shed requests get a plain 429/503.
+    """
+    # The slot is held until the stream ends; the background task frees it if the stream never starts
+    slot = AsyncExitStack()
+    try:
+        await slot.enter_async_context(plan_admission.slot())
+    except OverloadedError as e:
+        raise _shed(e)
+
+    async def event_source():
+        async with slot:
+            deadline = Deadline.from_budget_ms(request.latency_budget_ms)
+            async for event, data in stream_plan_from_brief(request.input, request.mode, deadline):
+                yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(slot.aclose),
+    )
+
+@router.post("/plans/batch")
+async def generate_plan_batch(request: BatchPlanRequest):
+    """
+    Generate plans for many briefs at once. Results stream back as NDJSON, one
+    line per brief in completion order: {"index", "status": "ok", "plan"} or
+    {"index", "status": "error", "detail"}. A failing brief does not fail the batch.
+    Each brief takes a plan admission slot; a brief that is shed gets an error line
+    with "retry_after" seconds.
+    """
+    concurrency = request.concurrency or BATCH_CONCURRENCY
+
+    async def ndjson_lines():
+        async for index, plan, error in plan_batch(request.inputs, concurrency, plan_admission):
+            if error is None:
+                line = {"index": index, "status": "ok", "plan": plan.model_dump()}
+            else:
+                line = {"index": index, "status": "error", "detail": str(error)}
+                if isinstance(error, OverloadedError):
+                    line["retry_after"] = error.retry_after
+            yield json.dumps(line, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+async def _spool(file: UploadFile, kind: str) -> SpooledUpload:
+    """
+    Streams an upload into a bounded-memory spool, mapping limit violations to 413/415.
+    The spool is released once nothing (including a coalesced generation) references it.
+    """
+    try:
+        upload = await spool_upload(file, kind)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UnsupportedMediaTypeError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    logger.info(f"Received {kind} upload: {file.filename}, size: {upload.size} bytes, type: {upload.mime_type}")
+    return upload
+
 @router.post("/plans/from-image", response_model=CreativePlan)
-async def create_plan_from_image(file: UploadFile = File(...)):
+async def create_plan_from_image(response: Response, file: UploadFile = File(...)):
     """
     Accepts an uploaded image, generates a creative caption using Gemini Vision,
     and uses that caption as input to the planner.
+    The plan is saved with the caption as its brief; X-Plan-ID gives its ID for GET /plans/{id}.
     """
+    upload = await _spool(file, "image")
+    trace = PlanTrace()
     try:
-        contents = await file.read()
-        logger.info(f"Received image upload: {file.filename}, size: {len(contents)} bytes")
-
-        caption = await caption_image(contents)
-        logger.info("Generated caption from image:\n%s", caption)
-
-        plan = await plan_from_brief(caption)
-        return plan
+        async with plan_admission.slot():
+            plan = await plan_from_image(upload, trace)
+    except OverloadedError as e:
+        raise _shed(e)
     except Exception as e:
         logger.exception("Error generating creative plan from image")
         raise HTTPException(status_code=500, detail=str(e))
+    await _save_plans(response, trace.stage_outputs.get("caption", ""), [plan], [trace])
+    return plan
 
 @router.post("/plans/from-video", response_model=CreativePlan)
-async def create_plan_from_video(file: UploadFile = File(...)):
+async def create_plan_from_video(response: Response, file: UploadFile = File(...),
+                                 caption_mode: Optional[Literal["inline", "keyframes"]] = Form(None)):
     """
     Accepts an uploaded video, generates a creative paragraph using Gemini Vision,
-    and uses that caption as input to the planner.
+    and uses that caption as input to the planner. With `caption_mode=keyframes`,
+    scene keyframes are sampled locally and captioned instead of sending the whole clip.
+    The plan is saved with the caption as its brief; X-Plan-ID gives its ID for GET /plans/{id}.
     """
+    if caption_mode == "keyframes" and not keyframes_available():
+        raise HTTPException(status_code=400, detail="Keyframe captioning requires PyAV (pip install av)")
+    upload = await _spool(file, "video")
+    trace = PlanTrace()
     try:
-        contents = await file.read()
-        logger.info(f"Received video upload: {file.filename}, size: {len(contents)} bytes")
-
-        caption = await caption_video(contents)
-        logger.info("Generated caption from video: %s", caption)
-
-        plan = await plan_from_brief(caption)
-        return plan
+        async with plan_admission.slot():
+            plan = await plan_from_video(upload, caption_mode, trace)
+    except OverloadedError as e:
+        raise _shed(e)
     except Exception as e:
         logger.exception("Error generating creative plan from video")
         raise HTTPException(status_code=500, detail=str(e))
+    await _save_plans(response, trace.stage_outputs.get("caption", ""), [plan], [trace])
+    return plan
+
+@router.get("/plans/{plan_id}")
+def get_stored_plan(plan_id: str, if_none_match: Optional[str] = Header(None)):
+    """
+    Returns a saved plan with its brief, mode and stage outputs.
+    Supports conditional GET: a matching If-None-Match gets 304 Not Modified.
+    """
+    stored = plan_store.get(plan_id) if PLAN_STORE_ENABLED else None
+    if stored is None:
+        raise HTTPException(status_code=404, detail=f"Plan {plan_id} not found")
+    headers = {"ETag": stored.etag, "Cache-Control": f"public, max-age={PLAN_CACHE_MAX_AGE}"}
+    if etag_matches(if_none_match, stored.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(stored.body, media_type="application/json", headers=headers)
+
+async def _submit_job(kind: str, upload: Optional[SpooledUpload] = None, **kwargs) -> dict:
+    try:
+        if upload is not None:
+            job_id = await job_queue.submit_upload(kind, upload, **kwargs)
+        else:
+            job_id = await job_queue.submit(kind, **kwargs)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+    finally:
+        if upload is not None:
+            upload.close()
+    return {"id": job_id, "status": "queued"}
+
+@router.post("/plans/jobs", status_code=202)
+async def create_plan_job(request: JobRequest):
+    """
+    Queue a text brief for background plan generation. Returns the job ID immediately.
+    """
+    return await _submit_job("text", input=request.input, priority=request.priority, timeout=request.timeout_seconds)
+
+@router.post("/plans/jobs/from-image", status_code=202)
+async def create_image_plan_job(file: UploadFile = File(...), priority: int = Form(0),
+                                timeout_seconds: Optional[float] = Form(None)):
+    """
+    Queue an image upload for background captioning and plan generation.
+    """
+    upload = await _spool(file, "image")
+    return await _submit_job("image", upload, priority=priority, timeout=timeout_seconds)
+
+@router.post("/plans/jobs/from-video", status_code=202)
+async def create_video_plan_job(file: UploadFile = File(...), priority: int = Form(0),
+                                timeout_seconds: Optional[float] = Form(None)):
+    """
+    Queue a video upload for background captioning and plan generation.
+    """
+    upload = await _spool(file, "video")
+    return await _submit_job("video", upload, priority=priority, timeout=timeout_seconds)
+
+@router.get("/plans/jobs/{job_id}", response_model=JobStatus)
+async def get_plan_job(job_id: str, wait: float = Query(0, ge=0, le=60, description="Seconds to long-poll for completion")):
+    """
+    Returns a job's status and, once finished, its plan or error.
+    With `wait`, blocks up to that many seconds for the job to finish.
+    """
+    job = await job_queue.wait(job_id, wait)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
 
 @router.get("/surprise")
-async def get_surprise_brief():
+async def get_surprise_brief(response: Response):
     """
-    Returns a one-sentence surprise video brief generated by OpenAI.
+    Returns a one-sentence surprise video brief generated by OpenAI, served from a
+    prefetched pool. X-Surprise-Source is `pool`, or `live` if the pool was empty.
     """
     try:
-        brief = await generate_surprise_brief()
+        brief, source = await surprise_pool.get()
+        response.headers["X-Surprise-Source"] = source
         return {"brief": brief}
     except Exception as e:
         logger.exception("Error generating surprise brief")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """
+    Prometheus text-format metrics: per-stage, per-provider and per-endpoint latency
+    histograms, LLM character/token counts, parse outcomes, and in-flight gauges.
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 @router.get("/health")
 def health_check():
     """
@@ -0,0 +1,383 @@
+# app/jobs.py
+
+"""
+Persistent background job queue for long-running plan generation.
+
+Jobs are stored in SQLite so queued and finished jobs survive a restart. A pool
+of asyncio workers inside the app claims the highest-priority queued job, runs
+it with a per-job timeout, and records the result. Clients poll or long-poll
+for completion instead of holding a request open for the whole chain.
+
+Uploaded media is not stored in the database: each image or video job owns a
+file in the store's media directory (next to the database), copied from the
+upload spool in chunks and deleted when the job finishes.
+
+Several worker processes can share one job database: claims are atomic across
+processes, and a running job holds a lease that its worker renews. Only jobs
+whose lease has lapsed (their worker died) are requeued, so a worker starting
+up never steals jobs another worker is still running.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Union
+
+from app.settings import get_settings
+from app.logger import logger
+from app.planner.core import coalesced_plan_from_brief, plan_from_image, plan_from_video
+from app.uploads import SpooledUpload
+
+# Job queue configuration (overridable through the environment)
+JOB_DB_PATH = get_settings().job_db_path
+JOB_WORKERS = get_settings().job_workers
+JOB_MAX_QUEUE_DEPTH = get_settings().job_max_queue_depth
+JOB_DEFAULT_TIMEOUT = get_settings().job_default_timeout
+JOB_LEASE_SECONDS = get_settings().job_lease_seconds
+
+# Seconds between job-state checks while long-polling (finishes in other workers aren't signalled)
+JOB_POLL_INTERVAL = 0.5
+
+# Job lifecycle states
+QUEUED, RUNNING, SUCCEEDED, FAILED, TIMED_OUT = "queued", "running", "succeeded", "failed", "timed_out"
+FINISHED_STATES = (SUCCEEDED, FAILED, TIMED_OUT)
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at its depth cap."""
+
+
+class JobStore:
+    """
+    SQLite-backed job table. All methods are short synchronous statements; JobQueue
+    runs them in a worker thread so they never block the event loop.
+    """
+
+    def __init__(self, db_path: str = JOB_DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.media_dir = os.path.join(directory, "job_media")
+        self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=10)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, input TEXT, data BLOB, "
+            "priority INTEGER NOT NULL DEFAULT 0, status TEXT NOT NULL, timeout REAL NOT NULL, "
+            "result TEXT, error TEXT, created_at REAL NOT NULL, started_at REAL, finished_at REAL, "
+            "lease_until REAL, media_path TEXT, media_sha256 TEXT)"
+        )
+        columns = {row["name"] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        # Databases created before leases and media files existed
+        for column in ("lease_until REAL", "media_path TEXT", "media_sha256 TEXT"):
+            if column.split()[0] not in columns:
+                self._db.execute(f"ALTER TABLE jobs ADD COLUMN {column}")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, created_at)")
+        self._db.commit()
+
+    def enqueue(self, kind: str, input: Optional[str] = None, media_path: Optional[str] = None,
+                media_sha256: Optional[str] = None, priority: int = 0, timeout: float = JOB_DEFAULT_TIMEOUT,
+                max_depth: int = JOB_MAX_QUEUE_DEPTH) -> str:
+        """
+        Adds a queued job and returns its ID. Raises QueueFullError at the depth cap.
+        """
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            (depth,) = self._db.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()
+            if depth >= max_depth:
+                raise QueueFullError(f"Job queue is full ({depth} queued)")
+            self._db.execute(
+                "INSERT INTO jobs (id, kind, input, media_path, media_sha256, priority, status, timeout, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, input, media_path, media_sha256, priority, QUEUED, timeout, time.time()),
+            )
+            self._db.commit()
+        return job_id
+
+    def save_media(self, upload: SpooledUpload) -> str:
+        """
+        Copies an upload into a new file in the media directory and returns its path. Blocking.
+        """
+        os.makedirs(self.media_dir, exist_ok=True)
+        path = os.path.join(self.media_dir, uuid.uuid4().hex)
+        try:
+            upload.save(path)
+        except BaseException:
+            _remove(path)
+            raise
+        return path
+
+    def claim_next(self, lease_seconds: float = JOB_LEASE_SECONDS) -> Optional[sqlite3.Row]:
+        """
+        Atomically moves the highest-priority, oldest queued job to running and returns it.
+        The claim is leased for `lease_seconds`; see `renew`.
+        """
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock up front, so two processes can't claim the same job
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT * FROM jobs WHERE status = ? ORDER BY priority DESC, created_at LIMIT 1", (QUEUED,)
+                ).fetchone()
+                if row is not None:
+                    now = time.time()
+                    self._db.execute(
+                        "UPDATE jobs SET status = ?, started_at = ?, lease_until = ? WHERE id = ?",
+                        (RUNNING, now, now + lease_seconds, row["id"]),
+                    )
+                self._db.commit()
+            except BaseException:
+                self._db.rollback()
+                raise
+            return row
+
+    def renew(self, job_id: str, lease_seconds: float = JOB_LEASE_SECONDS) -> None:
+        """
+        Extends a running job's lease.
+        """
+        with self._lock:
+            self._db.execute("UPDATE jobs SET lease_until = ? WHERE id = ? AND status = ?",
+                             (time.time() + lease_seconds, job_id, RUNNING))
+            self._db.commit()
+
+    def finish(self, job_id: str, status: str, result: Optional[dict] = None, error: Optional[str] = None) -> None:
+        """
+        Records a job's final state; uploaded media is deleted once the job is done.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT media_path FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            self._db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, data = NULL, media_path = NULL "
+                "WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id),
+            )
+            self._db.commit()
+        if row is not None and row["media_path"]:
+            _remove(row["media_path"])
+
+    def requeue_interrupted(self, now: Optional[float] = None) -> int:
+        """
+        Returns running jobs whose lease has lapsed (their process died) to the queue. Returns the count.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = ?, started_at = NULL, lease_until = NULL "
+                "WHERE status = ? AND (lease_until IS NULL OR lease_until < ?)", (QUEUED, RUNNING, now)
+            )
+            self._db.commit()
+            return cursor.rowcount
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """
+        Returns a job's public fields, or None if it does not exist.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, kind, priority, status, result, error, created_at, started_at, finished_at "
+                "FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def depth(self) -> int:
+        with self._lock:
+            (depth,) = self._db.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()
+        return depth
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+# Maps a job kind to the coroutine that runs it
+JobHandler = Callable[[sqlite3.Row], Awaitable[dict]]
+
+def _job_media(job) -> Union[bytes, SpooledUpload]:
+    """
+    The job's uploaded media: its media file, or the BLOB of a job queued before media files existed.
+    """
+    if job["media_path"] is None:
+        return job["data"]
+    return SpooledUpload.open(job["media_path"], job["media_sha256"])
+
+async def _run_text_job(job) -> dict:
+    return (await coalesced_plan_from_brief(job["input"])).model_dump()
+
+async def _run_image_job(job) -> dict:
+    media = await asyncio.to_thread(_job_media, job)
+    try:
+        return (await plan_from_image(media)).model_dump()
+    finally:
+        if isinstance(media, SpooledUpload):
+            media.close()
+
+async def _run_video_job(job) -> dict:
+    media = await asyncio.to_thread(_job_media, job)
+    try:
+        return (await plan_from_video(media)).model_dump()
+    finally:
+        if isinstance(media, SpooledUpload):
+            media.close()
+
+JOB_HANDLERS: Dict[str, JobHandler] = {
+    "text": _run_text_job,
+    "image": _run_image_job,
+    "video": _run_video_job,
+}
+
+
+class JobQueue:
+    """
+    Runs queued jobs on a fixed pool of asyncio workers.
+    """
+
+    def __init__(self, store: Optional[JobStore] = None, workers: int = JOB_WORKERS,
+                 max_depth: int = JOB_MAX_QUEUE_DEPTH):
+        self._store = store
+        self.worker_count = workers
+        self.max_depth = max_depth
+        self._workers: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._finished: Dict[str, Set[asyncio.Event]] = {}  # job ID -> events of its long-polls
+        self._last_sweep = 0.0
+
+    @property
+    def store(self) -> JobStore:
+        # Opened on first use so importing the app does not touch the filesystem
+        if self._store is None:
+            self._store = JobStore()
+        return self._store
+
+    async def submit(self, kind: str, input: Optional[str] = None, priority: int = 0, timeout: Optional[float] = None,
+                     media_path: Optional[str] = None, media_sha256: Optional[str] = None) -> str:
+        """
+        Queues a job and wakes a worker. Raises QueueFullError at the depth cap.
+        """
+        if kind not in JOB_HANDLERS:
+            raise ValueError(f"Unknown job kind: {kind!r}")
+        job_id = await asyncio.to_thread(self.store.enqueue, kind, input, media_path, media_sha256, priority,
+                                         timeout or JOB_DEFAULT_TIMEOUT, self.max_depth)
+        logger.info("Queued %s job %s (priority %d)", kind, job_id, priority)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job_id
+
+    async def submit_upload(self, kind: str, upload: SpooledUpload, priority: int = 0,
+                            timeout: Optional[float] = None) -> str:
+        """
+        Queues an image or video job whose upload is copied, in chunks, to a file the job owns.
+        """
+        path = await asyncio.to_thread(self.store.save_media, upload)
+        try:
+            return await self.submit(kind, priority=priority, timeout=timeout, media_path=path, media_sha256=upload.sha256)
+        except BaseException:
+            _remove(path)
+            raise
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[dict]:
+        """
+        Long-polls a job: returns as soon as it finishes or after `timeout` seconds.
+        Jobs finished by this process wake the poll at once; others are noticed by polling the store.
+        """
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if job is None or job["status"] in FINISHED_STATES or timeout <= 0:
+            return job
+        event = asyncio.Event()
+        waiters = self._finished.setdefault(job_id, set())
+        waiters.add(event)
+        deadline = time.monotonic() + timeout
+        try:
+            while (remaining := deadline - time.monotonic()) > 0:
+                try:
+                    await asyncio.wait_for(event.wait(), min(remaining, JOB_POLL_INTERVAL))
+                except asyncio.TimeoutError:
+                    pass
+                job = await asyncio.to_thread(self.store.get, job_id)
+                if job["status"] in FINISHED_STATES:
+                    break
+        finally:
+            # Jobs finished by another process never pop their waiters, so each poll removes its own
+            waiters.discard(event)
+            if not waiters and self._finished.get(job_id) is waiters:
+                del self._finished[job_id]
+        return job
+
+    async def start(self) -> None:
+        """
+        Requeues jobs interrupted by a restart and starts the worker pool.
+        """
+        requeued = await asyncio.to_thread(self.store.requeue_interrupted)
+        if requeued:
+            logger.info("Requeued %d interrupted job(s)", requeued)
+        self._wakeup = asyncio.Event()
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(self.worker_count)]
+
+    async def stop(self) -> None:
+        """
+        Cancels the workers; running jobs are requeued on the next start.
+        """
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            self._wakeup.clear()
+            if time.monotonic() - self._last_sweep > JOB_LEASE_SECONDS:
+                # Pick up jobs orphaned by a worker process that died
+                self._last_sweep = time.monotonic()
+                requeued = await asyncio.to_thread(self.store.requeue_interrupted)
+                if requeued:
+                    logger.info("Requeued %d job(s) with lapsed leases", requeued)
+            job = await asyncio.to_thread(self.store.claim_next)
+            if job is None:
+                try:
+                    # Also re-check periodically in case another process queued work
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job, index)
+
+    async def _run(self, job, worker_index: int) -> None:
+        job_id = job["id"]
+        logger.info("Worker %d started %s job %s", worker_index, job["kind"], job_id)
+        renewal = asyncio.create_task(self._renew_lease(job_id))
+        try:
+            result = await asyncio.wait_for(JOB_HANDLERS[job["kind"]](job), timeout=job["timeout"])
+            await asyncio.to_thread(self.store.finish, job_id, SUCCEEDED, result=result)
+        except asyncio.TimeoutError:
+            logger.error("Job %s timed out after %.0fs", job_id, job["timeout"])
+            error = f"Timed out after {job['timeout']:.0f}s"
+            await asyncio.to_thread(self.store.finish, job_id, TIMED_OUT, error=error)
+        except Exception as e:
+            logger.exception("Job %s failed", job_id)
+            await asyncio.to_thread(self.store.finish, job_id, FAILED, error=str(e))
+        finally:
+            renewal.cancel()
+            for event in self._finished.pop(job_id, ()):
+                event.set()
+
+    async def _renew_lease(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+            await asyncio.to_thread(self.store.renew, job_id)
+
+
+# Shared process-wide job queue, started from the app lifespan
+job_queue = JobQueue()
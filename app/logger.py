@@ -1,13 +1,164 @@
 # app/logger.py
 
+"""
+Logging setup for the Creative Agent.
+
+Records are handed to a bounded in-memory queue and written to stderr by a
+background QueueListener thread, so a slow terminal or log collector never stalls
+the event loop. When the queue is full, records are dropped and counted rather
+than blocking. Output is one JSON object per line (LOG_FORMAT=json, the default)
+or the classic text format (LOG_FORMAT=text). Either way every record carries the
+request's trace ID and the current planning stage.
+
+LLM prompts and responses are large, so they go through `log_payload`. Only a
+LOG_PAYLOAD_SAMPLE_RATE fraction of requests (and errors) log full bodies; all
+others log a short preview. Any other string argument longer than LOG_MAX_ARG_CHARS
+is truncated before it is formatted.
+"""
+
+import atexit
+import contextvars
+import copy
+import json
 import logging
+import queue
+import random
+import zlib
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from app.settings import get_settings
+
+LOG_FORMAT = get_settings().log_format
+LOG_QUEUE_SIZE = get_settings().log_queue_size
+LOG_MAX_ARG_CHARS = get_settings().log_max_arg_chars
+LOG_PAYLOAD_PREVIEW_CHARS = get_settings().log_payload_preview_chars
+LOG_PAYLOAD_SAMPLE_RATE = get_settings().log_payload_sample_rate
+
+# Trace ID of the HTTP request being served, and the planning stage currently running.
+# Both are context-local, so they follow a request into the asyncio tasks it spawns.
+trace_id_var: contextvars.ContextVar[str] = contextvars.ContextVar("trace_id", default="-")
+stage_var: contextvars.ContextVar[str] = contextvars.ContextVar("stage", default="-")
+
+
+def truncate(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}… [truncated, {len(text)} chars]"
+
+
+class TraceContextFilter(logging.Filter):
+    """
+    Adds the current trace ID and stage to every log record, and caps oversized
+    string arguments unless the record is a sampled full payload.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = trace_id_var.get()
+        record.stage = stage_var.get()
+        if record.args and not getattr(record, "full_payload", False):
+            if isinstance(record.args, tuple):
+                record.args = tuple(
+                    truncate(arg, LOG_MAX_ARG_CHARS) if isinstance(arg, str) else arg for arg in record.args
+                )
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Enqueues records without ever blocking; counts records dropped when the queue is full.
+    Only the message is rendered on the calling thread; JSON encoding and I/O happen on the listener.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    One JSON object per record: timestamp, level, message, trace ID, stage and payload size.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "trace_id": getattr(record, "trace_id", "-"),
+            "stage": getattr(record, "stage", "-"),
+            "msg": record.getMessage(),
+        }
+        if hasattr(record, "payload_chars"):
+            entry["payload_chars"] = record.payload_chars
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def payload_sampled() -> bool:
+    """
+    Whether the current request logs full payloads. Decided per trace ID, so a sampled
+    request logs every stage's payload; records outside a request are sampled individually.
+    """
+    if LOG_PAYLOAD_SAMPLE_RATE >= 1:
+        return True
+    if LOG_PAYLOAD_SAMPLE_RATE <= 0:
+        return False
+    trace_id = trace_id_var.get()
+    if trace_id == "-":
+        return random.random() < LOG_PAYLOAD_SAMPLE_RATE
+    return zlib.crc32(trace_id.encode("utf-8")) % 10_000 < LOG_PAYLOAD_SAMPLE_RATE * 10_000
+
+
+def log_payload(message: str, payload: str, level: int = logging.INFO, full: bool = False) -> None:
+    """
+    Logs an LLM prompt or response: the full body for sampled requests (or with
+    `full=True`, e.g. on errors), otherwise a short preview.
+    """
+    if not logger.isEnabledFor(level):
+        return
+    full = full or payload_sampled()
+    body = payload if full else truncate(payload, LOG_PAYLOAD_PREVIEW_CHARS)
+    logger.log(level, "%s:\n%s", message, body, extra={"payload_chars": len(payload), "full_payload": full})
+
 
 # Create a module-level logger for the Creative Agent application
 logger = logging.getLogger("creative_agent")
 logger.setLevel(logging.INFO)
+logger.addFilter(TraceContextFilter())
 
 # Prevent duplicate handlers in case of reload (e.g., during development)
-if not logger.hasHandlers():
+if not logger.handlers:
     stream_handler = logging.StreamHandler()
-    stream_handler.setFormatter(logging.Formatter("[%(asctime)s] %(levelname)s - %(message)s"))
-    logger.addHandler(stream_handler)
+    if LOG_FORMAT == "json":
+        stream_handler.setFormatter(JSONFormatter())
+    else:
+        stream_handler.setFormatter(
+            logging.Formatter("[%(asctime)s] %(levelname)s [%(trace_id)s %(stage)s] - %(message)s")
+        )
+    queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    logger.addHandler(queue_handler)
+
+    listener = QueueListener(queue_handler.queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+
+def dropped_log_records() -> int:
+    return sum(getattr(handler, "dropped", 0) for handler in logger.handlers)
@@ -5,29 +5,52 @@ Entrypoint for the Creative Agent FastAPI app.
 Mounts API routes, UI routes, and static assets.
 """
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse
 
 from app.logger import logger
 from app.api import router as api_router
 from app.ui import router as ui_router
-
-import json
-
-# Print JSON is readable format
-class PrettyJSONResponse(JSONResponse):
-    def render(self, content: any) -> bytes:
-        return json.dumps(content, indent=2).encode("utf-8")
+from app.jobs import job_queue
+from app.planner.cassette import install_cassette, save_recording
+from app.planner.providers import warm_providers
+from app.planner.surprise_pool import surprise_pool
+from app.metrics import RequestMetricsMiddleware, register_collectors
+from app.serialization import CompactJSONResponse, JSONNegotiationMiddleware
+from app.settings import get_settings
+
+# Start and stop background job workers and the surprise-brief prefetcher with the app.
+# Providers listed in WARM_PROVIDERS connect before the first request instead of during it.
+# With CASSETTE_MODE=record|replay, provider calls are recorded to or replayed from a cassette.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = get_settings()
+    install_cassette()
+    await warm_providers(settings.warm_providers, settings.warm_timeout)
+    await job_queue.start()
+    await surprise_pool.start()
+    yield
+    await surprise_pool.stop()
+    await job_queue.stop()
+    save_recording()
 
 # Create FastAPI app
 app = FastAPI(
     title="Creative Agent",
     description="Transforms creative briefs into structured video plans.",
     version="0.1.0",
-    default_response_class=PrettyJSONResponse
+    default_response_class=CompactJSONResponse,
+    lifespan=lifespan
 )
 
+# Pretty-print (?pretty=1) and gzip JSON responses on request
+app.add_middleware(JSONNegotiationMiddleware)
+
+# Per-route latency and in-flight metrics, and a trace ID for every request's log lines
+app.add_middleware(RequestMetricsMiddleware)
+register_collectors()
+
 # Mount static assets (CSS, icons, etc.)
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
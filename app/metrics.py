@@ -0,0 +1,343 @@
+# app/metrics.py
+
+"""
+Minimal Prometheus-compatible metrics for the Creative Agent.
+
+A small in-process registry of counters, gauges and histograms rendered in the
+Prometheus text exposition format at GET /metrics. Existing component counters
+(LLM cache, request coalescing, hedging, rate limiters, caption cache, JSON
+repair) are exported through collectors that read them at scrape time.
+
+`RequestMetricsMiddleware` times every HTTP request per route, tracks in-flight
+requests, and assigns each request a trace ID (from X-Request-ID or freshly
+generated) that is attached to every log line and returned as X-Trace-ID.
+"""
+
+import math
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from starlette.routing import Match
+
+from app.logger import dropped_log_records, stage_var, trace_id_var
+from app.planner.deadline import base_stage
+from app.planner.rate_limit import estimate_tokens
+
+# Latency buckets in seconds, sized for multi-second LLM calls
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+LabelValues = Tuple[str, ...]
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        f'{key}="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for key, value in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """
+    Base class: a named metric family with fixed label names.
+    """
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> Iterable[Sample]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._series.setdefault(key, ([0] * len(self.buckets), [0.0]))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            total[0] += value
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return series[0][-1] if series else 0
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(counts), total[0]) for key, (counts, total) in self._series.items()]
+        for key, counts, total in items:
+            labels = dict(zip(self.labelnames, key))
+            for bound, count in zip(self.buckets, counts):
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, count
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, counts[-1]
+
+
+class CollectedMetric(Metric):
+    """
+    A metric whose samples are produced at scrape time by a callback returning
+    {label values tuple: value}. Used to export counters kept by other components.
+    """
+
+    def __init__(self, name, documentation, labelnames, collect: Callable[[], Dict[LabelValues, float]],
+                 kind: str = "gauge"):
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self._collect = collect
+
+    def samples(self):
+        for key, value in self._collect().items():
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def collector(self, name: str, documentation: str, labelnames: Sequence[str],
+                  collect: Callable[[], Dict[LabelValues, float]], kind: str = "gauge") -> CollectedMetric:
+        return self.register(CollectedMetric(name, documentation, labelnames, collect, kind))
+
+    def render(self) -> str:
+        """
+        Renders every metric in the Prometheus text exposition format (version 0.0.4).
+        """
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                samples = list(metric.samples())
+            except Exception:
+                continue  # a failing collector must not break the scrape
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in samples:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# ================================
+# Planner and LLM metrics
+# ================================
+
+stage_seconds = registry.histogram(
+    "creative_agent_stage_seconds", "Latency of each planning stage, including final JSON drafting", ["stage"])
+llm_request_seconds = registry.histogram(
+    "creative_agent_llm_request_seconds", "Latency of LLM provider calls", ["provider", "model", "stage"])
+llm_prompt_chars = registry.counter(
+    "creative_agent_llm_prompt_chars_total", "Characters sent to LLM providers", ["provider", "model", "stage"])
+llm_prompt_reused_chars = registry.counter(
+    "creative_agent_llm_prompt_reused_chars_total",
+    "Prompt characters repeating the prefix of an earlier prompt of the same plan (prefix-cacheable)",
+    ["provider", "model", "stage"])
+llm_response_chars = registry.counter(
+    "creative_agent_llm_response_chars_total", "Characters received from LLM providers", ["provider", "model", "stage"])
+llm_prompt_tokens = registry.counter(
+    "creative_agent_llm_prompt_tokens_total", "Estimated tokens sent to LLM providers", ["provider", "model", "stage"])
+llm_response_tokens = registry.counter(
+    "creative_agent_llm_response_tokens_total", "Estimated tokens received from LLM providers",
+    ["provider", "model", "stage"])
+llm_errors = registry.counter(
+    "creative_agent_llm_errors_total", "Failed LLM provider calls", ["provider", "model"])
+
+
+def record_llm_call(provider: str, model: str, prompt_text: str, response_text: str, seconds: float) -> None:
+    """
+    Records latency and character/estimated-token counts for one LLM call,
+    labelled with the planning stage it belongs to.
+    """
+    labels = {"provider": provider, "model": model, "stage": stage_label()}
+    llm_request_seconds.observe(seconds, **labels)
+    llm_prompt_chars.inc(len(prompt_text), **labels)
+    llm_response_chars.inc(len(response_text), **labels)
+    llm_prompt_tokens.inc(estimate_tokens(prompt_text), **labels)
+    llm_response_tokens.inc(estimate_tokens(response_text), **labels)
+
+
+def stage_label() -> str:
+    # Fan-out nodes (idea_0, idea_1, ...) share one label
+    return base_stage(stage_var.get())
+
+
+caption_seconds = registry.histogram(
+    "creative_agent_caption_seconds", "Latency of media captioning", ["kind"])
+
+# ================================
+# HTTP metrics
+# ================================
+
+http_request_seconds = registry.histogram(
+    "creative_agent_http_request_seconds", "HTTP request latency until the response completes",
+    ["method", "route", "status"])
+http_in_flight = registry.gauge(
+    "creative_agent_http_requests_in_flight", "HTTP requests currently being served", ["route"])
+
+
+def route_label(scope: dict) -> str:
+    """
+    The route template (e.g. /plans/jobs/{job_id}) matching a request, to keep label cardinality bounded.
+    """
+    app = scope.get("app")
+    for route in getattr(getattr(app, "router", None), "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", "unmatched")
+    return "unmatched"
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware recording per-route latency and in-flight gauges, and binding a
+    trace ID to the request context for log correlation.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        trace_id = headers.get(b"x-request-id", b"").decode("latin-1")[:64] or uuid.uuid4().hex[:16]
+        token = trace_id_var.set(trace_id)
+        status = {"code": 500}
+        route = route_label(scope)
+        http_in_flight.inc(route=route)
+
+        async def send_with_trace(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-trace-id", trace_id.encode("latin-1"))]
+            await send(message)
+
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_trace)
+        finally:
+            http_in_flight.dec(route=route)
+            http_request_seconds.observe(time.perf_counter() - t0, method=scope["method"],
+                                         route=route, status=str(status["code"]))
+            trace_id_var.reset(token)
+
+
+def register_collectors() -> None:
+    """
+    Exports counters kept by other components. Imported lazily to avoid import cycles.
+    """
+    from app.planner.admission import plan_admission
+    from app.planner.circuit_breaker import breaker_states
+    from app.planner.core import plan_flight
+    from app.planner.hedging import hedge_stats
+    from app.planner.image_preprocess import caption_cache
+    from app.planner.json_repair import repair_stats
+    from app.planner.llm_cache import llm_cache
+    from app.planner.rate_limit import rate_limiters
+    from app.planner.surprise_pool import surprise_pool
+    from app.planner.brief_index import brief_index
+
+    registry.collector("creative_agent_llm_cache", "LLM response cache counters", ["stat"],
+                       lambda: {(k,): v for k, v in llm_cache.stats().items()})
+    registry.collector("creative_agent_plan_coalescing", "Request coalescing counters", ["stat"],
+                       lambda: {(k,): v for k, v in plan_flight.stats().items()})
+    registry.collector("creative_agent_hedge", "Hedged request counters", ["stat"],
+                       lambda: {(k,): v for k, v in hedge_stats.as_dict().items()})
+    registry.collector("creative_agent_caption_cache", "Perceptual caption cache counters", ["stat"],
+                       lambda: {(k,): v for k, v in caption_cache.stats().items()})
+    registry.collector("creative_agent_plan_parse_total", "Plan JSON parse outcomes (clean, repaired, failed)",
+                       ["outcome"], lambda: {(k,): v for k, v in repair_stats.items()}, kind="counter")
+    registry.collector("creative_agent_rate_limiter", "Provider rate limiter counters", ["provider", "stat"],
+                       lambda: {(provider, k): v for provider, limiter in rate_limiters().items()
+                                for k, v in limiter.stats().items()})
+    registry.collector("creative_agent_surprise_pool", "Surprise brief pool counters", ["stat"],
+                       lambda: {(k,): v for k, v in surprise_pool.stats().items()})
+    registry.collector("creative_agent_admission", "Plan admission control (slots, queue and shed requests)", ["stat"],
+                       lambda: {(k,): v for k, v in plan_admission.stats().items()})
+    registry.collector("creative_agent_circuit_state", "Circuit breaker state per provider/model (1 = current state)",
+                       ["breaker", "state"],
+                       lambda: {(key, breaker.state): 1 for key, breaker in breaker_states().items()})
+    registry.collector("creative_agent_circuit_opened_total", "Times each circuit breaker has opened", ["breaker"],
+                       lambda: {(key,): breaker.opened for key, breaker in breaker_states().items()}, kind="counter")
+    registry.collector("creative_agent_brief_index", "Near-duplicate brief index counters", ["stat"],
+                       lambda: {(k,): v for k, v in brief_index.stats().items()})
+    registry.collector("creative_agent_log_records_dropped_total", "Log records dropped because the log queue was full",
+                       [], lambda: {(): dropped_log_records()}, kind="counter")
@@ -1,11 +1,34 @@
 # app/models.py
 
-from typing import List, Optional
+from typing import List, Literal, Optional
 from pydantic import BaseModel, Field
 
 # Request schema: user provides an unstructured creative brief
 class PlanRequest(BaseModel):
     input: str = Field(..., description="Unstructured creative brief")
+    mode: Optional[Literal["chain", "single", "trends", "auto"]] = Field(
+        None, description="Planning strategy; defaults to the server's configured mode"
+    )
+    latency_budget_ms: Optional[int] = Field(
+        None, ge=1000, description="Target end-to-end latency; refinement stages are skipped to meet it"
+    )
+    variants: Optional[int] = Field(
+        None, ge=1, le=5, description="Return this many alternative plans (chain mode) as a list"
+    )
+    allow_near_duplicate: bool = Field(
+        True, description="Allow serving or building on the plan of a near-identical earlier brief"
+    )
+
+# Request schema: many briefs planned in one call, streamed back as NDJSON
+class BatchPlanRequest(BaseModel):
+    inputs: List[str] = Field(..., min_length=1, max_length=1000, description="Unstructured creative briefs")
+    concurrency: Optional[int] = Field(None, ge=1, le=32, description="Maximum plans generated at once")
+
+# Request schema: queue a brief for background plan generation
+class JobRequest(BaseModel):
+    input: str = Field(..., description="Unstructured creative brief")
+    priority: int = Field(0, ge=-10, le=10, description="Higher-priority jobs run first")
+    timeout_seconds: Optional[float] = Field(None, gt=0, le=3600, description="Per-job timeout")
 
 # Response schema: structured video plan returned by the agent
 class CreativePlan(BaseModel):
@@ -28,3 +51,15 @@ class CreativePlan(BaseModel):
     dialogue_ideas: Optional[List[str]] = Field(None, description="Notable lines or spoken ideas")
     soundtrack_style: Optional[str] = Field(None, description="Musical tone, genre, or reference")
     foley_fx: Optional[List[str]] = Field(None, description="Sound effects to enhance immersion")
+
+# Response schema: state of a background plan generation job
+class JobStatus(BaseModel):
+    id: str
+    kind: str = Field(..., description="Job input type: text, image, or video")
+    priority: int
+    status: str = Field(..., description="queued, running, succeeded, failed, or timed_out")
+    result: Optional[CreativePlan] = None
+    error: Optional[str] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
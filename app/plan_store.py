@@ -0,0 +1,139 @@
+# app/plan_store.py
+
+"""
+Persistent store of generated plans.
+
+Each finished plan is saved to SQLite together with the brief, planning mode,
+chain stage outputs and timings, under an ID derived from that content, so the
+same plan always gets the same ID. The record is serialized once when it is
+saved; reads return the stored bytes and their ETag without re-encoding, so
+`GET /plans/{id}` and conditional revalidation stay cheap.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from app.settings import get_settings
+from app.serialization import dumps
+
+# Plan store configuration (overridable through the environment)
+PLAN_STORE_ENABLED = get_settings().plan_store_enabled
+PLAN_STORE_PATH = get_settings().plan_store_path
+
+
+@dataclass
+class StoredPlan:
+    id: str
+    etag: str
+    body: bytes  # compact JSON record: id, input, mode, plan, stage_outputs, timings, created_at
+
+
+def plan_id(input: str, mode: str, plan: dict) -> str:
+    """
+    Stable content-derived ID: the same brief, mode and plan always map to the same ID.
+    """
+    canonical = dumps({"input": input, "mode": mode, "plan": plan})
+    return hashlib.sha256(canonical).hexdigest()[:24]
+
+
+def etag_for(body: bytes) -> str:
+    # Weak, since pretty-printed and gzipped representations are equivalent
+    return f'W/"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+class PlanStore:
+    """
+    SQLite-backed plan table. All methods are short synchronous statements.
+    """
+
+    def __init__(self, db_path: str = PLAN_STORE_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS plans ("
+            "id TEXT PRIMARY KEY, etag TEXT NOT NULL, body BLOB NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def save(self, input: str, mode: str, plan: dict, stage_outputs: Optional[Dict[str, str]] = None,
+             timings: Optional[Dict[str, float]] = None) -> StoredPlan:
+        """
+        Stores a plan and returns it. Saving identical content again keeps the first record.
+        """
+        record_id = plan_id(input, mode, plan)
+        now = time.time()
+        body = dumps({
+            "id": record_id,
+            "input": input,
+            "mode": mode,
+            "plan": plan,
+            "stage_outputs": stage_outputs or {},
+            "timings": timings or {},
+            "created_at": now,
+        })
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO plans (id, etag, body, created_at) VALUES (?, ?, ?, ?)",
+                (record_id, etag_for(body), body, now),
+            )
+            self._db.commit()
+        return self.get(record_id)
+
+    def get(self, record_id: str) -> Optional[StoredPlan]:
+        """
+        Returns a stored plan, or None if it does not exist.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT id, etag, body FROM plans WHERE id = ?", (record_id,)).fetchone()
+        if row is None:
+            return None
+        return StoredPlan(id=row[0], etag=row[1], body=bytes(row[2]))
+
+    def count(self) -> int:
+        with self._lock:
+            (count,) = self._db.execute("SELECT COUNT(*) FROM plans").fetchone()
+        return count
+
+
+class LazyPlanStore:
+    """
+    Opens the shared PlanStore on first use so importing the app does not touch the filesystem.
+    """
+
+    def __init__(self):
+        self._store: Optional[PlanStore] = None
+
+    @property
+    def store(self) -> PlanStore:
+        if self._store is None:
+            self._store = PlanStore()
+        return self._store
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+
+# Shared process-wide plan store
+plan_store = LazyPlanStore()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Weak comparison of an If-None-Match header against an ETag (RFC 9110 §13.1.2).
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
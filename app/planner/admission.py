@@ -0,0 +1,138 @@
+# app/planner/admission.py
+
+"""
+Admission control and load shedding for plan generation.
+
+At most ADMISSION_MAX_CONCURRENT plans are generated at once; further requests
+wait in a bounded FIFO queue. When the queue is full a request is rejected at
+once (429), and a request that waits longer than ADMISSION_QUEUE_TIMEOUT gives
+up (503). Either way the client gets a Retry-After estimated from how long
+recent plans held their slot, instead of a slow generic error later.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque
+
+from app.settings import get_settings
+
+# Admission configuration (overridable through the environment)
+ADMISSION_MAX_CONCURRENT = get_settings().admission_max_concurrent
+ADMISSION_MAX_QUEUE = get_settings().admission_max_queue
+ADMISSION_QUEUE_TIMEOUT = get_settings().admission_queue_timeout
+
+# Bounds of the Retry-After hint, in seconds
+RETRY_AFTER_MIN = 1
+RETRY_AFTER_MAX = 120
+
+
+class OverloadedError(Exception):
+    """
+    Work was shed without being attempted. `status_code` and `retry_after` map to the HTTP response.
+    """
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = max(RETRY_AFTER_MIN, min(RETRY_AFTER_MAX, math.ceil(retry_after)))
+
+
+class QueueFullError(OverloadedError):
+    status_code = 429
+
+
+class QueueTimeoutError(OverloadedError):
+    status_code = 503
+
+
+class AdmissionController:
+    def __init__(self, name: str = "plans", max_concurrent: int = ADMISSION_MAX_CONCURRENT,
+                 max_queue: int = ADMISSION_MAX_QUEUE, queue_timeout: float = ADMISSION_QUEUE_TIMEOUT):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._hold_time = None   # EWMA of seconds a slot is held
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> float:
+        """
+        Rough seconds until a newly queued request would be admitted.
+        """
+        hold = self._hold_time or 1.0
+        return hold * (self.waiting + 1) / max(1, self.max_concurrent)
+
+    async def _acquire(self) -> None:
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise QueueFullError(f"Too many plan requests in progress ({self.active} running, "
+                                 f"{self.waiting} queued)", self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the wait ended: pass it on
+                self._release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self.timed_out += 1
+                raise QueueTimeoutError(f"Waited {self.queue_timeout:.0f}s for a free plan slot",
+                                        self.retry_after()) from None
+            raise
+
+    def _release(self) -> None:
+        # Hand the slot straight to the oldest waiter, so `active` never drops while others queue
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+        Holds one generation slot for the duration of the block, waiting for it if needed.
+        Raises QueueFullError or QueueTimeoutError when the request is shed instead.
+        """
+        await self._acquire()
+        self.admitted += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            held = time.monotonic() - start
+            self._hold_time = held if self._hold_time is None else 0.8 * self._hold_time + 0.2 * held
+            self._release()
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+
+# Shared controller for all plan-generating endpoints
+plan_admission = AdmissionController()
@@ -0,0 +1,151 @@
+# app/planner/brief_index.py
+
+"""
+Near-duplicate brief index in front of plan generation.
+
+Real repeats rarely match exactly: briefs differ in casing, punctuation, word
+order or a word or two. Every generated plan is indexed under a MinHash
+signature of its brief (word-internal character shingles, so word order does not
+matter). A new brief at or above BRIEF_INDEX_PLAN_THRESHOLD similarity is served
+the stored plan. At or above BRIEF_INDEX_PREFIX_THRESHOLD, it reuses the stored
+chain prefix (essence and brainstorm) and runs only the remaining stages.
+The index is in-process, bounded to BRIEF_INDEX_MAX_ENTRIES, and evicts the
+least recently used briefs first.
+
+Shingle similarity cannot tell "20% off" from "50% off" or Nike from Adidas, so a
+match is only used when both briefs contain the same numbers and the same
+capitalised words (names, brands, places). Word order is still ignored, so
+reuse is off unless BRIEF_INDEX_ENABLED is set.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from app.settings import get_settings
+from app.models import CreativePlan
+from app.planner.minhash import MinHasher, MinHashIndex, word_shingles
+from app.planner.singleflight import normalize_brief
+
+# Index configuration (overridable through the environment)
+BRIEF_INDEX_ENABLED = get_settings().brief_index_enabled
+BRIEF_INDEX_PLAN_THRESHOLD = get_settings().brief_index_plan_threshold
+BRIEF_INDEX_PREFIX_THRESHOLD = get_settings().brief_index_prefix_threshold
+BRIEF_INDEX_MAX_ENTRIES = get_settings().brief_index_max_entries
+
+# Chain stages that depend only on the brief and can be shared between near-duplicates
+PREFIX_STAGES = ("essence", "brainstorm")
+
+# More permutations than the MinHashIndex default, so estimates near the thresholds are less noisy
+NUM_PERM = 128
+
+
+@dataclass
+class IndexedBrief:
+    brief: str
+    mode: str
+    plan: CreativePlan
+    prefix: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class BriefMatch:
+    kind: str          # "plan" or "prefix"
+    similarity: float
+    entry: IndexedBrief
+
+
+class BriefIndex:
+    def __init__(self, plan_threshold: float = BRIEF_INDEX_PLAN_THRESHOLD,
+                 prefix_threshold: float = BRIEF_INDEX_PREFIX_THRESHOLD,
+                 max_entries: int = BRIEF_INDEX_MAX_ENTRIES):
+        self.plan_threshold = plan_threshold
+        self.prefix_threshold = prefix_threshold
+        self._index = MinHashIndex(
+            threshold=min(plan_threshold, prefix_threshold),
+            num_perm=NUM_PERM,
+            max_entries=max_entries,
+            hasher=MinHasher(NUM_PERM, shingle_size=3, shingler=word_shingles),
+        )
+        self.plan_hits = 0
+        self.prefix_hits = 0
+        self.misses = 0
+
+    def lookup(self, brief: str, mode: str) -> Optional[BriefMatch]:
+        """
+        Returns the best usable match for a brief planned in `mode`, or None.
+        """
+        for match in self._index.query(brief):
+            entry: IndexedBrief = match.value
+            if entry.mode != mode or not same_specifics(brief, entry.brief):
+                continue
+            if match.similarity >= self.plan_threshold:
+                self.plan_hits += 1
+                return BriefMatch("plan", match.similarity, entry)
+            if match.similarity >= self.prefix_threshold and entry.prefix:
+                self.prefix_hits += 1
+                return BriefMatch("prefix", match.similarity, entry)
+        self.misses += 1
+        return None
+
+    def remember(self, brief: str, mode: str, plan: CreativePlan, prefix: Optional[Dict[str, str]] = None) -> None:
+        key = (mode, normalize_brief(brief))
+        self._index.add(key, brief, IndexedBrief(brief, mode, plan, dict(prefix or {})))
+
+    def clear(self) -> None:
+        self._index.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._index),
+            "plan_hits": self.plan_hits,
+            "prefix_hits": self.prefix_hits,
+            "misses": self.misses,
+            "evictions": self._index.evictions,
+        }
+
+
+def _numbers(brief: str) -> List[str]:
+    return sorted(re.findall(r"\d+(?:[.,]\d+)*", brief))
+
+
+def _words(brief: str) -> List[Tuple[str, bool]]:
+    """
+    The words of a brief, each with whether it starts a sentence.
+    """
+    words, initial = [], True
+    for token in re.findall(r"\w+|[.!?:;]", brief):
+        if token in ".!?:;":
+            initial = True
+        else:
+            words.append((token, initial))
+            initial = False
+    return words
+
+
+def _covers(a: str, b: str) -> bool:
+    """
+    True if every capitalised word of `a` also appears in `b`, capitalised there too
+    unless its capital may only mark the start of a sentence (or `a` is all capitals).
+    """
+    b_words = _words(b)
+    anywhere = {word.lower() for word, _ in b_words}
+    capitalised = anywhere if b.isupper() else {word.lower() for word, _ in b_words if not word.islower()}
+    for word, initial in _words(a):
+        if word.islower() or word.isdigit():
+            continue
+        ambiguous = a.isupper() or (initial and word[1:] == word[1:].lower())
+        if word.lower() not in (anywhere if ambiguous else capitalised):
+            return False
+    return True
+
+
+def same_specifics(a: str, b: str) -> bool:
+    """
+    True if two briefs mention the same numbers and the same capitalised words (names, brands, places).
+    """
+    return _numbers(a) == _numbers(b) and _covers(a, b) and _covers(b, a)
+
+
+# Shared process-wide index
+brief_index = BriefIndex()
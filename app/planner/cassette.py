@@ -0,0 +1,317 @@
+# app/planner/cassette.py
+
+"""
+Record and replay of provider calls.
+
+In record mode every provider is wrapped so each call (stage, provider, model,
+settings, prompt, response and latency) is appended to a cassette, saved as
+JSON lines (gzip-compressed when the path ends in .gz). In replay mode the
+providers are replaced by one that serves the recorded responses locally,
+sleeping for each call's recorded latency times CASSETTE_LATENCY_SCALE, so the
+whole planner runs offline and deterministically. Calls are matched on
+provider, model, settings and prompt; a prompt recorded several times is
+replayed in recorded order.
+
+Media prompt parts are recorded as content digests, not bytes.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Union
+
+from app.logger import logger, stage_var
+from app.planner.providers import LLMProvider, Prompt, prompt_text, register_provider, registered_providers
+from app.settings import get_settings
+
+# Cassette configuration (overridable through the environment)
+CASSETTE_MODE = get_settings().cassette_mode   # off | record | replay
+CASSETTE_PATH = get_settings().cassette_path
+CASSETTE_LATENCY_SCALE = get_settings().cassette_latency_scale
+
+CASSETTE_VERSION = 1
+
+
+class CassetteMissError(LookupError):
+    """
+    Raised in replay mode for a call that is not on the cassette.
+    """
+
+
+class MediaRef:
+    """
+    Stand-in for an uploaded file while replaying; recorded prompts refer to it by `label`.
+    """
+
+    def __init__(self, label: str):
+        self.label = label
+
+
+def _describe_part(part: Any, uploads: Dict[int, str]) -> str:
+    if isinstance(part, str):
+        return part
+    if isinstance(part, MediaRef):
+        return part.label
+    if id(part) in uploads:
+        return uploads[id(part)]
+    if isinstance(part, dict) and "inline_data" in part:
+        data = part["inline_data"]["data"]
+        return f"<media:{hashlib.sha256(data).hexdigest()[:16]}>"
+    if hasattr(part, "tobytes"):
+        # PIL images
+        return f"<media:{hashlib.sha256(part.tobytes()).hexdigest()[:16]}>"
+    return f"<{type(part).__name__}>"
+
+def describe_prompt(prompt: Prompt, uploads: Optional[Dict[int, str]] = None) -> Union[str, List[str]]:
+    """
+    A JSON-safe form of a prompt: text parts as-is, media parts as digests.
+    """
+    if isinstance(prompt, str):
+        return prompt
+    return [_describe_part(part, uploads or {}) for part in prompt]
+
+def call_key(provider: str, model: str, config: Optional[dict], prompt: Union[str, List[str]]) -> str:
+    payload = json.dumps([provider, model, config or {}, prompt], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+@dataclass
+class CassetteEntry:
+    stage: str
+    provider: str
+    model: str
+    config: Optional[dict]
+    prompt: Union[str, List[str]]
+    response: Union[str, List[str]]   # a list for generate_many calls
+    latency: float
+    key: str = ""
+
+    def __post_init__(self):
+        self.key = self.key or call_key(self.provider, self.model, self.config, self.prompt)
+
+
+@dataclass
+class Cassette:
+    entries: List[CassetteEntry] = field(default_factory=list)
+    default_models: Dict[str, str] = field(default_factory=dict)
+
+    def __post_init__(self):
+        self._by_key: Dict[str, List[CassetteEntry]] = {}
+        self._served: Dict[str, int] = {}
+        for entry in self.entries:
+            self._by_key.setdefault(entry.key, []).append(entry)
+
+    def add(self, entry: CassetteEntry) -> None:
+        self.entries.append(entry)
+        self._by_key.setdefault(entry.key, []).append(entry)
+
+    def next(self, key: str) -> Optional[CassetteEntry]:
+        """
+        The recording for `key`, cycling through repeated recordings in order.
+        """
+        recordings = self._by_key.get(key)
+        if not recordings:
+            return None
+        served = self._served.get(key, 0)
+        self._served[key] = served + 1
+        return recordings[served % len(recordings)]
+
+    def rewind(self) -> None:
+        self._served.clear()
+
+    @classmethod
+    def load(cls, path: str) -> "Cassette":
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            if header.get("cassette") != CASSETTE_VERSION:
+                raise ValueError(f"Unsupported cassette version in {path}: {header.get('cassette')!r}")
+            entries = [CassetteEntry(**json.loads(line)) for line in f if line.strip()]
+        return cls(entries, header.get("default_models", {}))
+
+    def save(self, path: str) -> None:
+        """
+        Writes the cassette atomically: a crash mid-save leaves the previous file intact.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        opener = gzip.open if path.endswith(".gz") else open
+        tmp_path = f"{path}.tmp"
+        with opener(tmp_path, "wt", encoding="utf-8") as f:
+            f.write(json.dumps({"cassette": CASSETTE_VERSION, "default_models": self.default_models}) + "\n")
+            for entry in self.entries:
+                f.write(json.dumps(asdict(entry), ensure_ascii=False, separators=(",", ":")) + "\n")
+        os.replace(tmp_path, path)
+
+
+class RecordingProvider(LLMProvider):
+    """
+    Passes calls through to `inner` and records each one on the cassette.
+    """
+
+    def __init__(self, inner: LLMProvider, cassette: Cassette):
+        self.inner = inner
+        self.cassette = cassette
+        self.name = inner.name
+        self.default_model = inner.default_model
+        self._uploads: Dict[int, str] = {}
+        cassette.default_models[self.name] = self.default_model
+
+    def _record(self, prompt, model, config, response, started: float) -> None:
+        self.cassette.add(CassetteEntry(
+            stage=stage_var.get(), provider=self.name, model=model or self.default_model, config=config,
+            prompt=describe_prompt(prompt, self._uploads), response=response,
+            latency=round(time.perf_counter() - started, 4),
+        ))
+
+    async def generate(self, prompt, model=None, config=None) -> str:
+        started = time.perf_counter()
+        text = await self.inner.generate(prompt, model, config)
+        self._record(prompt, model, config, text, started)
+        return text
+
+    async def generate_many(self, prompt, n, model=None, config=None):
+        started = time.perf_counter()
+        texts = await self.inner.generate_many(prompt, n, model, config)
+        self._record(prompt, model, config, texts, started)
+        return texts
+
+    async def stream(self, prompt, model=None, config=None):
+        started = time.perf_counter()
+        chunks = []
+        async for chunk in self.inner.stream(prompt, model, config):
+            chunks.append(chunk)
+            yield chunk
+        self._record(prompt, model, config, "".join(chunks), started)
+
+    async def upload_file(self, file, mime_type):
+        position = file.tell()
+        digest = hashlib.sha256()
+        while chunk := file.read(1024 * 1024):
+            digest.update(chunk)
+        file.seek(position)
+        handle = await self.inner.upload_file(file, mime_type)
+        self._uploads[id(handle)] = f"<media:{digest.hexdigest()[:16]}>"
+        return handle
+
+    async def delete_file(self, handle):
+        self._uploads.pop(id(handle), None)
+        await self.inner.delete_file(handle)
+
+    async def warm_up(self):
+        await self.inner.warm_up()
+
+
+@dataclass
+class ReplayedCall:
+    stage: str
+    model: str
+    prompt_chars: int
+    response_chars: int
+    latency: float   # recorded (unscaled) seconds, or the fallback's measured seconds for misses
+    hit: bool
+
+
+class ReplayProvider(LLMProvider):
+    """
+    Serves recorded responses for provider `name`. Calls missing from the cassette
+    go to `fallback` if given, and raise CassetteMissError otherwise. Every call
+    is logged to `calls` for comparison reports.
+    """
+
+    def __init__(self, cassette: Cassette, name: str, latency_scale: float = CASSETTE_LATENCY_SCALE,
+                 fallback: Optional[LLMProvider] = None):
+        self.cassette = cassette
+        self.name = name
+        self.default_model = cassette.default_models.get(name) or getattr(fallback, "default_model", "") or "replay"
+        self.latency_scale = latency_scale
+        self.fallback = fallback
+        self.calls: List[ReplayedCall] = []
+
+    async def _replay(self, prompt, model, config, many: Optional[int] = None) -> Union[str, List[str]]:
+        model = model or self.default_model
+        entry = self.cassette.next(call_key(self.name, model, config, describe_prompt(prompt)))
+        stage = stage_var.get()
+        if entry is None:
+            if self.fallback is None:
+                raise CassetteMissError(f"No recorded {self.name} call for stage {stage!r} "
+                                        f"({len(prompt_text(prompt))} prompt chars)")
+            logger.info("Cassette miss for stage %r; calling %s", stage, self.fallback.name)
+            started = time.perf_counter()
+            if many is None:
+                response = await self.fallback.generate(prompt, model, config)
+            else:
+                response = await self.fallback.generate_many(prompt, many, model, config)
+            self.calls.append(ReplayedCall(stage, model, len(prompt_text(prompt)), _chars(response),
+                                           round(time.perf_counter() - started, 4), hit=False))
+            return response
+
+        if self.latency_scale > 0:
+            await asyncio.sleep(entry.latency * self.latency_scale)
+        self.calls.append(ReplayedCall(stage, model, len(prompt_text(prompt)), _chars(entry.response), entry.latency,
+                                       hit=True))
+        return entry.response
+
+    async def generate(self, prompt, model=None, config=None) -> str:
+        return await self._replay(prompt, model, config)
+
+    async def generate_many(self, prompt, n, model=None, config=None):
+        return await self._replay(prompt, model, config, many=n)
+
+    async def upload_file(self, file, mime_type):
+        digest = hashlib.sha256()
+        while chunk := file.read(1024 * 1024):
+            digest.update(chunk)
+        return MediaRef(f"<media:{digest.hexdigest()[:16]}>")
+
+
+def _chars(response: Union[str, List[str]]) -> int:
+    return len(response) if isinstance(response, str) else sum(len(text) for text in response)
+
+
+# ================================
+# Installation
+# ================================
+
+# Cassette being recorded and the path it was installed from (saved back there on shutdown)
+_recording: Optional[Cassette] = None
+_recording_path: Optional[str] = None
+
+def install_cassette(mode: str = CASSETTE_MODE, path: str = CASSETTE_PATH,
+                     latency_scale: float = CASSETTE_LATENCY_SCALE) -> Optional[Cassette]:
+    """
+    Wraps (record) or replaces (replay) every registered provider. Returns the
+    cassette, or None when `mode` is "off".
+    """
+    global _recording, _recording_path
+    if mode == "off":
+        return None
+    if mode == "record":
+        cassette = Cassette.load(path) if os.path.exists(path) else Cassette()
+        for name, factory in registered_providers().items():
+            register_provider(name, lambda factory=factory: RecordingProvider(factory(), cassette))
+        _recording, _recording_path = cassette, path
+        logger.info("Recording provider calls to %s (%d already recorded)", path, len(cassette.entries))
+        return cassette
+    if mode == "replay":
+        cassette = Cassette.load(path)
+        for name in set(registered_providers()) | set(cassette.default_models):
+            register_provider(name, lambda name=name: ReplayProvider(cassette, name, latency_scale))
+        logger.info("Replaying %d recorded provider calls from %s (latency x%g)",
+                    len(cassette.entries), path, latency_scale)
+        return cassette
+    raise ValueError(f"Unknown cassette mode: {mode!r}")
+
+def save_recording(path: Optional[str] = None) -> None:
+    """
+    Saves the cassette being recorded, if any, to `path` (default: the path it was installed from).
+    """
+    if _recording is not None:
+        path = path or _recording_path
+        _recording.save(path)
+        logger.info("Saved %d recorded provider calls to %s", len(_recording.entries), path)
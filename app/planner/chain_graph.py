@@ -0,0 +1,203 @@
+# app/planner/chain_graph.py
+
+"""
+Small asyncio executor for prompt chains expressed as a dependency graph.
+
+Each node is an async function that receives the results of its dependencies.
+A node starts as soon as all of its inputs are ready, so independent stages
+(e.g. N brainstormed ideas) run concurrently, optionally bounded by a semaphore.
+Per-node timings are recorded so the critical path of a run can be inspected.
+Nodes with a `fallback` may be skipped at run time (e.g. when a deadline is
+near), in which case the fallback derives their result from their inputs.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.logger import stage_var
+
+# A node receives {dependency_name: dependency_result} and returns its own result
+NodeFunc = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+# Optional async callback invoked as (node_name, node_result) when a node finishes
+NodeCallback = Callable[[str, Any], Awaitable[None]]
+
+# Decides, just before a skippable node would start, whether to skip it
+SkipPolicy = Callable[["StageNode"], bool]
+
+
+@dataclass
+class StageNode:
+    name: str
+    func: NodeFunc
+    deps: Tuple[str, ...] = ()
+    label: Optional[str] = None  # human-readable name used in timing summaries
+    fallback: Optional[Callable[[Dict[str, Any]], Any]] = None  # result used if the node is skipped
+
+
+@dataclass
+class NodeTiming:
+    start: float     # seconds since the run started
+    end: float
+    label: str
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+@dataclass
+class ChainRun:
+    """
+    Results and timings of one graph execution.
+    """
+    results: Dict[str, Any]
+    timings: Dict[str, NodeTiming]
+    deps: Dict[str, Tuple[str, ...]]
+    wall_time: float = 0.0
+    skipped: List[str] = field(default_factory=list)
+    reused: List[str] = field(default_factory=list)  # nodes resolved from `preset` results
+
+    @property
+    def serial_time(self) -> float:
+        """Sum of node durations, i.e. the wall time of a strictly sequential run."""
+        return sum(t.duration for t in self.timings.values())
+
+    def critical_path(self) -> Tuple[List[str], float]:
+        """
+        Returns the chain of nodes that determined the run's wall time, and its length.
+        At each step, the path follows the dependency that finished last.
+        """
+        if not self.timings:
+            return [], 0.0
+        node = max(self.timings, key=lambda n: self.timings[n].end)
+        path = [node]
+        while True:
+            ran_deps = [d for d in self.deps.get(node, ()) if d in self.timings]
+            if not ran_deps:
+                break
+            node = max(ran_deps, key=lambda d: self.timings[d].end)
+            path.append(node)
+        path.reverse()
+        return path, self.timings[path[-1]].end - self.timings[path[0]].start
+
+    def timing_summary(self) -> Dict[str, float]:
+        """Maps node labels to durations in seconds, in start order."""
+        ordered = sorted(self.timings.values(), key=lambda t: t.start)
+        return {t.label: round(t.duration, 3) for t in ordered}
+
+
+@dataclass
+class ChainGraph:
+    nodes: Dict[str, StageNode] = field(default_factory=dict)
+
+    def add(self, name: str, func: NodeFunc, deps: Sequence[str] = (), label: Optional[str] = None,
+            fallback: Optional[Callable[[Dict[str, Any]], Any]] = None) -> str:
+        """
+        Adds a node and returns its name. A node with a `fallback` is skippable.
+        """
+        if name in self.nodes:
+            raise ValueError(f"Duplicate chain node: {name!r}")
+        self.nodes[name] = StageNode(name, func, tuple(deps), label, fallback)
+        return name
+
+    def fan_out(self, name: str, count: int, func: Callable[[Dict[str, Any], int], Awaitable[Any]],
+                deps: Sequence[str] = (), label: Optional[str] = None,
+                fallback: Optional[Callable[[Dict[str, Any]], Any]] = None) -> List[str]:
+        """
+        Adds `count` parallel nodes named `name_0 .. name_{count-1}` sharing the same
+        dependencies. `func` also receives the branch index. Returns the node names,
+        which can be passed as `deps` to a fan-in node.
+        """
+        names = []
+        for i in range(count):
+            async def branch(inputs, i=i):
+                return await func(inputs, i)
+            names.append(self.add(f"{name}_{i}", branch, deps, f"{label or name} #{i + 1}", fallback))
+        return names
+
+    def topological_order(self) -> List[str]:
+        """
+        Returns node names in dependency order; raises ValueError on unknown deps or cycles.
+        """
+        order, state = [], {}
+
+        def visit(name, trail):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError(f"Cycle in chain graph: {' -> '.join(trail + [name])}")
+            state[name] = "visiting"
+            for dep in self.nodes[name].deps:
+                if dep not in self.nodes:
+                    raise ValueError(f"Chain node {name!r} depends on unknown node {dep!r}")
+                visit(dep, trail + [name])
+            state[name] = "done"
+            order.append(name)
+
+        for name in self.nodes:
+            visit(name, [])
+        return order
+
+    async def run(self, max_concurrency: Optional[int] = None, on_node: Optional[NodeCallback] = None,
+                  should_skip: Optional[SkipPolicy] = None, preset: Optional[Dict[str, Any]] = None) -> ChainRun:
+        """
+        Executes the graph. Each node starts once its dependencies resolve; at most
+        `max_concurrency` nodes run at a time. Skippable nodes for which
+        `should_skip(node)` is true resolve to their fallback instead of running.
+        Nodes named in `preset` resolve to the given result without running.
+        If any node fails, the remaining nodes are cancelled and the error is raised.
+        """
+        preset = preset or {}
+        order = self.topological_order()
+        limit = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+        timings: Dict[str, NodeTiming] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+        skipped: List[str] = []
+        reused: List[str] = [name for name in order if name in preset]
+        t_run = time.perf_counter()
+
+        async def execute(node: StageNode):
+            # Each node runs in its own task, so this only labels this node's logs and LLM calls
+            stage_var.set(node.name)
+            inputs = {dep: await tasks[dep] for dep in node.deps}
+            if node.name in preset:
+                return preset[node.name]
+            if node.fallback is not None and should_skip is not None and should_skip(node):
+                skipped.append(node.name)
+                return node.fallback(inputs)
+            if limit is not None:
+                await limit.acquire()
+            try:
+                start = time.perf_counter() - t_run
+                result = await node.func(inputs)
+                timings[node.name] = NodeTiming(start, time.perf_counter() - t_run, node.label or node.name)
+            finally:
+                if limit is not None:
+                    limit.release()
+            if on_node is not None:
+                await on_node(node.name, result)
+            return result
+
+        # Tasks are created in dependency order so every dependency task exists before it is awaited
+        for name in order:
+            tasks[name] = asyncio.create_task(execute(self.nodes[name]))
+
+        try:
+            results = await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+
+        return ChainRun(
+            results=dict(zip(tasks.keys(), results)),
+            timings=timings,
+            deps={name: node.deps for name, node in self.nodes.items()},
+            wall_time=time.perf_counter() - t_run,
+            skipped=skipped,
+            reused=reused,
+        )
@@ -0,0 +1,51 @@
+# app/planner/chain_session.py
+
+"""
+Runs chain stages as turns of a single conversation.
+
+The stateless chain rebuilds each stage's prompt from scratch, repeating the
+brief and the previous stage's output every time. A `ChainSession` instead keeps
+an append-only transcript: a fixed prefix (system instructions and the brief),
+then each turn's request and reply. Every turn's prompt extends the previous
+turn's prompt byte for byte, so provider-side prefix/context caching (Gemini
+implicit caching, OpenAI prompt caching) only has to process the new request and
+the previous reply. Turns still go through `generate_creative_response`, so
+model tiers, the response cache, hedging, cassettes and metrics apply as usual.
+"""
+
+from typing import List, Optional
+
+from app.planner.llm_gemini import generate_creative_response
+
+# Headings that delimit the turns of the transcript
+REQUEST_HEADING = "### Request"
+RESPONSE_HEADING = "### Response"
+
+
+class ChainSession:
+    def __init__(self, prefix: str):
+        self.transcript = prefix.rstrip() + "\n"
+        self.stages: List[str] = []          # stages that have a turn, in order
+        self.last_reply: Optional[str] = None
+
+    def prompt(self, message: str) -> str:
+        """
+        The prompt for a turn asking `message`: the whole transcript so far plus the request.
+        """
+        return f"{self.transcript}\n{REQUEST_HEADING}\n{message.strip()}\n\n{RESPONSE_HEADING}\n"
+
+    def add_turn(self, stage: str, message: str, reply: str) -> None:
+        """
+        Appends a finished turn (also used for replies obtained without a call, e.g. reused stages).
+        """
+        self.transcript = f"{self.prompt(message)}{reply.strip()}\n"
+        self.stages.append(stage)
+        self.last_reply = reply
+
+    async def send(self, stage: str, message: str) -> str:
+        """
+        Asks `message` as the next turn and returns the reply.
+        """
+        reply = await generate_creative_response(self.prompt(message))
+        self.add_turn(stage, message, reply)
+        return reply
@@ -0,0 +1,105 @@
+# app/planner/circuit_breaker.py
+
+"""
+Circuit breakers per provider/model.
+
+A breaker opens after BREAKER_FAILURE_THRESHOLD consecutive failed calls
+(errors or PROVIDER_CALL_TIMEOUT timeouts). While open, calls fail at once with
+CircuitOpenError instead of waiting on a provider that is down or throttling.
+After BREAKER_RESET_SECONDS it lets a single probe call through (half-open): a
+success closes the breaker, a failure opens it for another period.
+"""
+
+import time
+from typing import Callable, Dict
+
+from app.settings import get_settings
+from app.logger import logger
+from app.planner.admission import OverloadedError
+
+# Breaker configuration (overridable through the environment)
+BREAKER_FAILURE_THRESHOLD = get_settings().breaker_failure_threshold
+BREAKER_RESET_SECONDS = get_settings().breaker_reset_seconds
+# Seconds before a single provider call counts as failed (0 = no limit)
+PROVIDER_CALL_TIMEOUT = get_settings().provider_call_timeout
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(OverloadedError):
+    status_code = 503
+
+
+class CircuitBreaker:
+    def __init__(self, key: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_seconds: float = BREAKER_RESET_SECONDS, clock: Callable[[], float] = time.monotonic):
+        self.key = key
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0          # consecutive failures while closed
+        self.opened_at = 0.0
+        self.probing = False       # a half-open probe is in flight
+        self.opened = 0            # times the breaker has opened
+        self.short_circuited = 0   # calls rejected while open
+
+    def before_call(self) -> None:
+        """
+        Raises CircuitOpenError unless a call may go ahead now.
+        """
+        if self.state == OPEN:
+            remaining = self.opened_at + self.reset_seconds - self.clock()
+            if remaining > 0:
+                self.short_circuited += 1
+                raise CircuitOpenError(f"Circuit open for {self.key} after repeated failures", remaining)
+            self.state = HALF_OPEN
+            logger.info("Circuit half-open for %s; probing", self.key)
+        if self.state == HALF_OPEN:
+            if self.probing:
+                self.short_circuited += 1
+                raise CircuitOpenError(f"Circuit half-open for {self.key}; probe in progress", 1)
+            self.probing = True
+
+    def record_success(self) -> None:
+        if self.state != CLOSED:
+            logger.info("Circuit closed for %s", self.key)
+        self.state = CLOSED
+        self.failures = 0
+        self.probing = False
+
+    def record_failure(self) -> None:
+        self.probing = False
+        if self.state == HALF_OPEN:
+            self._open()
+            return
+        self.failures += 1
+        if self.state == CLOSED and self.failures >= self.failure_threshold:
+            self._open()
+
+    def record_abandoned(self) -> None:
+        """
+        The call was cancelled (e.g. a hedged duplicate lost): says nothing about the provider.
+        """
+        self.probing = False
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self.opened_at = self.clock()
+        self.opened += 1
+        logger.warning("Circuit opened for %s for %.0fs", self.key, self.reset_seconds)
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+def get_breaker(provider: str, model: str) -> CircuitBreaker:
+    """
+    Returns the shared breaker for `provider`/`model`.
+    """
+    key = f"{provider}/{model}"
+    if key not in _breakers:
+        _breakers[key] = CircuitBreaker(key)
+    return _breakers[key]
+
+def breaker_states() -> Dict[str, CircuitBreaker]:
+    return dict(_breakers)
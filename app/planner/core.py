@@ -1,61 +1,438 @@
 # app/planner/core.py
 
+import hashlib
 import json
-import re
+import logging
+import time
 import asyncio
+from dataclasses import asdict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
 from pydantic import ValidationError
 
-from app.logger import logger
+from app.logger import log_payload, logger, stage_var
+from app.metrics import caption_seconds, stage_seconds
 from app.models import CreativePlan
+from app.uploads import SpooledUpload
 from app.planner.prompt_template import creative_plan_prompt, creative_plan_trends_prompt
-from app.planner.prompt_chain import creative_plan_chained_prompt
-from app.planner.llm_gemini import generate_creative_response
+from app.planner.prompt_chain import creative_plan_chained_prompt, creative_plan_variants, StageCallback, CHAIN_STAGES
+from app.planner.deadline import Deadline, JSON_DRAFT_STAGE, stage_latencies
+from app.planner.trace import PlanTrace
+from app.planner.prompt_accounting import PromptLedger, ledger_var, prompt_ledger
+from app.planner.llm_gemini import generate_creative_response, stream_creative_response
+from app.planner.image_captioning import caption_image
+from app.planner.video_captioning import caption_video, VIDEO_CAPTION_MODE
+from app.planner.json_stream import JSONFieldStream
+from app.planner.json_repair import (
+    JSONRepairError, extract_json_object, field_adapter, parse_plan_locally, repair_prompt, repair_stats,
+)
+from app.planner.singleflight import FlightCodec, SingleFlight, normalize_brief
+from app.shared_state import SHARED_STATE_BACKEND, shared_state
+from app.planner.brief_index import BRIEF_INDEX_ENABLED, PREFIX_STAGES, brief_index
+from app.planner.admission import AdmissionController
 
-# Controls whether to use single-step or multi-step prompt generation
+# Process-wide default planning strategy, used when a request does not choose a mode
 USE_CHAINING_MODE = True
 USE_TRENDS_MODE = False
 
-async def plan_from_brief(user_input: str) -> CreativePlan:
+# Per-request planning modes ("auto" picks chain or single based on the latency budget)
+PLAN_MODES = ("chain", "single", "trends", "auto")
+
+# Identical concurrent plan requests share one in-flight generation (across workers with shared state)
+plan_flight = SingleFlight("plan", shared=shared_state if SHARED_STATE_BACKEND != "local" else None)
+
+# How coalesced results travel between workers: (plan, trace), ([plans], trace) and a bare plan
+def _encode_traced(result: Tuple[Union[CreativePlan, List[CreativePlan]], PlanTrace]) -> str:
+    plans, trace = result
+    payload = [plan.model_dump() for plan in plans] if isinstance(plans, list) else plans.model_dump()
+    return json.dumps({"plans": payload, "trace": asdict(trace)})
+
+def _decode_traced(text: str) -> Tuple[Union[CreativePlan, List[CreativePlan]], PlanTrace]:
+    data = json.loads(text)
+    payload = data["plans"]
+    plans = [CreativePlan(**plan) for plan in payload] if isinstance(payload, list) else CreativePlan(**payload)
+    return plans, PlanTrace(**data["trace"])
+
+TRACED_PLANS: FlightCodec = (_encode_traced, _decode_traced)
+PLAN: FlightCodec = (lambda plan: plan.model_dump_json(), CreativePlan.model_validate_json)
+
+def planning_mode() -> str:
     """
-    Generates a CreativePlan from an unstructured user input string.
-    Uses either single-shot or chained prompting depending on USE_CHAINING_MODE.
-    Validates output against CreativePlan schema.
+    Returns the process-wide default planning mode: "chain", "trends" or "single".
+    """
+    if USE_CHAINING_MODE:
+        return "chain"
+    return "trends" if USE_TRENDS_MODE else "single"
+
+def resolve_mode(mode: Optional[str] = None, deadline: Optional[Deadline] = None) -> str:
     """
-    mode = "chain" if USE_CHAINING_MODE else "single"
+    Turns a requested mode into a concrete one. No mode means the process default;
+    "auto" runs the chain unless the deadline cannot cover its expected latency.
+    """
+    if mode is None:
+        return planning_mode()
+    if mode not in PLAN_MODES:
+        raise ValueError(f"Unknown planning mode: {mode!r}")
+    if mode == "auto":
+        chain_seconds = stage_latencies.expected_total(CHAIN_STAGES + [JSON_DRAFT_STAGE])
+        return "chain" if deadline is None or deadline.can_fit(chain_seconds) else "single"
+    return mode
+
+async def build_plan_prompt(user_input: str, on_stage: Optional[StageCallback] = None, mode: Optional[str] = None,
+                            deadline: Optional[Deadline] = None, trace: Optional[PlanTrace] = None,
+                            preset: Optional[Dict[str, str]] = None) -> str:
+    """
+    Builds the final JSON-drafting prompt using the requested strategy
+    (chained or single-shot, optionally trend-informed). Chain stages in `preset`
+    are reused rather than run.
+    """
+    mode = resolve_mode(mode, deadline)
     logger.info(f"Planning mode selected: {mode!r}")
+    if trace is not None:
+        trace.mode = mode
 
-    # Step 1: Generate prompt using selected strategy
-    if USE_CHAINING_MODE:
+    if mode == "chain":
         logger.info("Using prompt-chaining planner...")
-        prompt = await creative_plan_chained_prompt(user_input)
-    else:
-        if USE_TRENDS_MODE:
-            logger.info("Using single-shot, trend-informed prompt planner...")
-            prompt = creative_plan_trends_prompt(user_input)
-        else:
-            logger.info("Using single-shot prompt planner...")
-            prompt = creative_plan_prompt(user_input)
+        return await creative_plan_chained_prompt(user_input, on_stage=on_stage, deadline=deadline, trace=trace,
+                                                  preset=preset)
+    if mode == "trends":
+        logger.info("Using single-shot, trend-informed prompt planner...")
+        return creative_plan_trends_prompt(user_input)
+    logger.info("Using single-shot prompt planner...")
+    return creative_plan_prompt(user_input)
 
-    logger.info("Generated prompt:\n%s", prompt)
-
-    # Step 2: Generate raw response from LLM
-    response_text = await generate_creative_response(prompt)
-    logger.info("Raw LLM response:\n%s", response_text)
+def parse_plan_response(response_text: str) -> CreativePlan:
+    """
+    Extracts the first JSON object from a raw LLM response (ignoring fences and prose),
+    repairs common defects locally, and validates it field by field against CreativePlan.
+    """
+    try:
+        plan, outcome = parse_plan_locally(response_text)
+    except JSONRepairError as e:
+        logger.error("Failed to parse LLM response as JSON: %s", e)
+        log_payload("Unparseable LLM response", response_text, level=logging.ERROR, full=True)
+        raise ValueError(f"Failed to parse LLM response as JSON: {e}\n\nRaw output:\n{response_text}")
+    repair_stats[outcome] += 1
+    logger.info("Successfully parsed JSON (%s).", outcome)
+    return plan
 
-    # Step 3: Strip Markdown formatting (```json ... ```)
-    clean_text = re.sub(r"^```(?:json)?\n?|```$", "", response_text.strip(), flags=re.IGNORECASE)
+async def parse_or_repair_plan_response(response_text: str) -> CreativePlan:
+    """
+    Like parse_plan_response, but if local repair fails, sends only the broken JSON
+    to the LLM once for a targeted fix before giving up.
+    """
+    try:
+        return parse_plan_response(response_text)
+    except ValueError:
+        broken = extract_json_object(response_text)
+        if broken is None:
+            repair_stats["failed"] += 1
+            raise
 
-    # Step 4: Parse and validate JSON
+    logger.warning("Local JSON repair failed; asking the LLM to fix %d chars of JSON", len(broken))
+    repaired_text = await generate_creative_response(repair_prompt(broken))
     try:
-        data = json.loads(clean_text)
-        logger.info("Successfully parsed JSON.")
-        return CreativePlan(**data)
-    except json.JSONDecodeError as e:
-        logger.error("Failed to parse LLM response as JSON", exc_info=True)
+        plan, _ = parse_plan_locally(repaired_text)
+    except JSONRepairError as e:
+        repair_stats["failed"] += 1
+        logger.error("LLM JSON repair failed: %s", e)
         raise ValueError(f"Failed to parse LLM response as JSON: {e}\n\nRaw output:\n{response_text}")
-    except ValidationError as ve:
-        logger.error("Parsed JSON but validation against CreativePlan failed", exc_info=True)
-        raise ValueError(f"Validation error: {ve}\n\nParsed JSON:\n{data}")
+    repair_stats["llm_repair"] += 1
+    logger.info("Successfully parsed JSON (llm_repair).")
+    return plan
+
+async def plan_from_brief(user_input: str, mode: Optional[str] = None, deadline: Optional[Deadline] = None,
+                          trace: Optional[PlanTrace] = None, reuse: bool = True) -> CreativePlan:
+    """
+    Generates a CreativePlan from an unstructured user input string.
+    Uses single-shot or chained prompting depending on `mode` (default: USE_CHAINING_MODE).
+    With a `deadline`, chain refinement stages are skipped as needed to finish in time.
+    Unless `reuse` is false, a near-duplicate of an earlier brief is served its stored
+    plan, or reuses its chain prefix (see brief_index.py).
+    Validates output against CreativePlan schema.
+    """
+    trace = trace if trace is not None else PlanTrace()
+    mode = resolve_mode(mode, deadline)
+    reuse = reuse and BRIEF_INDEX_ENABLED
+    preset = None
+    if reuse:
+        match = brief_index.lookup(user_input, mode)
+        if match is not None:
+            trace.mode = mode
+            trace.near_duplicate = match.kind
+            trace.similarity = round(match.similarity, 2)
+            logger.info("Near-duplicate brief (%s, similarity %.2f): %r", match.kind, match.similarity, match.entry.brief)
+            if match.kind == "plan":
+                return match.entry.plan.model_copy(deep=True)
+            preset = match.entry.prefix
+
+    # Every LLM call of this plan is recorded in its prompt-size ledger
+    with prompt_ledger() as ledger:
+        # Step 1: Generate prompt using selected strategy
+        prompt = await build_plan_prompt(user_input, mode=mode, deadline=deadline, trace=trace, preset=preset)
+        log_payload("Generated prompt", prompt)
+
+        # Steps 2 and 3 are labelled as the JSON drafting stage in logs and metrics
+        stage_token = stage_var.set(JSON_DRAFT_STAGE)
+        try:
+            # Step 2: Generate raw response from LLM
+            t0 = time.perf_counter()
+            response_text = await generate_creative_response(prompt)
+            draft_seconds = time.perf_counter() - t0
+            stage_latencies.observe(JSON_DRAFT_STAGE, draft_seconds)
+            stage_seconds.observe(draft_seconds, stage=JSON_DRAFT_STAGE)
+            if trace is not None:
+                trace.stages_run.append(JSON_DRAFT_STAGE)
+                trace.timings[JSON_DRAFT_STAGE] = round(draft_seconds, 3)
+            log_payload("Raw LLM response", response_text)
+
+            # Step 3: Extract, repair if needed, and validate JSON
+            plan = await parse_or_repair_plan_response(response_text)
+        finally:
+            stage_var.reset(stage_token)
+    trace.prompt_sizes = ledger.summary()
+    total = trace.prompt_sizes["total"]
+    logger.info("Prompt sizes (chars): %d in (%d new, %d reused prefix), %d out over %d calls",
+                total["input_chars"], total["new_input_chars"], total["reused_prefix_chars"],
+                total["output_chars"], total["calls"])
+
+    if reuse:
+        _remember_plan(user_input, mode, plan, trace)
+    return plan
+
+def _remember_plan(user_input: str, mode: str, plan: CreativePlan, trace: PlanTrace) -> None:
+    """
+    Indexes a generated plan, and the chain prefix it was built from, for near-duplicate briefs.
+    """
+    # Only stages that actually ran (not skipped or fallen back) are worth sharing
+    prefix = {name: trace.stage_outputs[name] for name in PREFIX_STAGES
+              if name in trace.stage_outputs and name not in trace.stages_skipped}
+    brief_index.remember(user_input, mode, plan, prefix)
+
+async def coalesced_plan_from_brief(user_input: str, mode: Optional[str] = None, latency_budget_ms: Optional[int] = None,
+                                    trace: Optional[PlanTrace] = None, reuse: bool = True) -> CreativePlan:
+    """
+    Like plan_from_brief, but concurrent calls with the same normalized brief,
+    mode, latency budget and reuse setting wait on a single shared generation.
+    """
+    async def generate():
+        shared_trace = PlanTrace()
+        deadline = Deadline.from_budget_ms(latency_budget_ms)
+        plan = await plan_from_brief(user_input, mode=mode, deadline=deadline, trace=shared_trace, reuse=reuse)
+        return plan, shared_trace
+
+    key = ("text", mode or planning_mode(), latency_budget_ms, reuse, normalize_brief(user_input))
+    plan, shared_trace = await plan_flight.do(key, generate, TRACED_PLANS)
+    if trace is not None:
+        trace.update(shared_trace)
+    return plan
+
+async def plan_variants_from_brief(user_input: str, variants: int, deadline: Optional[Deadline] = None,
+                                   trace: Optional[PlanTrace] = None) -> List[CreativePlan]:
+    """
+    Generates `variants` alternative plans with the chain. Essence, brainstorming and
+    selection run once; each variant's refinement stages and JSON drafting run concurrently.
+    """
+    async def draft(prompt: str) -> CreativePlan:
+        response_text = await generate_creative_response(prompt)
+        log_payload("Raw LLM response", response_text)
+        return await parse_or_repair_plan_response(response_text)
+
+    if trace is not None:
+        trace.mode = "chain"
+    with prompt_ledger() as ledger:
+        plans = await creative_plan_variants(user_input, variants, draft, deadline=deadline, trace=trace)
+    if trace is not None:
+        trace.prompt_sizes = ledger.summary()
+    return plans
+
+async def coalesced_plan_variants_from_brief(user_input: str, variants: int, latency_budget_ms: Optional[int] = None,
+                                             trace: Optional[PlanTrace] = None) -> List[CreativePlan]:
+    """
+    Like plan_variants_from_brief, with identical concurrent requests sharing one generation.
+    """
+    async def generate():
+        shared_trace = PlanTrace()
+        deadline = Deadline.from_budget_ms(latency_budget_ms)
+        plans = await plan_variants_from_brief(user_input, variants, deadline=deadline, trace=shared_trace)
+        return plans, shared_trace
+
+    key = ("variants", variants, latency_budget_ms, normalize_brief(user_input))
+    plans, shared_trace = await plan_flight.do(key, generate, TRACED_PLANS)
+    if trace is not None:
+        trace.update(shared_trace)
+    return plans
+
+def _media_digest(media: Union[bytes, SpooledUpload]) -> str:
+    # Spooled uploads were hashed while streaming in
+    return media.sha256 if isinstance(media, SpooledUpload) else hashlib.sha256(media).hexdigest()
+
+async def plan_from_image(image: Union[bytes, SpooledUpload], trace: Optional[PlanTrace] = None) -> CreativePlan:
+    """
+    Captions an image (raw bytes or a spooled upload) and plans from the caption.
+    Identical uploads in flight share one caption + plan generation.
+    The caption is recorded in the trace as the "caption" stage output.
+    """
+    async def caption_and_plan():
+        t0 = time.perf_counter()
+        caption = await caption_image(image)
+        seconds = time.perf_counter() - t0
+        caption_seconds.observe(seconds, kind="image")
+        log_payload("Generated caption from image", caption)
+        return await _plan_from_caption(caption, seconds)
+
+    key = ("image", planning_mode(), _media_digest(image))
+    plan, shared_trace = await plan_flight.do(key, caption_and_plan, TRACED_PLANS)
+    if trace is not None:
+        trace.update(shared_trace)
+    return plan
+
+async def plan_from_video(video: Union[bytes, SpooledUpload], caption_mode: Optional[str] = None,
+                          trace: Optional[PlanTrace] = None) -> CreativePlan:
+    """
+    Captions a video (raw bytes or a spooled upload) and plans from the caption.
+    `caption_mode` selects inline or keyframe captioning (default: VIDEO_CAPTION_MODE).
+    Identical uploads in flight share one caption + plan generation.
+    The caption is recorded in the trace as the "caption" stage output.
+    """
+    caption_mode = caption_mode or VIDEO_CAPTION_MODE
+
+    async def caption_and_plan():
+        t0 = time.perf_counter()
+        caption = await caption_video(video, caption_mode)
+        seconds = time.perf_counter() - t0
+        caption_seconds.observe(seconds, kind="video")
+        log_payload("Generated caption from video", caption)
+        return await _plan_from_caption(caption, seconds)
+
+    key = ("video", planning_mode(), caption_mode, _media_digest(video))
+    plan, shared_trace = await plan_flight.do(key, caption_and_plan, TRACED_PLANS)
+    if trace is not None:
+        trace.update(shared_trace)
+    return plan
+
+async def _plan_from_caption(caption: str, seconds: float) -> Tuple[CreativePlan, PlanTrace]:
+    trace = PlanTrace()
+    plan = await plan_from_brief(caption, trace=trace)
+    trace.stage_outputs = {"caption": caption, **trace.stage_outputs}
+    trace.timings = {"caption": round(seconds, 3), **trace.timings}
+    return plan, trace
+
+async def plan_batch(briefs: List[str], concurrency: int, admission: Optional[AdmissionController] = None
+                     ) -> AsyncIterator[Tuple[int, Optional[CreativePlan], Optional[Exception]]]:
+    """
+    Plans many briefs with at most `concurrency` generations running at once.
+    Yields (index, plan, error) tuples in completion order; a failing brief
+    yields its error instead of aborting the batch. With `admission`, each brief
+    also holds one of its slots while it runs, so a shed brief yields an OverloadedError.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(index: int, brief: str):
+        async with semaphore:
+            try:
+                if admission is None:
+                    return index, await coalesced_plan_from_brief(brief), None
+                async with admission.slot():
+                    return index, await coalesced_plan_from_brief(brief), None
+            except Exception as e:
+                logger.exception("Batch item %d failed", index)
+                return index, None, e
+
+    tasks = [asyncio.create_task(run_one(i, brief)) for i, brief in enumerate(briefs)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Client went away or the consumer stopped early: drop the remaining work
+        for task in tasks:
+            task.cancel()
+
+def _validate_plan_field(name: str, value: Any) -> bool:
+    """
+    Checks a single top-level field against its CreativePlan annotation.
+    """
+    if name not in CreativePlan.model_fields:
+        return False
+    try:
+        field_adapter(name).validate_python(value)
+        return True
+    except ValidationError:
+        return False
+
+async def stream_plan_from_brief(user_input: str, mode: Optional[str] = None, deadline: Optional[Deadline] = None,
+                                 trace: Optional[PlanTrace] = None) -> AsyncIterator[Tuple[str, dict]]:
+    """
+    Generates a CreativePlan while yielding progress events as (event, data) pairs:
+
+    - "stage": a chain stage finished ({"stage", "output"})
+    - "token": a chunk of the final JSON plan was streamed ({"text"})
+    - "field": a top-level plan field is complete and valid ({"name", "value"})
+    - "plan":  the fully validated CreativePlan
+    - "error": generation failed ({"detail"})
+
+    Like plan_from_brief, it records the trace and prompt sizes and indexes the plan
+    for near-duplicate briefs. It never serves a near-duplicate's stored plan or
+    prefix itself, since a stream is expected to run and report its stages.
+    """
+    trace = trace if trace is not None else PlanTrace()
+    mode = resolve_mode(mode, deadline)
+    events: asyncio.Queue = asyncio.Queue()
+
+    async def on_stage(stage: str, output: str):
+        await events.put(("stage", {"stage": stage, "output": output}))
+
+    # The ledger is set before the chain task starts so that the task records into it too
+    ledger = PromptLedger()
+    ledger_token = ledger_var.set(ledger)
+    stage_token = None
+    # Run the chain in the background so stage events can be forwarded as they happen
+    prompt_task = asyncio.create_task(build_plan_prompt(user_input, on_stage=on_stage, mode=mode, deadline=deadline,
+                                                        trace=trace))
+    try:
+        while not prompt_task.done() or not events.empty():
+            get_event = asyncio.create_task(events.get())
+            done, _ = await asyncio.wait({get_event, prompt_task}, return_when=asyncio.FIRST_COMPLETED)
+            if get_event in done:
+                yield get_event.result()
+            else:
+                get_event.cancel()
+
+        prompt = prompt_task.result()
+        log_payload("Generated prompt", prompt)
+
+        # Stream the final JSON plan, forwarding each field once it is complete
+        fields = JSONFieldStream()
+        chunks = []
+        stage_token = stage_var.set(JSON_DRAFT_STAGE)
+        t0 = time.perf_counter()
+        async for text in stream_creative_response(prompt):
+            chunks.append(text)
+            yield "token", {"text": text}
+            for name, value in fields.feed(text):
+                if _validate_plan_field(name, value):
+                    yield "field", {"name": name, "value": value}
+        draft_seconds = time.perf_counter() - t0
+        stage_latencies.observe(JSON_DRAFT_STAGE, draft_seconds)
+        stage_seconds.observe(draft_seconds, stage=JSON_DRAFT_STAGE)
+        trace.stages_run.append(JSON_DRAFT_STAGE)
+        trace.timings[JSON_DRAFT_STAGE] = round(draft_seconds, 3)
+
+        response_text = "".join(chunks)
+        log_payload("Raw LLM response", response_text)
+        plan = await parse_or_repair_plan_response(response_text)
+        trace.prompt_sizes = ledger.summary()
+        if BRIEF_INDEX_ENABLED:
+            _remember_plan(user_input, mode, plan, trace)
+        yield "plan", plan.model_dump()
+    except Exception as e:
+        logger.exception("Error while streaming plan generation")
+        yield "error", {"detail": str(e)}
+    finally:
+        if not prompt_task.done():
+            prompt_task.cancel()
+        if stage_token is not None:
+            stage_var.reset(stage_token)
+        ledger_var.reset(ledger_token)
 
 def plan_from_brief_sync(user_input: str) -> CreativePlan:
     """
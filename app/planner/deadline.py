@@ -0,0 +1,72 @@
+# app/planner/deadline.py
+
+"""
+Latency budgets for plan generation.
+
+A request's latency budget becomes a `Deadline`. Before each skippable chain
+stage, the chain compares the remaining time with the observed latency of that
+stage plus the final JSON drafting call, and skips the stage if it would not fit.
+Stage latencies are tracked as exponentially weighted moving averages.
+"""
+
+import re
+import time
+from typing import Dict, Iterable, Optional
+
+# Name under which the final JSON-drafting LLM call is tracked
+JSON_DRAFT_STAGE = "json_draft"
+
+# Initial estimates (seconds) used until a stage has been observed
+DEFAULT_STAGE_SECONDS = 5.0
+DEFAULT_JSON_DRAFT_SECONDS = 12.0
+
+
+class Deadline:
+    def __init__(self, budget_seconds: float):
+        self.budget_seconds = budget_seconds
+        self.expires_at = time.monotonic() + budget_seconds
+
+    @classmethod
+    def from_budget_ms(cls, budget_ms: Optional[int]) -> Optional["Deadline"]:
+        return cls(budget_ms / 1000) if budget_ms else None
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def can_fit(self, seconds: float) -> bool:
+        return self.remaining() >= seconds
+
+
+def base_stage(stage: str) -> str:
+    """
+    Strips a fan-out suffix: "idea_3" -> "idea".
+    """
+    return re.sub(r"_\d+$", "", stage)
+
+
+class StageLatencies:
+    """
+    Moving averages of observed per-stage latency.
+    Fan-out nodes ("idea_0", "idea_1", ...) share their base name's estimate.
+    """
+
+    def __init__(self, alpha: float = 0.3):
+        self.alpha = alpha
+        self._estimates: Dict[str, float] = {}
+
+    def observe(self, stage: str, seconds: float) -> None:
+        stage = base_stage(stage)
+        previous = self._estimates.get(stage)
+        self._estimates[stage] = seconds if previous is None else (1 - self.alpha) * previous + self.alpha * seconds
+
+    def expected(self, stage: str) -> float:
+        stage = base_stage(stage)
+        default = DEFAULT_JSON_DRAFT_SECONDS if stage == JSON_DRAFT_STAGE else DEFAULT_STAGE_SECONDS
+        return self._estimates.get(stage, default)
+
+    def expected_total(self, stages: Iterable[str]) -> float:
+        return sum(self.expected(stage) for stage in stages)
+
+
+# Shared process-wide latency estimates
+stage_latencies = StageLatencies()
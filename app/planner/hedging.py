@@ -0,0 +1,101 @@
+# app/planner/hedging.py
+
+"""
+Hedged requests for tail latency.
+
+If a call has not returned after a delay derived from recent latencies (e.g. the
+p90 for that provider/model), a duplicate is sent to the same or an alternate
+provider/model. Whichever answers first wins and the other is cancelled.
+"""
+
+import asyncio
+from typing import Optional
+
+from app.settings import get_settings
+from app.logger import logger
+from app.planner.providers import LLMProvider, Prompt, call_provider, get_provider, latency_tracker
+
+# Hedging configuration (overridable through the environment)
+HEDGE_ENABLED = get_settings().hedge_enabled
+HEDGE_PERCENTILE = get_settings().hedge_percentile
+HEDGE_MIN_SAMPLES = get_settings().hedge_min_samples
+HEDGE_DEFAULT_DELAY = get_settings().hedge_default_delay  # used until enough samples exist
+HEDGE_MIN_DELAY = get_settings().hedge_min_delay
+# Where to send the duplicate, as "provider" or "provider:model" (default: same provider and model)
+HEDGE_ALTERNATE = get_settings().hedge_alternate
+
+
+class HedgeStats:
+    def __init__(self):
+        self.fired = 0   # duplicates sent
+        self.won = 0     # duplicates that answered first
+
+    def as_dict(self) -> dict:
+        return {"fired": self.fired, "won": self.won}
+
+
+hedge_stats = HedgeStats()
+
+def hedge_delay(provider: LLMProvider, model: str) -> float:
+    """
+    Seconds to wait before hedging a call to `provider`/`model`.
+    """
+    key = f"{provider.name}/{model}"
+    if latency_tracker.count(key) < HEDGE_MIN_SAMPLES:
+        return HEDGE_DEFAULT_DELAY
+    return max(HEDGE_MIN_DELAY, latency_tracker.percentile(key, HEDGE_PERCENTILE))
+
+def _alternate(provider: LLMProvider, model: str):
+    if not HEDGE_ALTERNATE:
+        return provider, model
+    name, _, alt_model = HEDGE_ALTERNATE.partition(":")
+    alt_provider = get_provider(name)
+    return alt_provider, alt_model or alt_provider.default_model
+
+async def hedged_call(provider: LLMProvider, prompt: Prompt, model: Optional[str] = None,
+                      config: Optional[dict] = None, delay: Optional[float] = None) -> str:
+    """
+    Calls the provider, sending a hedge after `delay` (default: percentile-based)
+    if no answer has arrived. Returns the first successful response.
+    """
+    model = model or provider.default_model
+    if delay is None:
+        delay = hedge_delay(provider, model)
+
+    primary = asyncio.create_task(call_provider(provider, prompt, model, config))
+    tasks = {primary}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if primary in done:
+            return primary.result()
+
+        alt_provider, alt_model = _alternate(provider, model)
+        logger.info("Hedging %s/%s after %.2fs -> %s/%s", provider.name, model, delay, alt_provider.name, alt_model)
+        hedge_stats.fired += 1
+        backup = asyncio.create_task(call_provider(alt_provider, prompt, alt_model, config))
+        tasks.add(backup)
+
+        pending = set(tasks)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is backup:
+                        hedge_stats.won += 1
+                    return task.result()
+                error = error or task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+async def generate(provider: LLMProvider, prompt: Prompt, model: Optional[str] = None,
+                   config: Optional[dict] = None) -> str:
+    """
+    Single entry point for non-streaming provider calls; hedges when HEDGE_ENABLED.
+    """
+    if HEDGE_ENABLED:
+        return await hedged_call(provider, prompt, model, config)
+    return await call_provider(provider, prompt, model, config)
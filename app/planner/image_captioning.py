@@ -1,17 +1,17 @@
 # app/planner/image_captioning.py
 
-import os
-from io import BytesIO
-from PIL import Image
-from dotenv import load_dotenv
-import google.generativeai as genai
+from typing import Union
 
-# Load Gemini API key from environment
-load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+from app.logger import logger
+from app.planner.admission import OverloadedError
+from app.planner.image_preprocess import caption_cache, prepare_image
+from app.planner.model_tiers import model_tiers
+from app.planner.providers import get_provider, call_provider
+from app.uploads import SpooledUpload
 
-# Initialize multimodal Gemini model
-model = genai.GenerativeModel("gemini-2.5-pro")  # or "gemini-2.0-flash" for faster responses
+# Multimodal provider and model used for image captioning (the "caption_image" model tier overrides the model)
+CAPTION_PROVIDER = "gemini"
+CAPTION_MODEL = "gemini-2.5-pro"  # or "gemini-2.0-flash" for faster responses
 
 # Prompt to guide the model's image captioning behavior
 IMAGE_CAPTION_PROMPT = (
@@ -19,14 +19,34 @@ IMAGE_CAPTION_PROMPT = (
     "Be sure to mention visual styles, emotions conveyed, and any other important info you can glean from the image."
 )
 
-async def caption_image(image_bytes: bytes) -> str:
+async def caption_image(image: Union[bytes, SpooledUpload]) -> str:
     """
     Asynchronously generates a creative caption for an image using Gemini.
-    Expects image bytes (e.g. from an upload or stream).
+    Expects image bytes or a spooled upload. The image is decoded and downscaled off
+    the event loop, and a perceptually identical image reuses its cached caption.
     """
     try:
-        image = Image.open(BytesIO(image_bytes)).convert("RGB")
-        response = await model.generate_content_async([image, IMAGE_CAPTION_PROMPT])
-        return response.text.strip()
+        if isinstance(image, SpooledUpload):
+            image.file.seek(0)
+            source = image.file
+        else:
+            source = image
+        prepared = await prepare_image(source)
+
+        model, config = model_tiers.resolve("caption_image", CAPTION_MODEL)
+        namespace = f"{CAPTION_PROVIDER}/{model}"
+        cached = caption_cache.get(namespace, prepared.dhash)
+        if cached is not None:
+            logger.info("Reusing cached caption for image hash %016x", prepared.dhash)
+            return cached
+
+        logger.info("Captioning image downscaled from %s to %s", prepared.original_size, prepared.size)
+        part = {"inline_data": {"data": prepared.jpeg, "mime_type": "image/jpeg"}}
+        caption = await call_provider(get_provider(CAPTION_PROVIDER), [part, IMAGE_CAPTION_PROMPT], model, config)
+        caption_cache.set(namespace, prepared.dhash, caption)
+        return caption
+    except OverloadedError:
+        # Shed load (open circuit) fails the request instead of becoming the caption
+        raise
     except Exception as e:
         return f"[Gemini Error] Failed to caption image: {e}"
@@ -0,0 +1,170 @@
+# app/planner/image_preprocess.py
+
+"""
+Image preprocessing for captioning, run off the event loop.
+
+Decoding a large photo can take hundreds of milliseconds of CPU, so it runs in a
+small thread pool (Pillow releases the GIL while decoding and resizing). Each
+image is decoded at reduced scale when the format supports it (JPEG draft mode),
+rotated according to its EXIF orientation, downscaled to IMAGE_MAX_EDGE, and
+re-encoded as JPEG for the vision model.
+
+A 64-bit difference hash (dHash) of the result identifies visually identical
+images across re-uploads, re-encodes, and resizes. `PerceptualCaptionCache` uses it
+to reuse a caption instead of calling the vision model again.
+"""
+
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from io import BytesIO
+from typing import BinaryIO, Callable, Dict, Optional, Tuple, TypeVar, Union
+
+from PIL import Image, ImageOps
+
+from app.settings import get_settings
+
+# Longest edge (pixels) of the image sent to the vision model
+IMAGE_MAX_EDGE = get_settings().image_max_edge
+IMAGE_JPEG_QUALITY = 90
+IMAGE_PREPROCESS_WORKERS = get_settings().image_preprocess_workers
+
+# Captions are reused for images whose dHashes differ by at most this many bits
+CAPTION_CACHE_MAX_DISTANCE = get_settings().caption_cache_max_distance
+CAPTION_CACHE_MAX_ENTRIES = get_settings().caption_cache_max_entries
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+T = TypeVar("T")
+
+
+@dataclass
+class PreparedImage:
+    """
+    A decoded, oriented and downscaled image ready for captioning.
+    """
+    jpeg: bytes
+    size: Tuple[int, int]
+    original_size: Tuple[int, int]
+    dhash: int
+
+
+def dhash(image: Image.Image, hash_size: int = 8) -> int:
+    """
+    Difference hash: compares horizontally adjacent pixels of a tiny grayscale
+    thumbnail. Robust to re-encoding, resizing and small color changes.
+    """
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def preprocess_image(source: Union[bytes, BinaryIO], max_edge: int = IMAGE_MAX_EDGE) -> PreparedImage:
+    """
+    Decodes, orients and downscales an image. Blocking; call via `prepare_image`.
+    """
+    image = Image.open(BytesIO(source) if isinstance(source, bytes) else source)
+    original_size = image.size
+
+    # JPEG can decode directly at 1/2, 1/4 or 1/8 scale, skipping most of the work
+    image.draft("RGB", (max_edge, max_edge))
+    image = ImageOps.exif_transpose(image)
+    return prepare_decoded(image, max_edge, original_size)
+
+
+def prepare_decoded(image: Image.Image, max_edge: int = IMAGE_MAX_EDGE,
+                    original_size: Optional[Tuple[int, int]] = None, image_hash: Optional[int] = None) -> PreparedImage:
+    """
+    Downscales an already decoded image and encodes it as JPEG. Blocking.
+    A precomputed `image_hash` (dHash) is reused instead of hashing again.
+    """
+    original_size = original_size or image.size
+    image = image.convert("RGB")
+    image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+
+    buffer = BytesIO()
+    image.save(buffer, format="JPEG", quality=IMAGE_JPEG_QUALITY)
+    return PreparedImage(jpeg=buffer.getvalue(), size=image.size, original_size=original_size,
+                         dhash=image_hash if image_hash is not None else dhash(image))
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=IMAGE_PREPROCESS_WORKERS, thread_name_prefix="image-preprocess")
+    return _executor
+
+
+async def run_in_pool(func: Callable[..., T], *args) -> T:
+    """
+    Runs a blocking media-processing function in the shared preprocessing thread pool.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), func, *args)
+
+
+async def prepare_image(source: Union[bytes, BinaryIO], max_edge: int = IMAGE_MAX_EDGE) -> PreparedImage:
+    """
+    Runs `preprocess_image` in the preprocessing thread pool.
+    """
+    return await run_in_pool(preprocess_image, source, max_edge)
+
+
+class PerceptualCaptionCache:
+    """
+    LRU cache of captions keyed by (namespace, dHash). Lookups match exactly first,
+    then fall back to the nearest stored hash within `max_distance` bits.
+    """
+
+    def __init__(self, max_entries: int = CAPTION_CACHE_MAX_ENTRIES, max_distance: int = CAPTION_CACHE_MAX_DISTANCE):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self._entries: "OrderedDict[Tuple[str, int], str]" = OrderedDict()
+        self._stats = {"hits": 0, "near_hits": 0, "misses": 0}
+
+    def get(self, namespace: str, image_hash: int) -> Optional[str]:
+        key = (namespace, image_hash)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return self._entries[key]
+
+        best_key, best_distance = None, self.max_distance + 1
+        for stored_namespace, stored_hash in self._entries:
+            if stored_namespace == namespace:
+                distance = hamming_distance(stored_hash, image_hash)
+                if distance < best_distance:
+                    best_key, best_distance = (stored_namespace, stored_hash), distance
+        if best_key is None:
+            self._stats["misses"] += 1
+            return None
+        self._entries.move_to_end(best_key)
+        self._stats["near_hits"] += 1
+        return self._entries[best_key]
+
+    def set(self, namespace: str, image_hash: int, caption: str) -> None:
+        key = (namespace, image_hash)
+        self._entries[key] = caption
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._stats, "entries": len(self._entries)}
+
+
+caption_cache = PerceptualCaptionCache()
@@ -0,0 +1,286 @@
+# app/planner/json_repair.py
+
+"""
+Tolerant extraction, local repair and field-by-field validation of LLM plan output.
+
+LLM responses often wrap the plan in prose or code fences, use smart or single
+quotes, leave trailing commas, or get cut off mid-object. This module:
+
+1. extracts the first balanced JSON object from (possibly streamed) text,
+2. repairs common defects locally without another model call,
+3. validates against CreativePlan one field at a time, coercing or dropping
+   optional fields instead of rejecting the whole plan.
+
+Outcomes are counted in `repair_stats` so the failure rate can be tracked.
+"""
+
+import json
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import TypeAdapter, ValidationError
+
+from app.models import CreativePlan
+
+# Counts of parse outcomes: "clean", "local_repair", "llm_repair", "failed"
+repair_stats: Counter = Counter()
+
+SMART_QUOTES = {"“": '"', "”": '"', "„": '"', "″": '"', "‘": "'", "’": "'"}
+
+# Bare literals completed when the output is cut off inside one
+LITERALS = ("true", "false", "null")
+
+CLOSERS = {"{": "}", "[": "]"}
+
+
+class JSONRepairError(ValueError):
+    """Raised when no usable plan object can be recovered from the text."""
+
+
+class JSONExtractor:
+    """
+    Incrementally locates the first JSON object in streamed text.
+    `feed()` returns True once the object's closing brace has arrived.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._start: Optional[int] = None
+        self._end: Optional[int] = None
+        self._pos = 0
+        self._stack: List[str] = []
+        self._quote: Optional[str] = None
+        self._escape = False
+
+    @property
+    def complete(self) -> bool:
+        return self._end is not None
+
+    def feed(self, chunk: str) -> bool:
+        self._text += chunk
+        while self._pos < len(self._text) and self._end is None:
+            ch = self._text[self._pos]
+            if self._start is None:
+                if ch == "{":
+                    self._start = self._pos
+                    self._stack.append("{")
+            elif self._quote is not None:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == self._quote:
+                    self._quote = None
+            elif ch == '"' or (ch == "'" and _opens_single_quote(self._text, self._pos)):
+                self._quote = ch
+            elif ch in CLOSERS:
+                self._stack.append(ch)
+            elif ch in "}]" and self._stack:
+                self._stack.pop()
+                if not self._stack:
+                    self._end = self._pos + 1
+            self._pos += 1
+        return self.complete
+
+    def candidate(self) -> Optional[str]:
+        """
+        The extracted object: balanced if complete, otherwise everything from the first '{'.
+        """
+        if self._start is None:
+            return None
+        return self._text[self._start:self._end]
+
+
+def _opens_single_quote(text: str, pos: int) -> bool:
+    """
+    True if a ' at `pos` (outside any string) starts a single-quoted JSON-ish string,
+    i.e. it follows a structural character rather than sitting inside a bare word.
+    """
+    before = text[:pos].rstrip()
+    return not before or before[-1] in "{[,:"
+
+
+def extract_json_object(text: str) -> Optional[str]:
+    """
+    Returns the first JSON object in `text` (possibly truncated), or None if there is none.
+    """
+    extractor = JSONExtractor()
+    extractor.feed(text)
+    return extractor.candidate()
+
+
+def repair_json(candidate: str) -> str:
+    """
+    Locally repairs common LLM JSON defects: smart-quoted or single-quoted strings,
+    trailing commas, an unterminated final string, a truncated true/false/null, a
+    dangling key or comma, and missing closing brackets. Smart quotes are only
+    treated as delimiters outside strings; inside a string they are content.
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    quote: Optional[str] = None   # the plain quote (" or ') of the open string
+    closers = ""                  # characters that end the open string
+    escape = False
+
+    for i, ch in enumerate(candidate):
+        if quote is not None:
+            if escape:
+                escape = False
+                out.append(ch)
+            elif ch == "\\":
+                escape = True
+                out.append(ch)
+            elif ch in closers:
+                quote = None
+                out.append('"')
+            elif ch == '"' and quote == "'":
+                out.append('\\"')  # double quote inside a single-quoted string
+            elif ch == "\n":
+                out.append("\\n")
+            else:
+                out.append(ch)
+        elif (plain := SMART_QUOTES.get(ch, ch)) == '"' or (plain == "'" and _opens_single_quote(candidate, i)):
+            quote = plain
+            closers = _string_closers(ch)
+            out.append('"')
+        elif ch in CLOSERS:
+            stack.append(CLOSERS[ch])
+            out.append(ch)
+        elif ch in "}]":
+            _strip_trailing_comma(out)
+            if stack:
+                stack.pop()
+            out.append(ch)
+            if not stack:
+                break
+        else:
+            out.append(ch)
+
+    # Truncated output: close the open string, drop dangling separators, close brackets
+    if quote is not None:
+        if escape:
+            out.pop()
+        out.append('"')
+    text = "".join(out).rstrip()
+    partial = re.search(r"(?<=[\[:,\s])[a-z]+$", text)
+    if partial:
+        text = text[:partial.start()] + next((lit for lit in LITERALS if lit.startswith(partial.group())), "")
+    text = re.sub(r',\s*"[^"]*"\s*:\s*$', "", text)   # dangling `, "key":`
+    text = re.sub(r'\{\s*"[^"]*"\s*:\s*$', "{", text)  # dangling `{ "key":`
+    text = re.sub(r"[,:]\s*$", "", text)
+    return text + "".join(reversed(stack))
+
+
+def _string_closers(opener: str) -> str:
+    """
+    The characters that end a string opened by `opener`: a plain quote only by itself,
+    a smart quote by any quote of the same kind, smart or plain.
+    """
+    plain = SMART_QUOTES.get(opener, opener)
+    if opener == plain:
+        return plain
+    return plain + "".join(smart for smart, kind in SMART_QUOTES.items() if kind == plain)
+
+
+def _strip_trailing_comma(out: List[str]) -> None:
+    i = len(out) - 1
+    while i >= 0 and out[i].isspace():
+        i -= 1
+    if i >= 0 and out[i] == ",":
+        del out[i]
+
+
+def _coerce(value: Any, annotation: Any) -> Any:
+    """
+    Converts the common near-misses: a string where a list is expected and vice versa.
+    """
+    wants_list = "List" in str(annotation) or "list" in str(annotation)
+    if wants_list and isinstance(value, str):
+        return [part.strip() for part in re.split(r"\n|;", value) if part.strip()] or [value]
+    if not wants_list and isinstance(value, list):
+        return "; ".join(str(v) for v in value)
+    return value
+
+
+@lru_cache(maxsize=None)
+def field_adapter(name: str) -> TypeAdapter:
+    """
+    Cached TypeAdapter for a CreativePlan field; building one is far slower than using it.
+    """
+    return TypeAdapter(CreativePlan.model_fields[name].annotation)
+
+
+def validate_plan_fields(data: Dict[str, Any]) -> Tuple[CreativePlan, List[str]]:
+    """
+    Validates each CreativePlan field on its own. Invalid values are coerced where
+    possible; invalid optional fields are dropped. Returns the plan and the names of
+    fields that had to be fixed. Raises JSONRepairError if a required field is unusable.
+    """
+    clean: Dict[str, Any] = {}
+    fixed: List[str] = []
+    for name, field in CreativePlan.model_fields.items():
+        if name not in data or data[name] is None:
+            if field.is_required():
+                raise JSONRepairError(f"Required field {name!r} is missing")
+            continue
+        adapter = field_adapter(name)
+        try:
+            clean[name] = adapter.validate_python(data[name])
+            continue
+        except ValidationError:
+            pass
+        try:
+            clean[name] = adapter.validate_python(_coerce(data[name], field.annotation))
+            fixed.append(name)
+        except ValidationError:
+            if field.is_required():
+                raise JSONRepairError(f"Required field {name!r} has an invalid value: {data[name]!r}")
+            fixed.append(name)
+    return CreativePlan(**clean), fixed
+
+
+def parse_plan_locally(text: str) -> Tuple[CreativePlan, str]:
+    """
+    Extracts, repairs and validates a plan without calling a model.
+    Returns (plan, outcome) with outcome "clean" or "local_repair".
+    Raises JSONRepairError if local repair is not enough.
+    """
+    candidate = extract_json_object(text)
+    if candidate is None:
+        raise JSONRepairError("No JSON object found in LLM response")
+
+    outcome = "clean"
+    try:
+        data = json.loads(candidate)
+    except json.JSONDecodeError:
+        outcome = "local_repair"
+        try:
+            data = json.loads(repair_json(candidate))
+        except json.JSONDecodeError as e:
+            raise JSONRepairError(f"Could not repair LLM JSON locally: {e}")
+
+    if not isinstance(data, dict):
+        raise JSONRepairError("LLM JSON is not an object")
+    plan, fixed = validate_plan_fields(data)
+    if fixed:
+        outcome = "local_repair"
+    return plan, outcome
+
+
+def repair_prompt(broken_json: str) -> str:
+    """
+    A small, targeted prompt asking a model to fix only the broken JSON.
+    """
+    fields = ", ".join(
+        f"{name} ({'required' if field.is_required() else 'optional'})"
+        for name, field in CreativePlan.model_fields.items()
+    )
+    return (
+        "The following JSON is malformed or incomplete. Fix it so it is a single valid JSON object "
+        f"with these fields: {fields}. String fields are strings; list fields are lists of strings. "
+        "Keep the existing content; only fill in what is missing.\n\n"
+        f"{broken_json}\n\n"
+        "Respond only with the corrected JSON object."
+    )
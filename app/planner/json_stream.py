@@ -0,0 +1,77 @@
+# app/planner/json_stream.py
+
+"""
+Incremental parsing of a streamed JSON object.
+
+The LLM streams the final plan token by token. `JSONFieldStream` scans the text
+as it arrives and yields each top-level `"key": value` pair as soon as its value
+is complete, so callers can forward validated fields before the object closes.
+"""
+
+import json
+from typing import Any, List, Tuple
+
+
+class JSONFieldStream:
+    """
+    Feed text chunks with `feed()`; completed top-level fields are returned in order.
+    Anything before the first '{' (e.g. a Markdown code fence) is ignored.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0               # next character to scan
+        self._field_start = None    # start of the current top-level field (None before "{")
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.closed = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Consumes a chunk of streamed text and returns any newly completed fields.
+        """
+        self._buffer += chunk
+        completed = []
+
+        while self._pos < len(self._buffer) and not self.closed:
+            ch = self._buffer[self._pos]
+
+            if self._field_start is None:
+                # Still in preamble: wait for the opening brace
+                if ch == "{":
+                    self._depth = 1
+                    self._field_start = self._pos + 1
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                if self._depth == 1:
+                    completed.extend(self._complete_field(self._pos))
+                    self.closed = True
+                self._depth -= 1
+            elif ch == "," and self._depth == 1:
+                completed.extend(self._complete_field(self._pos))
+                self._field_start = self._pos + 1
+
+            self._pos += 1
+
+        return completed
+
+    def _complete_field(self, end: int) -> List[Tuple[str, Any]]:
+        segment = self._buffer[self._field_start:end].strip()
+        if not segment:
+            return []
+        try:
+            return list(json.loads("{" + segment + "}").items())
+        except json.JSONDecodeError:
+            # Malformed field: leave it to the final full-document parse to report
+            return []
@@ -0,0 +1,227 @@
+# app/planner/llm_cache.py
+
+"""
+Two-tier, content-addressed cache for LLM responses.
+
+Keys are derived from the model name, the generation settings and a hash of the
+prompt. Lookups hit a small in-process LRU first (bounded by size and TTL) and
+fall back to an on-disk SQLite table that survives restarts. With a shared state
+backend (see shared_state.py) the second tier lives there instead, so every
+worker process sees every other worker's responses.
+
+The second tier does blocking I/O, so async callers use `aget`/`aset`, which run
+it in a worker thread. Expired SQLite rows are skipped on read and purged at most
+once per CACHE_PURGE_INTERVAL, not on every write.
+"""
+
+import asyncio
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from app.settings import get_settings
+from app.shared_state import SHARED_STATE_BACKEND, SharedState, shared_state
+
+# Cache configuration (overridable through the environment)
+CACHE_ENABLED = get_settings().llm_cache_enabled
+CACHE_MAX_ENTRIES = get_settings().llm_cache_max_entries
+CACHE_TTL_SECONDS = get_settings().llm_cache_ttl_seconds
+CACHE_DB_PATH = get_settings().llm_cache_path
+CACHE_PURGE_INTERVAL = get_settings().llm_cache_purge_interval
+
+
+def make_cache_key(model_name: str, settings: Optional[dict], prompt: str) -> str:
+    """
+    Builds a stable content address from model name, generation settings and prompt.
+    """
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    settings_json = json.dumps(settings or {}, sort_keys=True, default=str)
+    material = f"{model_name}\x00{settings_json}\x00{prompt_hash}"
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    In-process LRU tier backed by an optional SQLite tier, or by `shared` state.
+    Both tiers expire entries after `ttl_seconds` by `clock` (seconds since the epoch).
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl_seconds: float = CACHE_TTL_SECONDS,
+                 db_path: Optional[str] = CACHE_DB_PATH, shared: Optional[SharedState] = None,
+                 purge_interval: float = CACHE_PURGE_INTERVAL, clock: Callable[[], float] = time.time):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self.shared = shared
+        self.purge_interval = purge_interval
+        self.clock = clock
+        self._memory: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()      # in-process tier
+        self._db_lock = threading.Lock()   # SQLite connection, used from worker threads
+        self._db: Optional[sqlite3.Connection] = None
+        self._last_purge = 0.0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    # ---------- SQLite tier ----------
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self.db_path is None:
+            return None
+        if self._db is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=10)
+            # Several worker processes may share the file
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.commit()
+        return self._db
+
+    def _disk_get(self, key: str, now: float) -> Optional[str]:
+        """
+        Reads the second tier. Blocking.
+        """
+        if self.shared is not None:
+            return self.shared.get(f"llm:{key}")
+        with self._db_lock:
+            db = self._connect()
+            if db is None:
+                return None
+            row = db.execute("SELECT value FROM llm_cache WHERE key = ? AND created_at >= ?",
+                             (key, now - self.ttl_seconds)).fetchone()
+        return row[0] if row is not None else None
+
+    def _disk_set(self, key: str, value: str, now: float) -> None:
+        """
+        Writes the second tier, purging expired rows if the last purge is old enough. Blocking.
+        """
+        if self.shared is not None:
+            self.shared.set(f"llm:{key}", value, self.ttl_seconds)
+            return
+        with self._db_lock:
+            db = self._connect()
+            if db is None:
+                return
+            db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at) VALUES (?, ?, ?)",
+                (key, value, now),
+            )
+            if now - self._last_purge >= self.purge_interval:
+                self._last_purge = now
+                db.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+            db.commit()
+
+    # ---------- Public API ----------
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Returns the cached value for `key`, or None on a miss.
+        Disk hits are promoted into the in-process tier. Blocking; see `aget`.
+        """
+        now = self.clock()
+        value = self._memory_get(key, now)
+        if value is not None:
+            return value
+        return self._promote(key, self._disk_get(key, now), now)
+
+    def set(self, key: str, value: str) -> None:
+        """
+        Stores `value` in both tiers. Blocking; see `aset`.
+        """
+        now = self.clock()
+        with self._lock:
+            self._remember(key, value, now)
+        self._disk_set(key, value, now)
+
+    async def aget(self, key: str) -> Optional[str]:
+        """
+        Like `get`, but reads the second tier in a worker thread.
+        """
+        now = self.clock()
+        value = self._memory_get(key, now)
+        if value is not None:
+            return value
+        return self._promote(key, await asyncio.to_thread(self._disk_get, key, now), now)
+
+    async def aset(self, key: str, value: str) -> None:
+        """
+        Like `set`, but writes the second tier in a worker thread.
+        """
+        now = self.clock()
+        with self._lock:
+            self._remember(key, value, now)
+        await asyncio.to_thread(self._disk_set, key, value, now)
+
+    def clear(self) -> None:
+        """
+        Drops every entry from both tiers and resets counters.
+        Entries in shared state are left to expire, since other workers may still use them.
+        """
+        with self._lock:
+            self._memory.clear()
+            self.memory_hits = self.disk_hits = self.misses = 0
+        if self.shared is None:
+            with self._db_lock:
+                db = self._connect()
+                if db is not None:
+                    db.execute("DELETE FROM llm_cache")
+                    db.commit()
+
+    def stats(self) -> dict:
+        """
+        Returns hit/miss counters and the current in-process tier size.
+        """
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "memory_entries": len(self._memory),
+        }
+
+    def _memory_get(self, key: str, now: float) -> Optional[str]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if now - stored_at > self.ttl_seconds:
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return value
+
+    def _promote(self, key: str, value: Optional[str], now: float) -> Optional[str]:
+        """
+        Counts a second-tier lookup and copies a hit into the in-process tier.
+        """
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self._remember(key, value, now)
+            self.disk_hits += 1
+            return value
+
+    def _remember(self, key: str, value: str, now: float) -> None:
+        self._memory[key] = (now, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+
+# Shared process-wide cache used by the LLM wrappers
+llm_cache = LLMCache(shared=shared_state if SHARED_STATE_BACKEND != "local" else None)
@@ -1,19 +1,95 @@
 # app/planner/llm_gemini.py
 
-import os
-from dotenv import load_dotenv
-import google.generativeai as genai
+import time
+from typing import AsyncIterator, Optional, Tuple
 
-# Load API key from environment
-load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+from app.logger import stage_var
+from app.metrics import record_llm_call
+from app.planner.circuit_breaker import get_breaker
+from app.planner.llm_cache import llm_cache, make_cache_key, CACHE_ENABLED
+from app.planner.model_tiers import model_tiers
+from app.planner.prompt_accounting import record_prompt
+from app.planner.providers import get_provider
+from app.planner.rate_limit import get_rate_limiter, estimate_tokens
+from app.planner import hedging
+from app.settings import get_settings
 
-# Initialize Gemini model (can be swapped out or configured later)
-model = genai.GenerativeModel("models/gemini-1.5-pro-latest")
+# Provider and model used for creative text generation (Gemini by default; see providers.py).
+# Individual stages can use other models and settings through MODEL_TIERS (see model_tiers.py).
+TEXT_PROVIDER = get_settings().llm_provider
+MODEL_NAME = get_settings().llm_model  # None = the provider's default model
+GENERATION_CONFIG = {}
 
-async def generate_creative_response(prompt: str) -> str:
+def _stage_settings() -> Tuple[Optional[str], Optional[dict]]:
     """
-    Asynchronously sends a prompt to Gemini and returns the plain text response.
+    The model and generation config for the stage currently running.
     """
-    response = await model.generate_content_async(prompt)
-    return response.text.strip()
\ No newline at end of file
+    return model_tiers.resolve(stage_var.get(), MODEL_NAME, GENERATION_CONFIG)
+
+def _cache_key(provider, prompt: str, model: Optional[str], config: Optional[dict]) -> str:
+    model_name = f"{provider.name}/{model or provider.default_model}"
+    return make_cache_key(model_name, config, prompt)
+
+async def generate_creative_response(prompt: str, use_cache: bool = True) -> str:
+    """
+    Asynchronously sends a prompt to the text provider and returns the plain text response.
+    Identical prompts are served from the LLM response cache unless `use_cache` is False
+    (e.g. for creative stages that want a fresh sample).
+    """
+    provider = get_provider(TEXT_PROVIDER)
+    model, config = _stage_settings()
+    cache_key = None
+    if use_cache and CACHE_ENABLED:
+        cache_key = _cache_key(provider, prompt, model, config)
+        cached = await llm_cache.aget(cache_key)
+        if cached is not None:
+            return cached
+
+    text = await hedging.generate(provider, prompt, model, config)
+    record_prompt(stage_var.get(), prompt, text, provider.name, model or provider.default_model)
+
+    if cache_key is not None:
+        await llm_cache.aset(cache_key, text)
+    return text
+
+async def stream_creative_response(prompt: str, use_cache: bool = True) -> AsyncIterator[str]:
+    """
+    Streams the text provider's response to a prompt as text chunks.
+    A cached response is yielded as a single chunk; a completed stream is written back to the cache.
+    """
+    provider = get_provider(TEXT_PROVIDER)
+    stage_model, config = _stage_settings()
+    cache_key = None
+    if use_cache and CACHE_ENABLED:
+        cache_key = _cache_key(provider, prompt, stage_model, config)
+        cached = await llm_cache.aget(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+    chunks = []
+    model = stage_model or provider.default_model
+    breaker = get_breaker(provider.name, model)
+    limiter = get_rate_limiter(provider.name)
+    breaker.before_call()
+    try:
+        # Inside the try, so a half-open probe cancelled while it waits for the limit is given back
+        if limiter is not None:
+            await limiter.acquire(estimate_tokens(prompt))
+        t0 = time.perf_counter()
+        async for text in provider.stream(prompt, stage_model, config):
+            chunks.append(text)
+            yield text
+    except Exception:
+        breaker.record_failure()
+        raise
+    except BaseException:
+        # Cancelled or closed early by the consumer
+        breaker.record_abandoned()
+        raise
+    breaker.record_success()
+    record_llm_call(provider.name, model, prompt, "".join(chunks), time.perf_counter() - t0)
+    record_prompt(stage_var.get(), prompt, "".join(chunks), provider.name, model)
+
+    if cache_key is not None:
+        await llm_cache.aset(cache_key, "".join(chunks).strip())
@@ -1,12 +1,29 @@
 # app/planner/llm_openai.py
 
-import os
-from dotenv import load_dotenv
-from openai import AsyncOpenAI
+from typing import List
 
-# Load OpenAI API key from environment
-load_dotenv()
-client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from app.planner.providers import get_provider, call_provider, call_provider_many
+
+# Provider, model and sampling settings for surprise briefs
+SURPRISE_PROVIDER = "openai"
+SURPRISE_MODEL = "gpt-4"
+SURPRISE_CONFIG = {
+    "system": (
+        "You are a highly original idea generator for short-form videos. "
+        "You must avoid repeating themes or concepts across responses."
+    ),
+    "temperature": 1.7,
+    "max_tokens": 60,
+    "top_p": 0.9,
+    "frequency_penalty": 0.8,
+    "presence_penalty": 1.3,
+}
+
+SURPRISE_PROMPT = (
+    "Generate a **one-sentence** brief for a fun, out-of-the-box, creative short-form video concept. "
+    "Avoid common tropes. Surprise me with something unexpected, strange, or genre-defying. "
+    "Be playful, absurd, or uncanny. Limit to 10 words. No quotes, no explanation — just the brief."
+)
 
 async def generate_surprise_brief() -> str:
     """
@@ -14,31 +31,16 @@ async def generate_surprise_brief() -> str:
     Avoids common tropes; aims to surprise and delight.
     """
     try:
-        response = await client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You are a highly original idea generator for short-form videos. "
-                        "You must avoid repeating themes or concepts across responses."
-                    ),
-                },
-                {
-                    "role": "user",
-                    "content": (
-                        "Generate a **one-sentence** brief for a fun, out-of-the-box, creative short-form video concept. "
-                        "Avoid common tropes. Surprise me with something unexpected, strange, or genre-defying. "
-                        "Be playful, absurd, or uncanny. Limit to 10 words. No quotes, no explanation — just the brief."
-                    ),
-                },
-            ],
-            temperature=1.7,
-            max_tokens=60,
-            top_p=0.9,
-            frequency_penalty=0.8,
-            presence_penalty=1.3,
-        )
-        return response.choices[0].message.content.strip().strip('"')
+        response = await call_provider(get_provider(SURPRISE_PROVIDER), SURPRISE_PROMPT, SURPRISE_MODEL, SURPRISE_CONFIG)
+        return response.strip('"')
     except Exception as e:
         return f"[OpenAI Error] Failed to generate surprise brief: {e}"
+
+async def generate_surprise_briefs(n: int) -> List[str]:
+    """
+    Generates `n` surprise briefs in one batched request (OpenAI's `n` parameter).
+    Unlike generate_surprise_brief, errors are raised to the caller.
+    """
+    responses = await call_provider_many(get_provider(SURPRISE_PROVIDER), SURPRISE_PROMPT, n,
+                                         SURPRISE_MODEL, SURPRISE_CONFIG)
+    return [response.strip().strip('"').strip() for response in responses]
@@ -0,0 +1,166 @@
+# app/planner/minhash.py
+
+"""
+Near-duplicate text detection with MinHash and locality-sensitive hashing.
+
+A text is reduced to its set of character shingles. The set's MinHash signature
+estimates the Jaccard similarity between two texts. Signatures are split into
+bands: texts sharing any whole band land in the same bucket, so a query only
+compares against a few candidates instead of the whole index. The index is
+bounded and evicts its least recently added or matched entries first.
+"""
+
+import hashlib
+import random
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+from app.planner.singleflight import normalize_brief
+
+# Mersenne prime modulus for the universal hash family
+_PRIME = (1 << 61) - 1
+
+Signature = Tuple[int, ...]
+
+
+def shingles(text: str, size: int = 4) -> Set[str]:
+    """
+    Overlapping character n-grams of the normalized text (the whole text if shorter).
+    """
+    text = normalize_brief(text)
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def word_shingles(text: str, size: int = 3) -> Set[str]:
+    """
+    Character n-grams taken within each word (punctuation dropped). Unlike `shingles`,
+    the result does not depend on word order: "TikTok Gen Z runners" matches "Gen Z runners on TikTok".
+    """
+    words = re.findall(r"\w+", normalize_brief(text))
+    grams = {f" {word} "[i:i + size] for word in words for i in range(len(word) + 3 - size)}
+    return grams or {""}
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    """
+    Computes fixed-length MinHash signatures with a seeded universal hash family.
+    """
+
+    def __init__(self, num_perm: int = 64, shingle_size: int = 4, seed: int = 1,
+                 shingler: Callable[[str, int], Set[str]] = shingles):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.shingler = shingler
+        self._perms = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+
+    def signature(self, text: str) -> Signature:
+        hashes = [
+            int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+            for s in self.shingler(text, self.shingle_size)
+        ]
+        return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in self._perms)
+
+    @staticmethod
+    def similarity(a: Signature, b: Signature) -> float:
+        """
+        Estimated Jaccard similarity: the fraction of matching signature slots.
+        """
+        return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+@dataclass
+class Match:
+    key: Hashable
+    similarity: float
+    value: Any
+
+
+class MinHashIndex:
+    """
+    Bounded LSH index of MinHash signatures. With the default 16 bands of 4 rows,
+    pairs around 0.5 Jaccard similarity or above are very likely to become candidates.
+    """
+
+    def __init__(self, threshold: float = 0.5, num_perm: int = 64, bands: int = 16,
+                 max_entries: int = 1024, hasher: Optional[MinHasher] = None):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_entries = max_entries
+        self.hasher = hasher or MinHasher(num_perm)
+        self._entries: "OrderedDict[Hashable, Tuple[Signature, Any]]" = OrderedDict()
+        self._buckets: List[Dict[Signature, Set[Hashable]]] = [{} for _ in range(bands)]
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def _bands(self, signature: Signature):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows]
+
+    def add(self, key: Hashable, text: str, value: Any = None, signature: Optional[Signature] = None) -> None:
+        """
+        Indexes `text` under `key` (replacing any previous entry), evicting the oldest entries past capacity.
+        """
+        signature = signature or self.hasher.signature(text)
+        self.remove(key)
+        self._entries[key] = (signature, value)
+        for band, rows in self._bands(signature):
+            self._buckets[band].setdefault(rows, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self.remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for band, rows in self._bands(entry[0]):
+            bucket = self._buckets[band].get(rows)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band][rows]
+
+    def query(self, text: str, threshold: Optional[float] = None,
+              signature: Optional[Signature] = None) -> List[Match]:
+        """
+        Indexed entries at or above `threshold` estimated similarity, most similar first.
+        Matched entries are refreshed so they are evicted last.
+        """
+        threshold = self.threshold if threshold is None else threshold
+        signature = signature or self.hasher.signature(text)
+        candidates: Set[Hashable] = set()
+        for band, rows in self._bands(signature):
+            candidates |= self._buckets[band].get(rows, set())
+
+        matches = []
+        for key in candidates:
+            other, value = self._entries[key]
+            similarity = MinHasher.similarity(signature, other)
+            if similarity >= threshold:
+                matches.append(Match(key, similarity, value))
+                self._entries.move_to_end(key)
+        matches.sort(key=lambda match: match.similarity, reverse=True)
+        return matches
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._buckets = [{} for _ in range(self.bands)]
@@ -0,0 +1,109 @@
+# app/planner/model_tiers.py
+
+"""
+Per-stage model tiering.
+
+By default every planner call uses the text provider's model (LLM_MODEL) and the
+captioners use their CAPTION_MODEL. MODEL_TIERS (inline JSON) or
+MODEL_TIERS_FILE (a JSON file) overrides that per stage, so trivial stages such as
+essence extraction or idea selection can run on a fast, cheap model while the
+story and JSON drafting keep a stronger one:
+
+    {
+      "essence":   {"model": "models/gemini-1.5-flash-latest", "max_output_tokens": 120},
+      "selection": "models/gemini-1.5-flash-latest",
+      "json_draft": {"config": {"temperature": 0.4}},
+      "caption_frame": {"model": "gemini-2.0-flash", "max_output_tokens": 80}
+    }
+
+Keys are chain stages (essence, brainstorm, idea, selection, one_liner, story,
+revision, json_draft), captioner stages (caption_image, caption_video,
+caption_frame) or "default". Branch and fan-out nodes ("story_1", "idea_3") use
+their base stage's tier. A string value sets only the model.
+"""
+
+import json
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple, Union
+
+from app.logger import logger
+from app.planner.deadline import base_stage
+from app.settings import get_settings
+
+# Tier configuration (overridable through the environment)
+MODEL_TIERS = get_settings().model_tiers
+MODEL_TIERS_FILE = get_settings().model_tiers_file
+
+CAPTION_STAGES = ("caption_image", "caption_video", "caption_frame")
+
+
+@dataclass(frozen=True)
+class StageModel:
+    model: Optional[str] = None              # None = the caller's default model
+    config: Dict = field(default_factory=dict)
+    max_output_tokens: Optional[int] = None
+
+    @classmethod
+    def parse(cls, value: Union[str, dict]) -> "StageModel":
+        if isinstance(value, str):
+            return cls(model=value)
+        unknown = set(value) - {"model", "config", "max_output_tokens"}
+        if unknown:
+            raise ValueError(f"Unknown model tier fields: {sorted(unknown)}")
+        return cls(value.get("model"), dict(value.get("config") or {}), value.get("max_output_tokens"))
+
+    def generation_config(self, base: Optional[dict] = None) -> Optional[dict]:
+        """
+        `base` settings overlaid with this tier's config and output-token cap (None if empty).
+        """
+        config = {**(base or {}), **self.config}
+        if self.max_output_tokens is not None:
+            config["max_output_tokens"] = self.max_output_tokens
+        return config or None
+
+
+class ModelTiers:
+    def __init__(self, tiers: Optional[Dict[str, StageModel]] = None):
+        self.tiers = dict(tiers or {})
+
+    @classmethod
+    def from_mapping(cls, mapping: Dict[str, Union[str, dict]]) -> "ModelTiers":
+        return cls({stage: StageModel.parse(value) for stage, value in mapping.items()})
+
+    @classmethod
+    def from_env(cls) -> "ModelTiers":
+        if MODEL_TIERS_FILE:
+            with open(MODEL_TIERS_FILE, encoding="utf-8") as f:
+                return cls.from_mapping(json.load(f))
+        if MODEL_TIERS:
+            return cls.from_mapping(json.loads(MODEL_TIERS))
+        return cls()
+
+    def for_stage(self, stage: str) -> StageModel:
+        """
+        The tier for `stage`, falling back to its base stage, then "default".
+        """
+        for key in (stage, base_stage(stage), "default"):
+            if key in self.tiers:
+                return self.tiers[key]
+        return StageModel()
+
+    def resolve(self, stage: str, model: Optional[str],
+                config: Optional[dict] = None) -> Tuple[Optional[str], Optional[dict]]:
+        """
+        The (model, generation config) to use for a call in `stage` whose untiered
+        settings are `model` and `config`.
+        """
+        tier = self.for_stage(stage)
+        return tier.model or model, tier.generation_config(config)
+
+
+def _load() -> ModelTiers:
+    tiers = ModelTiers.from_env()
+    if tiers.tiers:
+        logger.info("Model tiers: %s", {stage: tier.model for stage, tier in tiers.tiers.items()})
+    return tiers
+
+
+# Process-wide tier assignment
+model_tiers = _load()
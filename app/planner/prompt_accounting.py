@@ -0,0 +1,92 @@
+# app/planner/prompt_accounting.py
+
+"""
+Per-plan prompt-size accounting.
+
+While a plan is generated, every text-generation call is recorded in the plan's
+`PromptLedger`: input and output characters and estimated tokens per stage, and
+how much of each prompt repeats the start of a prompt already sent for the same
+plan. That repeated prefix is what provider-side prefix/context caching can
+reuse, so `new_input_chars` approximates the input the provider actually has to
+process. The summary ends up in `PlanTrace.prompt_sizes`.
+"""
+
+import contextvars
+import os
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterator, List, Optional
+
+from app.metrics import llm_prompt_reused_chars
+from app.planner.deadline import base_stage
+from app.planner.rate_limit import estimate_tokens
+
+
+@dataclass
+class StageUsage:
+    calls: int = 0
+    input_chars: int = 0
+    input_tokens: int = 0
+    reused_prefix_chars: int = 0   # leading input identical to an earlier prompt of the same plan
+    new_input_chars: int = 0
+    output_chars: int = 0
+    output_tokens: int = 0
+
+
+class PromptLedger:
+    def __init__(self):
+        self.stages: Dict[str, StageUsage] = {}
+        self._sent: List[str] = []
+
+    def reused_prefix(self, prompt: str) -> int:
+        """
+        Length of the longest prefix `prompt` shares with a prompt sent earlier.
+        """
+        return max((len(os.path.commonprefix([prompt, sent])) for sent in self._sent), default=0)
+
+    def record(self, stage: str, prompt: str, response: str, provider: str = "", model: str = "") -> None:
+        reused = self.reused_prefix(prompt)
+        self._sent.append(prompt)
+        usage = self.stages.setdefault(base_stage(stage), StageUsage())
+        usage.calls += 1
+        usage.input_chars += len(prompt)
+        usage.input_tokens += estimate_tokens(prompt)
+        usage.reused_prefix_chars += reused
+        usage.new_input_chars += len(prompt) - reused
+        usage.output_chars += len(response)
+        usage.output_tokens += estimate_tokens(response)
+        llm_prompt_reused_chars.inc(reused, provider=provider, model=model, stage=base_stage(stage))
+
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        """
+        Usage per stage plus a "total" row.
+        """
+        total = StageUsage()
+        for usage in self.stages.values():
+            for name, value in asdict(usage).items():
+                setattr(total, name, getattr(total, name) + value)
+        return {**{stage: asdict(usage) for stage, usage in self.stages.items()}, "total": asdict(total)}
+
+
+# Ledger of the plan being generated (shared by the chain's stage tasks)
+ledger_var: contextvars.ContextVar[Optional[PromptLedger]] = contextvars.ContextVar("prompt_ledger", default=None)
+
+@contextmanager
+def prompt_ledger() -> Iterator[PromptLedger]:
+    """
+    Records the calls made inside the block (and tasks started from it) in a new ledger.
+    """
+    ledger = PromptLedger()
+    token = ledger_var.set(ledger)
+    try:
+        yield ledger
+    finally:
+        ledger_var.reset(token)
+
+def record_prompt(stage: str, prompt: str, response: str, provider: str = "", model: str = "") -> None:
+    """
+    Records one call in the current plan's ledger (no-op outside a plan).
+    """
+    ledger = ledger_var.get()
+    if ledger is not None:
+        ledger.record(stage, prompt, response, provider, model)
@@ -1,14 +1,18 @@
 # app/planner/prompt_chain.py
 
 import json
-import time
-from app.logger import logger
+import re
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from app.logger import log_payload, logger
+from app.metrics import stage_seconds
 from app.planner.llm_gemini import generate_creative_response
+from app.planner.chain_graph import ChainGraph, ChainRun, StageNode
+from app.planner.chain_session import ChainSession
+from app.planner.deadline import Deadline, JSON_DRAFT_STAGE, base_stage, stage_latencies
+from app.planner.trace import PlanTrace
 
-# Shared JSON plan field template
-JSON_FIELDS_PROMPT = """
-Respond ONLY in JSON format with the following fields:
-
+# Fields of a creative plan
+PLAN_FIELDS = """
 - title: string
 - concept_summary: string
 - hook: string
@@ -23,78 +27,100 @@ Respond ONLY in JSON format with the following fields:
 - scene_ideas: list of short scene descriptions
 """
 
-async def creative_plan_chained_prompt(user_input: str) -> str:
-    """
-    Runs a 7-step chained prompt process to generate a deeply creative,
-    JSON-formatted short-form video plan from an unstructured user input.
-    """
+# Shared JSON plan field template
+JSON_FIELDS_PROMPT = f"""
+Respond ONLY in JSON format with the following fields:
+{PLAN_FIELDS}"""
+
+# Optional async callback invoked as (stage_key, stage_output) when a stage finishes
+StageCallback = Callable[[str, str], Awaitable[None]]
+
+# Stage keys reported to `on_stage`, in execution order
+CHAIN_STAGES = ["essence", "brainstorm", "selection", "one_liner", "story", "revision"]
+
+# Which graph `creative_plan_chained_prompt` runs: "sequential" (the original 7 steps),
+# "parallel_brainstorm" (ideas generated and self-scored concurrently, then picked locally)
+# or "session" (the 7 steps as turns of one conversation with a cacheable shared prefix)
+CHAIN_GRAPH = "sequential"
 
-    timings = {}
+# Upper bound on concurrently running LLM calls within one chain
+CHAIN_MAX_CONCURRENCY = 5
 
-    # Step 1: Extract essence of the user input
-    t0 = time.perf_counter()
-    essence_prompt = (
+# Creative lenses used to diversify ideas in the parallel brainstorm graph
+IDEA_ANGLES = [
+    "an unexpected genre mashup",
+    "a surreal or impossible setting",
+    "an emotional twist that catches the viewer off guard",
+    "a striking visual gimmick or camera technique",
+    "an absurd, deadpan comedic premise",
+]
+
+# ================================
+# Stage prompts
+# ================================
+
+def essence_prompt(user_input: str) -> str:
+    return (
         f"You are given the following user input:\n'{user_input}'\n\n"
         "Summarize this into a high-level creative concept (1–2 sentences). "
         "Capture emotional tone, themes, or metaphors. Be abstract if needed.\n\n"
         "Respond only with the summary — do not include any explanation or commentary."
     )
-    essence = await generate_creative_response(essence_prompt)
-    timings["Essence Extraction"] = time.perf_counter() - t0
-    logger.info("Step 1: Extracted concept:\n%s", essence)
 
-    # Step 2: Brainstorm 5 divergent ideas
-    t0 = time.perf_counter()
-    brainstorm_prompt = (
+def brainstorm_prompt(essence: str, user_input: str) -> str:
+    return (
         f"The concept is:\n'{essence}'\n\n"
         "Brainstorm 5 completely different short-form video ideas based on this. "
         "Each should be bizarre, cinematic, or emotionally provocative. Vary genre, setting, and tone.\n"
         f"Each idea should still relate to the original user prompt:\n'{user_input}'\n\n"
         "Respond only with the 5 ideas — do not include commentary, headers, or extra explanation."
     )
-    brainstorm = await generate_creative_response(brainstorm_prompt)
-    timings["Divergent Brainstorming"] = time.perf_counter() - t0
-    logger.info("Step 2: Brainstormed 5 ideas:\n%s", brainstorm)
 
-    # Step 3: Select the most original idea with justification
-    t0 = time.perf_counter()
-    selection_prompt = (
+def scored_idea_prompt(essence: str, user_input: str, angle: str) -> str:
+    return (
+        f"The concept is:\n'{essence}'\n\n"
+        f"Come up with ONE short-form video idea based on this, built around {angle}. "
+        "It should be bizarre, cinematic, or emotionally provocative.\n"
+        f"The idea should still relate to the original user prompt:\n'{user_input}'\n\n"
+        "Then honestly rate its visual originality from 1 to 10.\n\n"
+        "Respond with the idea in 2–3 sentences, followed by a final line of the form 'Score: N'."
+    )
+
+def selection_prompt(brainstorm: str) -> str:
+    return (
         f"Here are the brainstormed ideas:\n{brainstorm}\n\n"
         "Pick the most visually original idea and explain why in 2–3 sentences. "
         "Prioritize uniqueness and visual impact.\n\n"
         "Respond only with the chosen idea and justification — no intro, no conclusion, no labels."
     )
-    selected = await generate_creative_response(selection_prompt)
-    timings["Selection with Justification"] = time.perf_counter() - t0
-    logger.info("Step 3: Selected idea + justification:\n%s", selected)
 
-    # Step 4: Generate a cinematic one-liner
-    t0 = time.perf_counter()
-    prompt_gen_prompt = (
+def top_k_selection_prompt(brainstorm: str, k: int) -> str:
+    return (
+        f"Here are the brainstormed ideas:\n{brainstorm}\n\n"
+        f"Pick the {k} most visually original ideas, best first. They must be clearly different from each other. "
+        "Prioritize uniqueness and visual impact, and justify each pick in one sentence.\n\n"
+        f"Respond only with exactly {k} numbered lines of the form 'N. idea — justification' "
+        "— no intro, no conclusion, no labels."
+    )
+
+def one_liner_prompt(selected: str, user_input: str) -> str:
+    return (
         f"Based on the selected idea:\n{selected}\n\n"
         "Write a vivid, one-sentence short-form video prompt. Make it cinematic and unpredictable.\n\n"
         f"The video prompt should tie in to the original user prompt:\n'{user_input}'\n\n"
         "Respond only with the sentence — no preamble, no quotes, no additional commentary."
     )
-    gen_prompt = await generate_creative_response(prompt_gen_prompt)
-    timings["Creative Prompt Generation"] = time.perf_counter() - t0
-    logger.info("Step 4: Cinematic prompt:\n%s", gen_prompt)
 
-    # Step 5: Expand into a one-paragraph story
-    t0 = time.perf_counter()
-    story_prompt = (
+def story_prompt(gen_prompt: str, user_input: str) -> str:
+    return (
         f"Based on this vivid one-sentence prompt:\n{gen_prompt}\n\n"
         "Expand the prompt into a full-blown, paragraph-long story synopsis with details, twists, and visually-evocative descriptions.\n"
         f"Make sure it's still rooted in the original user input:\n'{user_input}'\n\n"
         "Respond only with the story paragraph — no labels, framing, or commentary."
     )
-    story = await generate_creative_response(story_prompt)
-    timings["Original Story Creation"] = time.perf_counter() - t0
-    logger.info("Step 5: Feedback prompt:\n%s", story)
 
-    # Step 6: Self-critique and optional revision
-    t0 = time.perf_counter()
-    critique_prompt = f"""
+def critique_prompt(story: str, user_input: str) -> str:
+    return f"""
 Review the following story for creativity and originality.
 
 Story:
@@ -106,13 +132,9 @@ If so, revise it — but keep the length to one paragraph. Preserve visual richn
 Respond only with the revised story paragraph (or the original if no changes are needed).
 Do not include critique, ratings, or any commentary — just the paragraph.
 """
-    final_story = await generate_creative_response(critique_prompt)
-    timings["Final Story Completion"] = time.perf_counter() - t0
-    logger.info("Step 6: Critiques and improvement:\n%s", final_story)
 
-    # Step 7: Final JSON plan generation
-    t0 = time.perf_counter()
-    json_plan_prompt = f"""
+def json_plan_prompt(final_story: str, user_input: str) -> str:
+    return f"""
 You are a wildly creative short-form video concept generator.
 
 Given the following user prompt and related story, generate a highly imaginative and vivid creative plan for a video idea.
@@ -134,11 +156,341 @@ Do not wrap your answer in Markdown or backticks.
 Only output the JSON object — nothing else.
 All string values (including those inside lists) must be enclosed in double quotes.
 """
-    timings["Full JSON Plan"] = time.perf_counter() - t0
-    logger.info("Step 7: Final JSON prompt assembled.")
+
+# ================================
+# Session prompts
+# ================================
+
+# Fixed prefix of every session turn, followed by the brief. Static text comes first so the
+# prefix is cacheable across plans too; it avoids the word "JSON" so that only the
+# last turn asks for the plan itself.
+SESSION_SYSTEM_PROMPT = f"""
+You are a wildly creative short-form video concept generator. You will develop the user prompt below
+into a creative plan for a video idea, step by step; each request builds on your previous responses.
+The goal is to surprise, delight, and push boundaries of what's expected, while preserving all original
+components of the user prompt (for example, characters, action, setting).
+Respond only with what each request asks for — no preamble, labels, headers, or commentary.
+
+The finished plan will have the following fields:
+{PLAN_FIELDS}"""
+
+# One request per chain stage; the brief and earlier replies are already in the transcript
+SESSION_STEPS = {
+    "essence": "Summarize the user prompt into a high-level creative concept (1–2 sentences). "
+               "Capture emotional tone, themes, or metaphors. Be abstract if needed.",
+    "brainstorm": "Brainstorm 5 completely different short-form video ideas based on that concept. "
+                  "Each should be bizarre, cinematic, or emotionally provocative. Vary genre, setting, and tone.",
+    "selection": "Pick the most visually original idea and explain why in 2–3 sentences. "
+                 "Prioritize uniqueness and visual impact.",
+    "one_liner": "Write a vivid, one-sentence short-form video prompt for it. Make it cinematic and unpredictable.",
+    "story": "Expand that sentence into a paragraph-long story synopsis with details, twists, "
+             "and visually-evocative descriptions.",
+    "revision": "To yourself, rate that story's creativity from 1 to 10. If it could be more surprising, bold, "
+                "or unexpected, revise it (still one paragraph). Respond only with the final story paragraph.",
+}
+
+# Last turn: the story becomes the plan, drafted from the session prompt by the caller
+SESSION_JSON_STEP = """
+Now write the creative plan, inspired by the final story. Respond ONLY in JSON format: a single valid JSON object
+with the fields listed above, not wrapped in Markdown or backticks. All string values (including those inside lists)
+must be enclosed in double quotes.
+"""
+
+def session_prefix(user_input: str) -> str:
+    return f"{SESSION_SYSTEM_PROMPT}\nUser Prompt:\n\"\"\"{user_input}\"\"\"\n"
+
+def _idea_score(idea: str) -> float:
+    """
+    Reads the trailing 'Score: N' line of a self-rated idea (0 if missing).
+    """
+    match = re.search(r"score\s*[:=]\s*(\d+(?:\.\d+)?)", idea, flags=re.IGNORECASE)
+    return float(match.group(1)) if match else 0.0
+
+def split_ideas(text: str) -> List[str]:
+    """
+    Splits a numbered or bulleted list into its items (continuation lines are joined
+    to the item above). Text without list markers is returned as a single item.
+    """
+    items: List[str] = []
+    for line in text.splitlines():
+        match = re.match(r"\s*(?:\d+[.):]|[-*•])\s+(.*)", line)
+        if match:
+            items.append(match.group(1).strip())
+        elif line.strip() and items:
+            items[-1] += " " + line.strip()
+    items = [item for item in items if item]
+    return items or ([text.strip()] if text.strip() else [])
+
+# ================================
+# Chain graphs
+# ================================
+
+def _add_refinement_stages(graph: ChainGraph, user_input: str, selection_node: str, suffix: str = "") -> str:
+    """
+    Adds steps 4–7 (one-liner → story → revision → JSON prompt) after the selection node.
+    A `suffix` (e.g. "_1") names the nodes of one variant branch. Returns the JSON prompt node.
+    """
+    one_liner_node, story_node, revision_node = f"one_liner{suffix}", f"story{suffix}", f"revision{suffix}"
+    branch = f" [{suffix.lstrip('_')}]" if suffix else ""
+
+    async def one_liner(inputs):
+        gen_prompt = await generate_creative_response(one_liner_prompt(inputs[selection_node], user_input))
+        log_payload(f"Step 4: Cinematic prompt{branch}", gen_prompt)
+        return gen_prompt
+
+    async def story(inputs):
+        result = await generate_creative_response(story_prompt(inputs[one_liner_node], user_input))
+        log_payload(f"Step 5: Feedback prompt{branch}", result)
+        return result
+
+    async def revision(inputs):
+        final_story = await generate_creative_response(critique_prompt(inputs[story_node], user_input))
+        log_payload(f"Step 6: Critiques and improvement{branch}", final_story)
+        return final_story
+
+    async def json_plan(inputs):
+        prompt = json_plan_prompt(inputs[revision_node], user_input)
+        logger.info("Step 7: Final JSON prompt assembled%s.", branch)
+        return prompt
+
+    # Refinement stages fall back to passing their input through when skipped
+    graph.add(one_liner_node, one_liner, [selection_node], f"Creative Prompt Generation{branch}",
+              fallback=lambda inputs: inputs[selection_node])
+    graph.add(story_node, story, [one_liner_node], f"Original Story Creation{branch}",
+              fallback=lambda inputs: inputs[one_liner_node])
+    graph.add(revision_node, revision, [story_node], f"Final Story Completion{branch}",
+              fallback=lambda inputs: inputs[story_node])
+    return graph.add(f"json_plan{suffix}", json_plan, [revision_node], f"Full JSON Plan{branch}")
+
+def _add_essence_stage(graph: ChainGraph, user_input: str) -> None:
+    async def essence(inputs):
+        result = await generate_creative_response(essence_prompt(user_input))
+        log_payload("Step 1: Extracted concept", result)
+        return result
+
+    graph.add("essence", essence, label="Essence Extraction", fallback=lambda inputs: user_input)
+
+def _add_brainstorm_stage(graph: ChainGraph, user_input: str) -> None:
+    async def brainstorm(inputs):
+        result = await generate_creative_response(brainstorm_prompt(inputs["essence"], user_input))
+        log_payload("Step 2: Brainstormed 5 ideas", result)
+        return result
+
+    graph.add("brainstorm", brainstorm, ["essence"], "Divergent Brainstorming", fallback=lambda inputs: inputs["essence"])
+
+def build_sequential_chain(user_input: str) -> ChainGraph:
+    """
+    The default graph: the original seven steps, each depending on the previous one.
+    """
+    graph = ChainGraph()
+    _add_essence_stage(graph, user_input)
+    _add_brainstorm_stage(graph, user_input)
+
+    async def selection(inputs):
+        selected = await generate_creative_response(selection_prompt(inputs["brainstorm"]))
+        log_payload("Step 3: Selected idea + justification", selected)
+        return selected
+
+    graph.add("selection", selection, ["brainstorm"], "Selection with Justification",
+              fallback=lambda inputs: inputs["brainstorm"])
+    _add_refinement_stages(graph, user_input, "selection")
+    return graph
+
+def build_parallel_brainstorm_chain(user_input: str, idea_count: int = len(IDEA_ANGLES)) -> ChainGraph:
+    """
+    Fans out `idea_count` single-idea calls that each rate their own originality,
+    then fans in by picking the top-scored idea locally — replacing the sequential
+    brainstorm + selection calls with one round of concurrent calls.
+    """
+    graph = ChainGraph()
+    _add_essence_stage(graph, user_input)
+
+    async def idea(inputs, i):
+        angle = IDEA_ANGLES[i % len(IDEA_ANGLES)]
+        return await generate_creative_response(scored_idea_prompt(inputs["essence"], user_input, angle))
+
+    idea_nodes = graph.fan_out("idea", idea_count, idea, ["essence"], "Scored Idea", fallback=lambda inputs: inputs["essence"])
+
+    async def selection(inputs):
+        ideas = [inputs[name] for name in idea_nodes]
+        best = max(ideas, key=_idea_score)
+        log_payload(f"Step 3: Selected idea (score {_idea_score(best):.0f} of {len(ideas)} ideas)", best)
+        return best
+
+    graph.add("selection", selection, idea_nodes, "Selection with Justification")
+    _add_refinement_stages(graph, user_input, "selection")
+    return graph
+
+def build_session_chain(user_input: str) -> ChainGraph:
+    """
+    The sequential steps as turns of one `ChainSession`: the system instructions and
+    brief form a fixed prefix and each prompt extends the previous one, so a
+    provider's prefix cache covers everything but the newest reply and request.
+    The "json_plan" node returns the session prompt for the final JSON turn.
+    """
+    graph = ChainGraph()
+    session = ChainSession(session_prefix(user_input))
+
+    def catch_up(stage: str, output: str) -> None:
+        # A stage reused from a near-duplicate brief gets its turn without a call;
+        # a skipped stage passed its input through and adds nothing
+        if stage not in session.stages and output not in (session.last_reply, user_input):
+            session.add_turn(stage, SESSION_STEPS[stage], output)
+
+    previous = None
+    for step, (stage, label) in enumerate([
+        ("essence", "Essence Extraction"), ("brainstorm", "Divergent Brainstorming"),
+        ("selection", "Selection with Justification"), ("one_liner", "Creative Prompt Generation"),
+        ("story", "Original Story Creation"), ("revision", "Final Story Completion"),
+    ], start=1):
+        async def turn(inputs, stage=stage, previous=previous, step=step):
+            if previous is not None:
+                catch_up(previous, inputs[previous])
+            result = await session.send(stage, SESSION_STEPS[stage])
+            log_payload(f"Step {step}: {stage} (session turn)", result)
+            return result
+
+        fallback = (lambda inputs: user_input) if previous is None else (lambda inputs, dep=previous: inputs[dep])
+        graph.add(stage, turn, [previous] if previous else [], label, fallback=fallback)
+        previous = stage
+
+    async def json_plan(inputs):
+        catch_up("revision", inputs["revision"])
+        logger.info("Step 7: Final JSON session prompt assembled (%d chars).", len(session.transcript))
+        return session.prompt(SESSION_JSON_STEP)
+
+    graph.add("json_plan", json_plan, ["revision"], "Full JSON Plan")
+    return graph
+
+# Drafts a plan from a final JSON prompt (supplied by the caller, which owns parsing)
+PlanDrafter = Callable[[str], Awaitable[Any]]
+
+def build_variant_chain(user_input: str, variants: int, draft: PlanDrafter) -> ChainGraph:
+    """
+    Shares essence and brainstorming across `variants` plans: one selection call picks
+    the top ideas, then each idea runs its own refinement branch and JSON drafting
+    concurrently. Branch nodes are suffixed with the variant index ("story_0", "story_1", ...).
+    """
+    graph = ChainGraph()
+    _add_essence_stage(graph, user_input)
+    _add_brainstorm_stage(graph, user_input)
+
+    async def selection(inputs):
+        selected = await generate_creative_response(top_k_selection_prompt(inputs["brainstorm"], variants))
+        log_payload(f"Step 3: Selected top {variants} ideas", selected)
+        return selected
+
+    graph.add("selection", selection, ["brainstorm"], "Top-k Selection", fallback=lambda inputs: inputs["brainstorm"])
+
+    async def pick(inputs, i):
+        ideas = split_ideas(inputs["selection"])
+        # Top up from the brainstorm if the selection returned too few ideas
+        for idea in split_ideas(inputs["brainstorm"]):
+            if len(ideas) >= variants:
+                break
+            if idea not in ideas:
+                ideas.append(idea)
+        return ideas[i % len(ideas)] if ideas else inputs["selection"]
+
+    async def drafter(inputs, i):
+        return await draft(inputs[f"json_plan_{i}"])
+
+    for i in range(variants):
+        graph.add(f"pick_{i}", lambda inputs, i=i: pick(inputs, i), ["selection", "brainstorm"], f"Variant Idea [{i}]")
+        json_node = _add_refinement_stages(graph, user_input, f"pick_{i}", suffix=f"_{i}")
+        graph.add(f"{JSON_DRAFT_STAGE}_{i}", lambda inputs, i=i: drafter(inputs, i), [json_node],
+                  f"JSON Drafting [{i}]")
+    return graph
+
+CHAIN_GRAPHS = {
+    "sequential": build_sequential_chain,
+    "parallel_brainstorm": build_parallel_brainstorm_chain,
+    "session": build_session_chain,
+}
+
+async def run_chain(user_input: str, graph: Optional[str] = None, on_stage: Optional[StageCallback] = None,
+                    deadline: Optional[Deadline] = None, preset: Optional[Dict[str, str]] = None) -> ChainRun:
+    """
+    Builds and executes the named chain graph (default: CHAIN_GRAPH), logging
+    per-node timings and the critical path. Returns the full ChainRun.
+    With a `deadline`, refinement stages that would not leave enough time for the
+    final JSON drafting call (based on observed latencies) are skipped.
+    Stages in `preset` (e.g. a near-duplicate brief's essence) are reused instead of run.
+    """
+    graph_name = graph or CHAIN_GRAPH
+    return await _execute_chain(CHAIN_GRAPHS[graph_name](user_input), graph_name, on_stage, deadline, preset)
+
+async def _execute_chain(chain: ChainGraph, graph_name: str, on_stage: Optional[StageCallback] = None,
+                         deadline: Optional[Deadline] = None, preset: Optional[Dict[str, str]] = None) -> ChainRun:
+    # Only preset stages the graph actually has (e.g. not "brainstorm" in the parallel graph)
+    preset = {name: value for name, value in (preset or {}).items() if name in chain.nodes}
+
+    async def on_node(name, result):
+        if on_stage is not None and name in CHAIN_STAGES:
+            await on_stage(name, result)
+
+    def should_skip(node: StageNode) -> bool:
+        needed = stage_latencies.expected(node.name) + stage_latencies.expected(JSON_DRAFT_STAGE)
+        if deadline.can_fit(needed):
+            return False
+        logger.info("Skipping stage %r: %.1fs left, ~%.1fs needed", node.name, deadline.remaining(), needed)
+        return True
+
+    run = await chain.run(
+        max_concurrency=CHAIN_MAX_CONCURRENCY,
+        on_node=on_node,
+        should_skip=should_skip if deadline is not None else None,
+        preset=preset,
+    )
+    for name, timing in run.timings.items():
+        stage_latencies.observe(name, timing.duration)
+        stage_seconds.observe(timing.duration, stage=base_stage(name))
 
     # Log timing summary
-    logger.info("Timing summary (seconds):\n%s", json.dumps(timings, indent=2))
+    path, path_time = run.critical_path()
+    logger.info("Timing summary (seconds):\n%s", json.dumps(run.timing_summary(), indent=2))
+    logger.info(
+        "Chain %r wall time %.2fs (serial sum %.2fs); critical path %.2fs: %s",
+        graph_name, run.wall_time, run.serial_time, path_time, " -> ".join(path),
+    )
+    return run
+
+async def creative_plan_chained_prompt(user_input: str, on_stage: Optional[StageCallback] = None,
+                                       deadline: Optional[Deadline] = None, trace: Optional[PlanTrace] = None,
+                                       preset: Optional[Dict[str, str]] = None) -> str:
+    """
+    Runs a 7-step chained prompt process to generate a deeply creative,
+    JSON-formatted short-form video plan from an unstructured user input.
+    If `on_stage` is given, it is awaited with each stage's output as soon as it completes.
+    If `trace` is given, it records which stages ran, were skipped or were reused, and their outputs.
+    """
+    run = await run_chain(user_input, on_stage=on_stage, deadline=deadline, preset=preset)
+
+    if trace is not None:
+        trace.stages_run.extend(name for name in run.timings if name != "json_plan")
+        trace.stages_skipped.extend(run.skipped)
+        trace.stages_reused.extend(run.reused)
+        trace.stage_outputs.update({name: run.results[name] for name in CHAIN_STAGES
+                                    if name in run.timings or name in run.reused})
+        trace.timings.update({name: round(t.duration, 3) for name, t in run.timings.items()})
 
     # Return only the final prompt string for LLM
-    return json_plan_prompt
+    return run.results["json_plan"]
+
+async def creative_plan_variants(user_input: str, variants: int, draft: PlanDrafter,
+                                 deadline: Optional[Deadline] = None, trace: Optional[PlanTrace] = None) -> List[Any]:
+    """
+    Produces `variants` plans from one shared essence + brainstorm + selection prefix,
+    with the refinement and JSON drafting of each variant running concurrently.
+    Returns the drafted plans in selection order.
+    """
+    run = await _execute_chain(build_variant_chain(user_input, variants, draft), "variants", deadline=deadline)
+
+    if trace is not None:
+        trace.stages_run.extend(name for name in run.timings if base_stage(name) not in ("json_plan", "pick"))
+        trace.stages_skipped.extend(run.skipped)
+        trace.stage_outputs.update({name: run.results[name] for name in run.timings
+                                    if base_stage(name) in CHAIN_STAGES})
+        trace.timings.update({name: round(t.duration, 3) for name, t in run.timings.items()})
+
+    return [run.results[f"{JSON_DRAFT_STAGE}_{i}"] for i in range(variants)]
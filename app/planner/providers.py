@@ -0,0 +1,408 @@
+# app/planner/providers.py
+
+"""
+Pluggable LLM provider layer.
+
+Every planner call (chain stages, final JSON drafting, captioning, surprise
+briefs) goes through an `LLMProvider` looked up by name in a small registry.
+Providers are created on first use and shared per process, and each imports
+its SDK only then, so importing the app stays fast. `warm_providers` can open
+connections ahead of the first request. A deterministic local fake is
+registered for tests and offline runs.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Any, AsyncIterator, Awaitable, BinaryIO, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from app.logger import logger, stage_var
+from app.metrics import llm_errors, record_llm_call
+from app.planner.circuit_breaker import PROVIDER_CALL_TIMEOUT, get_breaker
+from app.planner.rate_limit import get_rate_limiter, estimate_tokens
+from app.settings import get_settings
+
+# Prompt content: plain text, or a list of multimodal parts (text, PIL images, inline_data dicts)
+Prompt = Union[str, List[Any]]
+
+# Default provider for text generation (overridable through the environment)
+DEFAULT_PROVIDER = get_settings().llm_provider
+
+# Seconds between state checks while an uploaded file is being processed
+FILE_POLL_INTERVAL = 2.0
+
+
+def prompt_text(prompt: Prompt) -> str:
+    """
+    The text parts of a prompt (media parts are not counted).
+    """
+    return prompt if isinstance(prompt, str) else "\n\n".join(p for p in prompt if isinstance(p, str))
+
+
+class LLMProvider:
+    """
+    Interface implemented by every provider.
+    `config` holds provider-specific generation settings (temperature, max tokens, ...).
+    """
+    name = "base"
+    default_model = ""
+
+    async def generate(self, prompt: Prompt, model: Optional[str] = None, config: Optional[dict] = None) -> str:
+        raise NotImplementedError
+
+    async def stream(self, prompt: Prompt, model: Optional[str] = None,
+                     config: Optional[dict] = None) -> AsyncIterator[str]:
+        # Providers without native streaming yield the whole response as one chunk
+        yield await self.generate(prompt, model, config)
+
+    async def generate_many(self, prompt: Prompt, n: int, model: Optional[str] = None,
+                            config: Optional[dict] = None) -> List[str]:
+        """
+        Returns `n` independent completions. Providers with native batching (e.g. OpenAI's
+        `n`) return them from one request; the default makes `n` concurrent calls.
+        """
+        return list(await asyncio.gather(*(self.generate(prompt, model, config) for _ in range(n))))
+
+    async def upload_file(self, file: BinaryIO, mime_type: str) -> Any:
+        """
+        Uploads a large media file out of band and returns a handle usable as a prompt part.
+        """
+        raise NotImplementedError(f"Provider {self.name!r} does not support file uploads")
+
+    async def delete_file(self, handle: Any) -> None:
+        pass
+
+    async def warm_up(self) -> None:
+        """
+        Opens connections (and does any other one-off setup) before the first real call.
+        """
+
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+    default_model = "models/gemini-1.5-pro-latest"
+
+    def __init__(self):
+        import google.generativeai as genai  # heavy SDK, imported on first use
+
+        genai.configure(api_key=get_settings().google_api_key)
+        self._genai = genai
+        self._models: Dict[str, Any] = {}
+
+    def _model(self, model: Optional[str], config: Optional[dict]) -> Any:
+        model_name = model or self.default_model
+        key = f"{model_name}:{json.dumps(config or {}, sort_keys=True)}"
+        if key not in self._models:
+            self._models[key] = self._genai.GenerativeModel(model_name, generation_config=config or None)
+        return self._models[key]
+
+    async def warm_up(self):
+        # A metadata lookup sets up the client and its connection without generating anything
+        await asyncio.to_thread(self._genai.get_model, self.default_model)
+
+    async def generate(self, prompt, model=None, config=None) -> str:
+        response = await self._model(model, config).generate_content_async(prompt)
+        return response.text.strip()
+
+    async def stream(self, prompt, model=None, config=None):
+        response = await self._model(model, config).generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunks without text parts (e.g. the final finish-reason chunk)
+                continue
+            if text:
+                yield text
+
+    async def upload_file(self, file, mime_type):
+        # The SDK call is blocking; uploaded videos are processed before they can be used
+        uploaded = await asyncio.to_thread(self._genai.upload_file, file, mime_type=mime_type)
+        while uploaded.state.name == "PROCESSING":
+            await asyncio.sleep(FILE_POLL_INTERVAL)
+            uploaded = await asyncio.to_thread(self._genai.get_file, uploaded.name)
+        if uploaded.state.name != "ACTIVE":
+            raise RuntimeError(f"Gemini file upload failed with state {uploaded.state.name}")
+        return uploaded
+
+    async def delete_file(self, handle):
+        await asyncio.to_thread(self._genai.delete_file, handle.name)
+
+
+class OpenAIProvider(LLMProvider):
+    name = "openai"
+    default_model = "gpt-4"
+
+    def __init__(self):
+        from openai import AsyncOpenAI  # imported on first use
+
+        # One client per process, so its HTTP connection pool is shared by every call
+        self._client = AsyncOpenAI(api_key=get_settings().openai_api_key)
+
+    async def warm_up(self):
+        await self._client.models.retrieve(self.default_model)
+
+    def _request(self, prompt: Prompt, model: Optional[str], config: Optional[dict]) -> dict:
+        settings = dict(config or {})
+        if "max_output_tokens" in settings:
+            # Tier configs use Gemini's name for the output cap (see model_tiers.py)
+            settings["max_tokens"] = settings.pop("max_output_tokens")
+        messages = []
+        if "system" in settings:
+            messages.append({"role": "system", "content": settings.pop("system")})
+        messages.append({"role": "user", "content": prompt_text(prompt)})
+        return {"model": model or self.default_model, "messages": messages, **settings}
+
+    async def generate(self, prompt, model=None, config=None) -> str:
+        response = await self._client.chat.completions.create(**self._request(prompt, model, config))
+        return response.choices[0].message.content.strip()
+
+    async def generate_many(self, prompt, n, model=None, config=None):
+        # One request for all completions: the prompt is sent and billed once
+        response = await self._client.chat.completions.create(**self._request(prompt, model, config), n=n)
+        return [choice.message.content.strip() for choice in response.choices]
+
+    async def stream(self, prompt, model=None, config=None):
+        response = await self._client.chat.completions.create(**self._request(prompt, model, config), stream=True)
+        async for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+class FakeProvider(LLMProvider):
+    """
+    Deterministic local provider for tests and offline runs. Responses depend only
+    on the prompt; prompts that ask for JSON get a valid CreativePlan object.
+    """
+    name = "fake"
+    default_model = "fake-1"
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls: List[dict] = []
+
+    def respond(self, prompt: Prompt, model: Optional[str] = None, choice: int = 0) -> str:
+        text = prompt if isinstance(prompt, str) else " ".join(p for p in prompt if isinstance(p, str))
+        salt = f":{choice}" if choice else ""
+        digest = hashlib.sha256(f"{model}:{text}{salt}".encode("utf-8")).hexdigest()[:8]
+        if "JSON" in text:
+            return json.dumps({
+                "title": f"Fake Plan {digest}",
+                "concept_summary": f"A deterministic concept generated offline ({digest}).",
+                "hook": "Nothing here came from a real model.",
+                "audience": "Test suites",
+                "visual_style": "Placeholder minimalism",
+                "tone": "Predictable",
+                "scene_ideas": [f"Scene {i} of {digest}" for i in range(1, 4)],
+                "characters": ["The Fake Provider"],
+                "inspirations": ["Unit tests"],
+                "dialogue_ideas": ["\"Same input, same output.\""],
+                "soundtrack_style": "Silence",
+                "foley_fx": ["Keyboard clicks"],
+            })
+        return f"Fake response {digest}."
+
+    async def generate(self, prompt, model=None, config=None) -> str:
+        self.calls.append({"prompt": prompt, "model": model, "config": config})
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.respond(prompt, model)
+
+    async def generate_many(self, prompt, n, model=None, config=None):
+        self.calls.append({"prompt": prompt, "model": model, "config": config, "n": n})
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [self.respond(prompt, model, choice) for choice in range(n)]
+
+    async def upload_file(self, file, mime_type):
+        digest = hashlib.sha256()
+        while chunk := file.read(1024 * 1024):
+            digest.update(chunk)
+        handle = {"file_uri": f"fake://{digest.hexdigest()[:16]}", "mime_type": mime_type}
+        self.calls.append({"upload": handle})
+        return handle
+
+
+class MeteredFakeProvider(FakeProvider):
+    """
+    FakeProvider that meters the bytes it is sent and models a provider-side prefix
+    cache: the leading bytes a prompt shares with an earlier prompt count as cached.
+    Each call's modelled latency is `latency` plus `seconds_per_kb` per KB of
+    uncached input and is slept for real. Plain replies are padded to `reply_chars`
+    so later stages see realistically sized inputs.
+    """
+    def __init__(self, latency: float = 0.0, seconds_per_kb: float = 0.0, reply_chars: int = 0):
+        super().__init__(latency)
+        self.seconds_per_kb = seconds_per_kb
+        self.reply_chars = reply_chars
+        self.bytes_sent = 0
+        self.cached_bytes = 0
+        self._sent: List[bytes] = []
+
+    @property
+    def uncached_bytes(self) -> int:
+        return self.bytes_sent - self.cached_bytes
+
+    def respond(self, prompt: Prompt, model: Optional[str] = None, choice: int = 0) -> str:
+        text = super().respond(prompt, model, choice)
+        if text.startswith("{") or len(text) >= self.reply_chars:
+            return text
+        return (text + " ") * (self.reply_chars // (len(text) + 1)) + text
+
+    async def generate(self, prompt, model=None, config=None) -> str:
+        data = prompt_text(prompt).encode("utf-8")
+        cached = max((len(os.path.commonprefix([data, sent])) for sent in self._sent), default=0)
+        self._sent.append(data)
+        self.bytes_sent += len(data)
+        self.cached_bytes += cached
+        latency = self.latency + self.seconds_per_kb * (len(data) - cached) / 1024
+        self.calls.append({"prompt": prompt, "model": model, "config": config, "stage": stage_var.get(),
+                           "bytes": len(data), "cached_bytes": cached, "latency": latency})
+        if latency:
+            await asyncio.sleep(latency)
+        return self.respond(prompt, model)
+
+
+# ================================
+# Registry
+# ================================
+
+_factories: Dict[str, Callable[[], LLMProvider]] = {
+    "gemini": GeminiProvider,
+    "openai": OpenAIProvider,
+    "fake": FakeProvider,
+}
+_instances: Dict[str, LLMProvider] = {}
+
+def register_provider(name: str, factory: Callable[[], LLMProvider]) -> None:
+    """
+    Registers (or replaces) a provider factory. Any existing instance is discarded.
+    """
+    _factories[name] = factory
+    _instances.pop(name, None)
+
+def registered_providers() -> Dict[str, Callable[[], LLMProvider]]:
+    """
+    Returns a copy of the registered provider factories by name.
+    """
+    return dict(_factories)
+
+def get_provider(name: Optional[str] = None) -> LLMProvider:
+    """
+    Returns the shared provider instance for `name` (default: DEFAULT_PROVIDER).
+    """
+    name = name or DEFAULT_PROVIDER
+    if name not in _instances:
+        if name not in _factories:
+            raise ValueError(f"Unknown LLM provider: {name!r}")
+        _instances[name] = _factories[name]()
+    return _instances[name]
+
+async def warm_providers(names: Iterable[str], timeout: float) -> Dict[str, bool]:
+    """
+    Creates and warms the named providers concurrently, waiting at most `timeout` seconds.
+    Failures are logged, never raised: the app still starts, and the provider connects on first use.
+    Returns {name: warmed}.
+    """
+    async def warm(name: str) -> bool:
+        try:
+            await get_provider(name).warm_up()
+            return True
+        except Exception as e:
+            logger.warning("Could not warm provider %s: %s", name, e)
+            return False
+
+    names = list(dict.fromkeys(names))
+    tasks = [asyncio.create_task(warm(name)) for name in names]
+    if not tasks:
+        return {}
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    if pending:
+        logger.warning("Provider warm-up timed out after %.1fs", timeout)
+    return {name: task in done and task.result() for name, task in zip(names, tasks)}
+
+# ================================
+# Calls
+# ================================
+
+class LatencyTracker:
+    """
+    Keeps a bounded window of recent call latencies per provider/model.
+    """
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[str, List[float]] = {}
+
+    def record(self, key: str, seconds: float) -> None:
+        samples = self._samples.setdefault(key, [])
+        samples.append(seconds)
+        if len(samples) > self.window:
+            del samples[0]
+
+    def percentile(self, key: str, q: float) -> Optional[float]:
+        """
+        Returns the q-th percentile (0–1) of recent latencies, or None without samples.
+        """
+        samples = sorted(self._samples.get(key, ()))
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def count(self, key: str) -> int:
+        return len(self._samples.get(key, ()))
+
+
+latency_tracker = LatencyTracker()
+
+async def _guarded_call(provider: LLMProvider, prompt: Prompt, model: str,
+                        call: Callable[[], Awaitable[Any]]) -> Tuple[Any, float]:
+    """
+    Runs `call()` behind the provider/model's circuit breaker, rate limit and call
+    timeout. Returns its result and latency in seconds.
+    """
+    breaker = get_breaker(provider.name, model)
+    limiter = get_rate_limiter(provider.name)
+    breaker.before_call()
+    try:
+        # Inside the try, so a half-open probe cancelled while it waits for the limit is given back
+        if limiter is not None:
+            await limiter.acquire(estimate_tokens(prompt) if isinstance(prompt, str) else 1)
+        t0 = time.perf_counter()
+        result = await asyncio.wait_for(call(), PROVIDER_CALL_TIMEOUT or None)
+    except Exception:
+        breaker.record_failure()
+        llm_errors.inc(provider=provider.name, model=model)
+        raise
+    except BaseException:
+        breaker.record_abandoned()
+        raise
+    breaker.record_success()
+    seconds = time.perf_counter() - t0
+    latency_tracker.record(f"{provider.name}/{model}", seconds)
+    return result, seconds
+
+async def call_provider(provider: LLMProvider, prompt: Prompt, model: Optional[str] = None,
+                        config: Optional[dict] = None) -> str:
+    """
+    Makes one provider call: applies the provider's circuit breaker and rate limit and records latency.
+    """
+    model = model or provider.default_model
+    text, seconds = await _guarded_call(provider, prompt, model, lambda: provider.generate(prompt, model, config))
+    record_llm_call(provider.name, model, prompt_text(prompt), text, seconds)
+    return text
+
+async def call_provider_many(provider: LLMProvider, prompt: Prompt, n: int, model: Optional[str] = None,
+                             config: Optional[dict] = None) -> List[str]:
+    """
+    Like call_provider, but asks for `n` completions of the same prompt in one batch.
+    """
+    model = model or provider.default_model
+    texts, seconds = await _guarded_call(provider, prompt, model,
+                                         lambda: provider.generate_many(prompt, n, model, config))
+    record_llm_call(provider.name, model, prompt_text(prompt), "\n".join(texts), seconds)
+    return texts
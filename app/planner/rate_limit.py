@@ -0,0 +1,150 @@
+# app/planner/rate_limit.py
+
+"""
+Token-bucket rate limiting for LLM providers.
+
+Each provider gets two buckets: one for requests per minute and one for
+(estimated) tokens per minute. Callers await `acquire()` before each provider
+call, so bursts queue client-side instead of tripping provider quota errors.
+A limit of 0 disables that bucket. With a shared state backend (see
+shared_state.py) the buckets live there, so the limit holds across all
+worker processes rather than per worker.
+"""
+
+import asyncio
+import time
+from typing import Dict, Optional
+
+from app.settings import get_settings
+from app.shared_state import SHARED_STATE_BACKEND, SharedState, shared_state
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token estimate (~4 characters per token), good enough for budgeting.
+    """
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.refill_per_second)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1) -> float:
+        """
+        Waits until `amount` tokens are available and takes them.
+        Requests larger than the bucket are capped at its capacity.
+        Returns the number of seconds spent waiting.
+        """
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        # The lock keeps waiters in FIFO order so large requests are not starved
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return waited
+                delay = (amount - self._tokens) / self.refill_per_second
+                await asyncio.sleep(delay)
+                waited += delay
+
+
+class SharedTokenBucket(TokenBucket):
+    """
+    Token bucket kept in a shared state backend, so every worker process draws from the same tokens.
+    """
+
+    def __init__(self, name: str, capacity: float, refill_per_second: float, state: SharedState):
+        super().__init__(capacity, refill_per_second)
+        self.name = name
+        self.state = state
+
+    async def acquire(self, amount: float = 1) -> float:
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        # Waiters within this process stay FIFO; across processes the first to retry wins
+        async with self._lock:
+            while True:
+                delay = await asyncio.to_thread(self.state.take, self.name, amount, self.capacity,
+                                                self.refill_per_second)
+                if delay <= 0:
+                    return waited
+                await asyncio.sleep(delay)
+                waited += delay
+
+
+class ProviderRateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute buckets for one provider.
+    With a shared `state`, the buckets are shared by every process using it.
+    """
+
+    def __init__(self, name: str, requests_per_minute: float = 0, tokens_per_minute: float = 0,
+                 state: Optional[SharedState] = None):
+        self.name = name
+        self.requests = self._bucket("requests", requests_per_minute, state)
+        self.tokens = self._bucket("tokens", tokens_per_minute, state)
+        self.acquired = 0
+        self.wait_seconds = 0.0
+
+    def _bucket(self, kind: str, per_minute: float, state: Optional[SharedState]) -> Optional[TokenBucket]:
+        if not per_minute:
+            return None
+        if state is None:
+            return TokenBucket(per_minute, per_minute / 60)
+        return SharedTokenBucket(f"ratelimit:{self.name}:{kind}", per_minute, per_minute / 60, state)
+
+    async def acquire(self, tokens: int = 1) -> None:
+        """
+        Reserves one request and `tokens` estimated tokens against the provider quota.
+        """
+        if self.requests is not None:
+            self.wait_seconds += await self.requests.acquire(1)
+        if self.tokens is not None:
+            self.wait_seconds += await self.tokens.acquire(tokens)
+        self.acquired += 1
+
+    def stats(self) -> dict:
+        return {"acquired": self.acquired, "wait_seconds": round(self.wait_seconds, 3)}
+
+
+# Per-provider limits (overridable through the environment; 0 = unlimited)
+_bucket_state = shared_state if SHARED_STATE_BACKEND != "local" else None
+_rate_limiters: Dict[str, ProviderRateLimiter] = {
+    "gemini": ProviderRateLimiter(
+        "gemini",
+        requests_per_minute=get_settings().gemini_rpm,
+        tokens_per_minute=get_settings().gemini_tpm,
+        state=_bucket_state,
+    ),
+    "openai": ProviderRateLimiter(
+        "openai",
+        requests_per_minute=get_settings().openai_rpm,
+        tokens_per_minute=get_settings().openai_tpm,
+        state=_bucket_state,
+    ),
+}
+
+
+def get_rate_limiter(provider: str) -> Optional[ProviderRateLimiter]:
+    """
+    Returns the rate limiter registered for `provider`, if any.
+    """
+    return _rate_limiters.get(provider)
+
+
+def rate_limiters() -> Dict[str, ProviderRateLimiter]:
+    """
+    Returns the registered rate limiters by provider.
+    """
+    return dict(_rate_limiters)
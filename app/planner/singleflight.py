@@ -0,0 +1,132 @@
+# app/planner/singleflight.py
+
+"""
+Single-flight coalescing of identical in-flight work.
+
+Concurrent callers that ask for the same key share one underlying task and all
+receive its result (or exception). A caller that is cancelled only stops waiting;
+the shared task keeps running for the others and is cancelled only once nobody
+is waiting on it any more.
+
+With a shared state backend (see shared_state.py), identical calls in other
+worker processes are coalesced too: the first worker takes a lease on the key
+and publishes the encoded result; the others poll for it instead of repeating
+the work, and take over if the lease lapses without a result.
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import unicodedata
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from app.logger import logger
+from app.shared_state import SharedState
+
+# Encodes a result to a string for other workers, and decodes it back
+FlightCodec = Tuple[Callable[[Any], str], Callable[[str], Any]]
+
+
+def normalize_brief(text: str) -> str:
+    """
+    Normalizes a brief for coalescing: Unicode NFKC, case-folded, whitespace collapsed.
+    """
+    text = unicodedata.normalize("NFKC", text)
+    return re.sub(r"\s+", " ", text).strip().casefold()
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self, name: str = "singleflight", shared: Optional[SharedState] = None,
+                 lease_seconds: float = 30.0, poll_interval: float = 0.1, result_ttl: float = 30.0):
+        self.name = name
+        self.shared = shared
+        self.lease_seconds = lease_seconds    # renewed while the work runs
+        self.poll_interval = poll_interval
+        self.result_ttl = result_ttl          # how long a published result stays readable
+        self._owner = f"{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.started = 0     # calls that launched a new task
+        self.coalesced = 0   # calls that joined an existing in-flight task
+        self.remote = 0      # tasks that waited on another worker's result
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]], codec: Optional[FlightCodec] = None) -> Any:
+        """
+        Runs `func()` for `key`, or joins the identical call already in flight.
+        With shared state and a `codec`, calls in other workers are joined as well.
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            work = func() if self.shared is None or codec is None else self._across_workers(key, func, codec)
+            flight = _Flight(asyncio.create_task(work))
+            flight.task.add_done_callback(lambda task, key=key, flight=flight: self._finish(key, flight))
+            self._flights[key] = flight
+            self.started += 1
+        else:
+            self.coalesced += 1
+            logger.info("[%s] Coalesced request onto in-flight task (%d waiting)", self.name, flight.waiters + 1)
+
+        flight.waiters += 1
+        try:
+            # Shield so one waiter's cancellation does not cancel the shared task
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Every waiter is gone: stop the work and let the next caller start fresh
+                flight.task.cancel()
+                self._finish(key, flight)
+
+    async def _across_workers(self, key: Hashable, func: Callable[[], Awaitable[Any]], codec: FlightCodec) -> Any:
+        encode, decode = codec
+        digest = hashlib.sha256(repr(key).encode("utf-8")).hexdigest()[:32]
+        lease_key, result_key = f"flight:{self.name}:{digest}:lease", f"flight:{self.name}:{digest}:result"
+        waited = False
+        while True:
+            if await asyncio.to_thread(self.shared.add, lease_key, self._owner, self.lease_seconds):
+                renewal = asyncio.create_task(self._renew(lease_key))
+                try:
+                    result = await func()
+                    await asyncio.to_thread(self.shared.set, result_key, encode(result), self.result_ttl)
+                    return result
+                finally:
+                    renewal.cancel()
+                    await asyncio.to_thread(self.shared.delete, lease_key)
+
+            if not waited:
+                waited = True
+                self.remote += 1
+                logger.info("[%s] Waiting on another worker's in-flight task", self.name)
+            while await asyncio.to_thread(self.shared.get, lease_key) is not None:
+                await asyncio.sleep(self.poll_interval)
+            encoded = await asyncio.to_thread(self.shared.get, result_key)
+            if encoded is not None:
+                return decode(encoded)
+            # The other worker failed or was stopped: try to take the lease and do the work here
+
+    async def _renew(self, lease_key: str) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            await asyncio.to_thread(self.shared.set, lease_key, self._owner, self.lease_seconds)
+
+    def _finish(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if flight.task.done() and not flight.task.cancelled():
+            flight.task.exception()  # mark retrieved so unobserved failures are not logged twice
+
+    def stats(self) -> dict:
+        """
+        Returns counters for started and coalesced calls and the number in flight.
+        """
+        stats = {"started": self.started, "coalesced": self.coalesced, "in_flight": len(self._flights)}
+        if self.shared is not None:
+            stats["remote"] = self.remote
+        return stats
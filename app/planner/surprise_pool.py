@@ -0,0 +1,158 @@
+# app/planner/surprise_pool.py
+
+"""
+Prefetched pool of surprise briefs.
+
+`GET /surprise` pops a brief that was generated ahead of time, so it returns
+from memory even when OpenAI is slow or briefly down. When the pool drops below
+a low-water mark, a background task refills it in batches (one request with
+OpenAI's `n` parameter per batch). Each candidate is checked against a MinHash
+index of recently pooled and served briefs, and near-duplicates are discarded.
+Only an empty pool (e.g. right after startup) falls back to a live call.
+"""
+
+import asyncio
+import itertools
+import time
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+from app.settings import get_settings
+from app.logger import logger
+from app.planner import llm_openai
+from app.planner.minhash import MinHashIndex
+
+# Pool configuration (overridable through the environment)
+SURPRISE_POOL_ENABLED = get_settings().surprise_pool_enabled
+# Fill the pool when the app starts (off for tests and offline runs: it calls the surprise provider)
+SURPRISE_PREFETCH_ON_STARTUP = get_settings().surprise_prefetch_on_startup
+SURPRISE_POOL_SIZE = get_settings().surprise_pool_size
+SURPRISE_POOL_LOW_WATER = get_settings().surprise_pool_low_water
+SURPRISE_BATCH_SIZE = get_settings().surprise_batch_size
+SURPRISE_DEDUP_THRESHOLD = get_settings().surprise_dedup_threshold
+SURPRISE_DEDUP_WINDOW = get_settings().surprise_dedup_window
+
+# Seconds to wait after a failed refill before trying again
+REFILL_RETRY_SECONDS = 10.0
+# Consecutive batches without a single new brief before a refill gives up
+MAX_STALE_BATCHES = 3
+
+
+class SurprisePool:
+    def __init__(self, size: int = SURPRISE_POOL_SIZE, low_water: int = SURPRISE_POOL_LOW_WATER,
+                 batch_size: int = SURPRISE_BATCH_SIZE, threshold: float = SURPRISE_DEDUP_THRESHOLD,
+                 window: int = SURPRISE_DEDUP_WINDOW):
+        self.size = size
+        self.low_water = low_water
+        self.batch_size = batch_size
+        self._briefs: Deque[str] = deque()
+        self._recent = MinHashIndex(threshold, max_entries=window)
+        self._keys = itertools.count()
+        self._refill_task: Optional[asyncio.Task] = None
+        self._retry_at = 0.0
+        self.served = 0       # briefs returned from the pool
+        self.misses = 0       # requests that found the pool empty
+        self.generated = 0    # briefs admitted to the pool
+        self.duplicates = 0   # candidates rejected as near-duplicates
+        self.errors = 0       # failed refill batches
+
+    def __len__(self) -> int:
+        return len(self._briefs)
+
+    def offer(self, brief: str) -> bool:
+        """
+        Admits a brief unless it is empty or a near-duplicate of a recent one.
+        """
+        brief = brief.strip().strip('"').strip()
+        if not brief:
+            return False
+        if self._recent.query(brief):
+            self.duplicates += 1
+            return False
+        self._recent.add(next(self._keys), brief)
+        self._briefs.append(brief)
+        self.generated += 1
+        return True
+
+    def take(self) -> Optional[str]:
+        """
+        Pops a pooled brief (None if empty) and schedules a refill if the pool is running low.
+        """
+        brief = self._briefs.popleft() if self._briefs else None
+        if brief is not None:
+            self.served += 1
+        self.maybe_refill()
+        return brief
+
+    async def get(self) -> Tuple[str, str]:
+        """
+        Returns (brief, source): from the pool, or from a live call if the pool is empty.
+        """
+        brief = self.take() if SURPRISE_POOL_ENABLED else None
+        if brief is not None:
+            return brief, "pool"
+        self.misses += 1
+        try:
+            (brief,) = await llm_openai.generate_surprise_briefs(1)
+        except Exception as e:
+            return f"[OpenAI Error] Failed to generate surprise brief: {e}", "live"
+        self._recent.add(next(self._keys), brief)
+        return brief, "live"
+
+    def refilling(self) -> bool:
+        task = self._refill_task
+        # A task from an event loop that has since closed (e.g. between test clients) no longer counts
+        return task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop()
+
+    def maybe_refill(self) -> None:
+        if not SURPRISE_POOL_ENABLED or len(self._briefs) >= self.low_water:
+            return
+        if self.refilling() or time.monotonic() < self._retry_at:
+            return
+        self._refill_task = asyncio.create_task(self.refill())
+
+    async def refill(self) -> None:
+        """
+        Generates batches until the pool is full. Stops early on an error (retrying after
+        REFILL_RETRY_SECONDS) or when the model keeps producing only near-duplicates.
+        """
+        stale = 0
+        while len(self._briefs) < self.size:
+            try:
+                candidates = await llm_openai.generate_surprise_briefs(self.batch_size)
+            except Exception as e:
+                self.errors += 1
+                self._retry_at = time.monotonic() + REFILL_RETRY_SECONDS
+                logger.warning("Surprise pool refill failed (%d pooled): %s", len(self._briefs), e)
+                return
+            added = sum(self.offer(candidate) for candidate in candidates)
+            stale = 0 if added else stale + 1
+            if stale >= MAX_STALE_BATCHES:
+                self._retry_at = time.monotonic() + REFILL_RETRY_SECONDS
+                logger.warning("Surprise pool refill stopped: %d batches of near-duplicates", stale)
+                return
+        logger.info("Surprise pool refilled to %d briefs", len(self._briefs))
+
+    async def start(self) -> None:
+        if SURPRISE_PREFETCH_ON_STARTUP:
+            self.maybe_refill()
+
+    async def stop(self) -> None:
+        if self.refilling():
+            self._refill_task.cancel()
+            await asyncio.gather(self._refill_task, return_exceptions=True)
+        self._refill_task = None
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._briefs),
+            "served": self.served,
+            "misses": self.misses,
+            "generated": self.generated,
+            "duplicates": self.duplicates,
+            "errors": self.errors,
+        }
+
+
+# Shared process-wide pool, filled from the app lifespan and on demand
+surprise_pool = SurprisePool()
@@ -0,0 +1,69 @@
+# app/planner/trace.py
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+
+@dataclass
+class PlanTrace:
+    """
+    Records how a plan was produced: the planning mode, which chain stages ran,
+    were skipped or were reused from a near-duplicate brief, their outputs, and
+    per-stage timings (seconds). `near_duplicate` is "plan" or "prefix" when the
+    brief index served a stored plan or chain prefix, with its `similarity`.
+    `prompt_sizes` holds the prompt-size ledger summary: input, reused-prefix and
+    output sizes per stage plus a "total" row (see prompt_accounting.py).
+    Callers pass one into `plan_from_brief` to inspect a run afterwards.
+    """
+    mode: str = ""
+    stages_run: List[str] = field(default_factory=list)
+    stages_skipped: List[str] = field(default_factory=list)
+    stages_reused: List[str] = field(default_factory=list)
+    stage_outputs: Dict[str, str] = field(default_factory=dict)
+    timings: Dict[str, float] = field(default_factory=dict)
+    near_duplicate: str = ""
+    similarity: float = 0.0
+    prompt_sizes: Dict[str, Dict[str, int]] = field(default_factory=dict)
+
+    def update(self, other: "PlanTrace") -> None:
+        """
+        Copies another trace's contents into this one (e.g. from a coalesced run).
+        """
+        self.mode = other.mode
+        self.stages_run = list(other.stages_run)
+        self.stages_skipped = list(other.stages_skipped)
+        self.stages_reused = list(other.stages_reused)
+        self.stage_outputs = dict(other.stage_outputs)
+        self.timings = dict(other.timings)
+        self.near_duplicate = other.near_duplicate
+        self.similarity = other.similarity
+        self.prompt_sizes = {stage: dict(sizes) for stage, sizes in other.prompt_sizes.items()}
+
+    def branch(self, index: int) -> "PlanTrace":
+        """
+        The view of one variant of a multi-variant run: the shared stages plus that
+        variant's branch stages, with the branch suffix ("story_1" -> "story") removed.
+        """
+        def select(items: Dict) -> Dict:
+            selected = {}
+            for name, value in items.items():
+                match = re.fullmatch(r"(.+)_(\d+)", name)
+                if match is None:
+                    selected[name] = value
+                elif int(match.group(2)) == index:
+                    selected[match.group(1)] = value
+            return selected
+
+        return PlanTrace(
+            mode=self.mode,
+            stages_run=list(select(dict.fromkeys(self.stages_run))),
+            stages_skipped=list(select(dict.fromkeys(self.stages_skipped))),
+            stages_reused=list(select(dict.fromkeys(self.stages_reused))),
+            stage_outputs=select(self.stage_outputs),
+            timings=select(self.timings),
+            near_duplicate=self.near_duplicate,
+            similarity=self.similarity,
+            # Sizes are per base stage, so they cover every variant of the run
+            prompt_sizes={stage: dict(sizes) for stage, sizes in self.prompt_sizes.items()},
+        )
@@ -1,15 +1,29 @@
 # app/planner/video_captioning.py
 
-import os
-from dotenv import load_dotenv
-import google.generativeai as genai
+import asyncio
+from typing import Optional, Union
 
-# Load Gemini API key from environment
-load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+from app.logger import logger
+from app.planner.admission import OverloadedError
+from app.planner.image_preprocess import caption_cache, run_in_pool
+from app.planner.model_tiers import model_tiers
+from app.planner.providers import get_provider, call_provider
+from app.planner.video_keyframes import Keyframe, extract_keyframes
+from app.uploads import SpooledUpload
 
-# Initialize Gemini multimodal model with video support
-model = genai.GenerativeModel("gemini-2.5-pro")  # Or gemini-2.0-flash if latency is critical
+# Multimodal provider and model with video support ("caption_video" / "caption_frame" model tiers override the model)
+CAPTION_PROVIDER = "gemini"
+CAPTION_MODEL = "gemini-2.5-pro"  # Or gemini-2.0-flash if latency is critical
+
+# "inline": send the whole clip to the model; "keyframes": caption sampled scene frames locally
+VIDEO_CAPTION_MODES = ("inline", "keyframes")
+VIDEO_CAPTION_MODE = "inline"
+
+# Maximum frame captions in flight at once in keyframes mode
+FRAME_CAPTION_CONCURRENCY = 4
+
+# Videos larger than this are sent through the provider's file-upload API instead of inline
+INLINE_VIDEO_MAX_BYTES = 16 * 1024 * 1024
 
 # Prompt to guide the video captioning behavior
 VIDEO_CAPTION_PROMPT = (
@@ -17,21 +31,82 @@ VIDEO_CAPTION_PROMPT = (
     "Mention the visuals, sounds, emotions, pacing, and anything else that would help inspire a short-form video idea."
 )
 
-async def caption_video(video_bytes: bytes) -> str:
+# Prompt for a single sampled frame in keyframes mode
+FRAME_CAPTION_PROMPT = (
+    "This is one frame from a video. Describe it creatively in one or two sentences. "
+    "Mention the subjects, setting, action, and mood."
+)
+
+async def caption_video(video: Union[bytes, SpooledUpload], mode: Optional[str] = None) -> str:
     """
     Asynchronously generates a creative paragraph describing a video using Gemini.
-    Expects raw video bytes (MP4 format).
+    Accepts raw video bytes (MP4 format) or a spooled upload. In "inline" mode small
+    videos are sent inline and large ones are uploaded as a file first, so they are
+    never loaded into memory. In "keyframes" mode sampled scene frames are captioned instead.
     """
+    if (mode or VIDEO_CAPTION_MODE) == "keyframes":
+        return await caption_video_keyframes(video)
+
+    provider = get_provider(CAPTION_PROVIDER)
+    handle = None
     try:
-        response = await model.generate_content_async([
-            {
-                "inline_data": {
-                    "data": video_bytes,
-                    "mime_type": "video/mp4"
-                }
-            },
-            VIDEO_CAPTION_PROMPT
-        ])
-        return response.text.strip()
+        if isinstance(video, bytes):
+            part = {"inline_data": {"data": video, "mime_type": "video/mp4"}}
+        elif video.size <= INLINE_VIDEO_MAX_BYTES:
+            part = {"inline_data": {"data": video.read(), "mime_type": video.mime_type}}
+        else:
+            logger.info("Uploading %d-byte video to %s before captioning", video.size, provider.name)
+            video.file.seek(0)
+            handle = part = await provider.upload_file(video.file, video.mime_type)
+        model, config = model_tiers.resolve("caption_video", CAPTION_MODEL)
+        return await call_provider(provider, [part, VIDEO_CAPTION_PROMPT], model, config)
+    except OverloadedError:
+        # Shed load (open circuit) fails the request instead of becoming the caption
+        raise
     except Exception as e:
         return f"[Gemini Error] Failed to caption video: {e}"
+    finally:
+        if handle is not None:
+            try:
+                await provider.delete_file(handle)
+            except Exception:
+                logger.warning("Failed to delete uploaded video file", exc_info=True)
+
+def _timestamp(seconds: float) -> str:
+    return f"{int(seconds) // 60}:{int(seconds) % 60:02d}"
+
+async def _caption_frame(keyframe: Keyframe, semaphore: asyncio.Semaphore) -> str:
+    model, config = model_tiers.resolve("caption_frame", CAPTION_MODEL)
+    namespace = f"frame:{CAPTION_PROVIDER}/{model}"
+    cached = caption_cache.get(namespace, keyframe.image.dhash)
+    if cached is not None:
+        return cached
+    async with semaphore:
+        part = {"inline_data": {"data": keyframe.image.jpeg, "mime_type": "image/jpeg"}}
+        caption = await call_provider(get_provider(CAPTION_PROVIDER), [part, FRAME_CAPTION_PROMPT], model, config)
+    caption_cache.set(namespace, keyframe.image.dhash, caption)
+    return caption
+
+async def caption_video_keyframes(video: Union[bytes, SpooledUpload]) -> str:
+    """
+    Samples scene keyframes locally, captions them concurrently (at most
+    FRAME_CAPTION_CONCURRENCY at a time), and merges the captions in time order
+    into a single paragraph.
+    """
+    try:
+        keyframes = await run_in_pool(extract_keyframes, video if isinstance(video, bytes) else video.file)
+        if not keyframes:
+            raise ValueError("no frames could be decoded")
+        logger.info("Captioning %d keyframes sampled from video", len(keyframes))
+
+        semaphore = asyncio.Semaphore(FRAME_CAPTION_CONCURRENCY)
+        captions = await asyncio.gather(*(_caption_frame(keyframe, semaphore) for keyframe in keyframes))
+        scenes = " ".join(
+            f"At {_timestamp(keyframe.timestamp)}: {caption.strip()}"
+            for keyframe, caption in zip(keyframes, captions)
+        )
+        return f"A video in {len(keyframes)} scene{'s' if len(keyframes) != 1 else ''}. {scenes}"
+    except OverloadedError:
+        raise
+    except Exception as e:
+        return f"[Gemini Error] Failed to caption video keyframes: {e}"
@@ -0,0 +1,123 @@
+# app/planner/video_keyframes.py
+
+"""
+Local keyframe sampling for video captioning.
+
+Instead of sending a whole clip to the vision model, the video is decoded
+locally with PyAV (optional dependency: `pip install av`), candidate frames are
+sampled at most every KEYFRAME_MIN_INTERVAL seconds, and a frame is kept only if
+its dHash differs enough from the last kept frame (a scene change). At most
+KEYFRAME_MAX_FRAMES frames are kept, evenly spread over the detected scenes,
+each downscaled to KEYFRAME_MAX_EDGE. Captioning cost then scales with the number
+of scenes rather than with file size.
+"""
+
+import math
+from dataclasses import dataclass
+from io import BytesIO
+from typing import BinaryIO, Iterable, Iterator, List, Tuple, Union
+
+from PIL import Image
+
+from app.settings import get_settings
+from app.planner.image_preprocess import PreparedImage, dhash, hamming_distance, prepare_decoded
+
+try:
+    import av
+except ImportError:  # optional dependency
+    av = None
+
+KEYFRAME_MAX_FRAMES = get_settings().keyframe_max_frames
+KEYFRAME_MIN_INTERVAL = get_settings().keyframe_min_interval
+KEYFRAME_MAX_EDGE = get_settings().keyframe_max_edge
+
+# Minimum dHash distance (out of 64 bits) between consecutive kept frames
+SCENE_CHANGE_THRESHOLD = get_settings().scene_change_threshold
+
+
+@dataclass
+class Keyframe:
+    timestamp: float
+    image: PreparedImage
+
+
+def keyframes_available() -> bool:
+    """
+    True if PyAV is installed and local keyframe sampling can be used.
+    """
+    return av is not None
+
+
+def select_scene_frames(frames: Iterable[Tuple[float, Image.Image]], max_frames: int = KEYFRAME_MAX_FRAMES,
+                        threshold: int = SCENE_CHANGE_THRESHOLD, min_interval: float = KEYFRAME_MIN_INTERVAL,
+                        max_edge: int = KEYFRAME_MAX_EDGE) -> List[Keyframe]:
+    """
+    Keeps the first frame and every frame that differs from the previously kept one by
+    more than `threshold` dHash bits, then thins the result to `max_frames` evenly spaced scenes.
+
+    Memory stays bounded however many scenes a clip has: only every `stride`-th scene
+    (plus the latest one) is held, downscaled and not yet encoded, and the stride doubles
+    whenever more than 2 * max_frames are held. Only the frames finally kept are JPEG-encoded.
+    """
+    # (scene index, timestamp, downscaled frame, dHash, original size)
+    held: List[Tuple[int, float, Image.Image, int, Tuple[int, int]]] = []
+    latest = None
+    stride = 1
+    scenes = 0
+    last_hash = None
+    last_time = -math.inf
+    for timestamp, image in frames:
+        if timestamp - last_time < min_interval:
+            continue
+        frame_hash = dhash(image)
+        if last_hash is not None and hamming_distance(frame_hash, last_hash) <= threshold:
+            continue
+        last_hash, last_time = frame_hash, timestamp
+
+        small = image.convert("RGB")
+        small.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+        latest = (scenes, timestamp, small, frame_hash, image.size)
+        if scenes % stride == 0:
+            held.append(latest)
+            if len(held) > 2 * max_frames:
+                stride *= 2
+                held = [scene for scene in held if scene[0] % stride == 0]
+        scenes += 1
+
+    if latest is not None and (not held or held[-1][0] != latest[0]):
+        held.append(latest)
+    if len(held) > max_frames:
+        step = (len(held) - 1) / (max_frames - 1) if max_frames > 1 else 0
+        held = [held[round(i * step)] for i in range(max_frames)]
+    return [Keyframe(timestamp, prepare_decoded(small, max_edge, original_size, frame_hash))
+            for _, timestamp, small, frame_hash, original_size in held]
+
+
+def _decode_frames(source: BinaryIO, keyframes_only: bool) -> Iterator[Tuple[float, Image.Image]]:
+    source.seek(0)
+    with av.open(source) as container:
+        stream = container.streams.video[0]
+        stream.thread_type = "AUTO"
+        if keyframes_only:
+            # Decoding only I-frames is far cheaper than decoding every frame
+            stream.codec_context.skip_frame = "NONKEY"
+        for frame in container.decode(stream):
+            if frame.time is not None:
+                yield frame.time, frame.to_image()
+
+
+def extract_keyframes(source: Union[bytes, BinaryIO], max_frames: int = KEYFRAME_MAX_FRAMES) -> List[Keyframe]:
+    """
+    Decodes a video and returns up to `max_frames` scene keyframes. Blocking; run it
+    in the preprocessing pool. Falls back to decoding every frame when the stream has
+    too few I-frames to show its scenes.
+    """
+    if av is None:
+        raise RuntimeError("Keyframe sampling requires PyAV (pip install av)")
+    if isinstance(source, bytes):
+        source = BytesIO(source)
+
+    frames = select_scene_frames(_decode_frames(source, keyframes_only=True), max_frames)
+    if len(frames) < 2:
+        frames = select_scene_frames(_decode_frames(source, keyframes_only=False), max_frames)
+    return frames
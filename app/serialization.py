@@ -0,0 +1,112 @@
+# app/serialization.py
+
+"""
+JSON response encoding.
+
+Responses are compact by default and encoded with orjson (in requirements.txt).
+The standard library encoder is only a fallback for installs without it.
+`JSONNegotiationMiddleware` then adapts complete JSON responses to the request:
+indented output with `?pretty=1`, and gzip when the client accepts it and the
+body is at least GZIP_MIN_BYTES. Streaming responses (SSE, NDJSON) pass through
+untouched, so their events are never held back by a compressor.
+"""
+
+import gzip
+import json
+from typing import Any
+from urllib.parse import parse_qs
+
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.settings import get_settings
+
+try:
+    import orjson
+except ImportError:  # fallback for installs without the fast encoder
+    orjson = None
+
+GZIP_MIN_BYTES = get_settings().gzip_min_bytes
+GZIP_LEVEL = get_settings().gzip_level
+
+
+def dumps(content: Any, pretty: bool = False) -> bytes:
+    """
+    Encodes `content` as UTF-8 JSON: compact by default, 2-space indented with `pretty`.
+    """
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_INDENT_2 if pretty else 0)
+    if pretty:
+        return json.dumps(content, indent=2, ensure_ascii=False).encode("utf-8")
+    return json.dumps(content, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+class CompactJSONResponse(JSONResponse):
+    """Default response class: compact JSON through the fastest available encoder."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def wants_pretty(query_string: bytes) -> bool:
+    if b"pretty" not in query_string:
+        return False
+    values = parse_qs(query_string.decode("latin-1")).get("pretty", [])
+    return any(value.lower() in ("1", "true", "yes") for value in values)
+
+
+class JSONNegotiationMiddleware:
+    """
+    Pure ASGI middleware that pretty-prints and/or gzips single-message JSON responses.
+    """
+
+    def __init__(self, app, minimum_size: int = GZIP_MIN_BYTES, compresslevel: int = GZIP_LEVEL):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        pretty = wants_pretty(scope.get("query_string", b""))
+        accepts_gzip = "gzip" in Headers(scope=scope).get("accept-encoding", "")
+        if not pretty and not accepts_gzip:
+            await self.app(scope, receive, send)
+            return
+
+        start = {}
+
+        async def negotiate(message):
+            if message["type"] == "http.response.start":
+                start.update(message)
+                return
+            if not start:
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+            if (message.get("more_body") or "content-encoding" in headers
+                    or not headers.get("content-type", "").startswith("application/json")):
+                # Streaming or already-encoded responses are forwarded as is
+                await send(start)
+                start.clear()
+                await send(message)
+                return
+
+            if pretty and body:
+                body = dumps(json.loads(body), pretty=True)
+            if accepts_gzip:
+                headers.add_vary_header("Accept-Encoding")
+                if len(body) >= self.minimum_size:
+                    body = gzip.compress(body, compresslevel=self.compresslevel)
+                    headers["Content-Encoding"] = "gzip"
+            if "content-length" in headers:
+                headers["Content-Length"] = str(len(body))
+            await send(start)
+            start.clear()
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, negotiate)
@@ -0,0 +1,227 @@
+# app/settings.py
+
+"""
+Process-wide settings.
+
+`.env` is parsed once per process by `load_env()`. Every environment knob —
+provider selection and credentials as well as the caches, stores, limits and
+tuning parameters — is read in `Settings.from_env()` and shared through
+`get_settings()`. Modules copy the fields they use into module constants at
+import time, so tests can still override a single knob with monkeypatch.
+"""
+
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, Tuple
+
+
+@lru_cache(maxsize=None)
+def load_env() -> None:
+    """
+    Loads `.env` into the environment (existing variables win). Later calls are no-ops.
+    """
+    from dotenv import load_dotenv
+    load_dotenv()
+
+
+def _names(value: str) -> Tuple[str, ...]:
+    return tuple(name.strip() for name in value.split(",") if name.strip())
+
+
+def _int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+def _float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+def _on_unless_zero(name: str) -> bool:
+    return os.getenv(name, "1") != "0"
+
+
+def _off_unless_one(name: str) -> bool:
+    return os.getenv(name, "0") == "1"
+
+
+@dataclass(frozen=True)
+class Settings:
+    # Providers
+    llm_provider: str = "gemini"         # default text provider (see providers.py)
+    llm_model: Optional[str] = None      # None = the provider's default model
+    google_api_key: Optional[str] = None
+    openai_api_key: Optional[str] = None
+    warm_providers: Tuple[str, ...] = ()  # providers to connect on startup
+    warm_timeout: float = 5.0            # seconds startup waits for warm-up
+
+    # Provider limits and resilience (0 = unlimited / no limit)
+    gemini_rpm: float = 0.0
+    gemini_tpm: float = 0.0
+    openai_rpm: float = 0.0
+    openai_tpm: float = 0.0
+    breaker_failure_threshold: int = 5
+    breaker_reset_seconds: float = 30.0
+    provider_call_timeout: float = 120.0
+    hedge_enabled: bool = False
+    hedge_percentile: float = 0.9
+    hedge_min_samples: int = 20
+    hedge_default_delay: float = 15.0
+    hedge_min_delay: float = 1.0
+    hedge_alternate: str = ""            # "provider" or "provider:model"
+    model_tiers: str = ""
+    model_tiers_file: str = ""
+
+    # Admission control
+    admission_max_concurrent: int = 16
+    admission_max_queue: int = 32
+    admission_queue_timeout: float = 10.0
+
+    # Caches and stores
+    llm_cache_enabled: bool = True
+    llm_cache_max_entries: int = 512
+    llm_cache_ttl_seconds: float = 7 * 24 * 3600
+    llm_cache_path: str = ".cache/llm_cache.sqlite3"
+    llm_cache_purge_interval: float = 3600.0
+    brief_index_enabled: bool = False
+    brief_index_plan_threshold: float = 0.95
+    brief_index_prefix_threshold: float = 0.85
+    brief_index_max_entries: int = 1024
+    plan_store_enabled: bool = True
+    plan_store_path: str = ".cache/plans.sqlite3"
+    cassette_mode: str = "off"           # off | record | replay
+    cassette_path: str = ".cache/cassette.jsonl.gz"
+    cassette_latency_scale: float = 1.0
+    shared_state_backend: str = "local"
+    shared_state_path: str = ".cache/shared_state.sqlite3"
+    shared_state_url: str = "redis://localhost:6379/0"
+
+    # Background jobs
+    job_db_path: str = ".cache/jobs.sqlite3"
+    job_workers: int = 2
+    job_max_queue_depth: int = 100
+    job_default_timeout: float = 300.0
+    job_lease_seconds: float = 30.0
+
+    # Surprise pool
+    surprise_pool_enabled: bool = True
+    surprise_prefetch_on_startup: bool = True
+    surprise_pool_size: int = 20
+    surprise_pool_low_water: int = 5
+    surprise_batch_size: int = 5
+    surprise_dedup_threshold: float = 0.5
+    surprise_dedup_window: int = 512
+
+    # Uploads and media
+    upload_max_image_mb: float = 20.0
+    upload_max_video_mb: float = 500.0
+    upload_spool_memory_mb: float = 8.0
+    image_max_edge: int = 1536
+    image_preprocess_workers: int = 4    # from_env caps the default at the CPU count
+    caption_cache_max_distance: int = 4
+    caption_cache_max_entries: int = 512
+    keyframe_max_frames: int = 8
+    keyframe_min_interval: float = 1.0
+    keyframe_max_edge: int = 768
+    scene_change_threshold: int = 12
+
+    # Responses and logging
+    gzip_min_bytes: int = 1024
+    gzip_level: int = 5
+    log_format: str = "json"
+    log_queue_size: int = 10000
+    log_max_arg_chars: int = 2000
+    log_payload_preview_chars: int = 200
+    log_payload_sample_rate: float = 0.05
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        load_env()
+        return cls(
+            llm_provider=os.getenv("LLM_PROVIDER", "gemini"),
+            llm_model=os.getenv("LLM_MODEL") or None,
+            google_api_key=os.getenv("GOOGLE_API_KEY"),
+            openai_api_key=os.getenv("OPENAI_API_KEY"),
+            warm_providers=_names(os.getenv("WARM_PROVIDERS", "")),
+            warm_timeout=_float("WARM_TIMEOUT_SECONDS", 5),
+
+            gemini_rpm=_float("GEMINI_RPM", 0),
+            gemini_tpm=_float("GEMINI_TPM", 0),
+            openai_rpm=_float("OPENAI_RPM", 0),
+            openai_tpm=_float("OPENAI_TPM", 0),
+            breaker_failure_threshold=_int("BREAKER_FAILURE_THRESHOLD", 5),
+            breaker_reset_seconds=_float("BREAKER_RESET_SECONDS", 30),
+            provider_call_timeout=_float("PROVIDER_CALL_TIMEOUT", 120),
+            hedge_enabled=_off_unless_one("HEDGE_ENABLED"),
+            hedge_percentile=_float("HEDGE_PERCENTILE", 0.9),
+            hedge_min_samples=_int("HEDGE_MIN_SAMPLES", 20),
+            hedge_default_delay=_float("HEDGE_DEFAULT_DELAY", 15),
+            hedge_min_delay=_float("HEDGE_MIN_DELAY", 1),
+            hedge_alternate=os.getenv("HEDGE_ALTERNATE", ""),
+            model_tiers=os.getenv("MODEL_TIERS", ""),
+            model_tiers_file=os.getenv("MODEL_TIERS_FILE", ""),
+
+            admission_max_concurrent=_int("ADMISSION_MAX_CONCURRENT", 16),
+            admission_max_queue=_int("ADMISSION_MAX_QUEUE", 32),
+            admission_queue_timeout=_float("ADMISSION_QUEUE_TIMEOUT", 10),
+
+            llm_cache_enabled=_on_unless_zero("LLM_CACHE_ENABLED"),
+            llm_cache_max_entries=_int("LLM_CACHE_MAX_ENTRIES", 512),
+            llm_cache_ttl_seconds=_float("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600),
+            llm_cache_path=os.getenv("LLM_CACHE_PATH", ".cache/llm_cache.sqlite3"),
+            llm_cache_purge_interval=_float("LLM_CACHE_PURGE_INTERVAL", 3600),
+            brief_index_enabled=_off_unless_one("BRIEF_INDEX_ENABLED"),
+            brief_index_plan_threshold=_float("BRIEF_INDEX_PLAN_THRESHOLD", 0.95),
+            brief_index_prefix_threshold=_float("BRIEF_INDEX_PREFIX_THRESHOLD", 0.85),
+            brief_index_max_entries=_int("BRIEF_INDEX_MAX_ENTRIES", 1024),
+            plan_store_enabled=_on_unless_zero("PLAN_STORE_ENABLED"),
+            plan_store_path=os.getenv("PLAN_STORE_PATH", ".cache/plans.sqlite3"),
+            cassette_mode=os.getenv("CASSETTE_MODE", "off"),
+            cassette_path=os.getenv("CASSETTE_PATH", ".cache/cassette.jsonl.gz"),
+            cassette_latency_scale=_float("CASSETTE_LATENCY_SCALE", 1),
+            shared_state_backend=os.getenv("SHARED_STATE_BACKEND", "local"),
+            shared_state_path=os.getenv("SHARED_STATE_PATH", ".cache/shared_state.sqlite3"),
+            shared_state_url=os.getenv("SHARED_STATE_URL", "redis://localhost:6379/0"),
+
+            job_db_path=os.getenv("JOB_DB_PATH", ".cache/jobs.sqlite3"),
+            job_workers=_int("JOB_WORKERS", 2),
+            job_max_queue_depth=_int("JOB_MAX_QUEUE_DEPTH", 100),
+            job_default_timeout=_float("JOB_DEFAULT_TIMEOUT", 300),
+            job_lease_seconds=_float("JOB_LEASE_SECONDS", 30),
+
+            surprise_pool_enabled=_on_unless_zero("SURPRISE_POOL_ENABLED"),
+            surprise_prefetch_on_startup=_on_unless_zero("SURPRISE_PREFETCH_ON_STARTUP"),
+            surprise_pool_size=_int("SURPRISE_POOL_SIZE", 20),
+            surprise_pool_low_water=_int("SURPRISE_POOL_LOW_WATER", 5),
+            surprise_batch_size=_int("SURPRISE_BATCH_SIZE", 5),
+            surprise_dedup_threshold=_float("SURPRISE_DEDUP_THRESHOLD", 0.5),
+            surprise_dedup_window=_int("SURPRISE_DEDUP_WINDOW", 512),
+
+            upload_max_image_mb=_float("UPLOAD_MAX_IMAGE_MB", 20),
+            upload_max_video_mb=_float("UPLOAD_MAX_VIDEO_MB", 500),
+            upload_spool_memory_mb=_float("UPLOAD_SPOOL_MEMORY_MB", 8),
+            image_max_edge=_int("IMAGE_MAX_EDGE", 1536),
+            image_preprocess_workers=_int("IMAGE_PREPROCESS_WORKERS", min(4, os.cpu_count() or 1)),
+            caption_cache_max_distance=_int("CAPTION_CACHE_MAX_DISTANCE", 4),
+            caption_cache_max_entries=_int("CAPTION_CACHE_MAX_ENTRIES", 512),
+            keyframe_max_frames=_int("KEYFRAME_MAX_FRAMES", 8),
+            keyframe_min_interval=_float("KEYFRAME_MIN_INTERVAL", 1.0),
+            keyframe_max_edge=_int("KEYFRAME_MAX_EDGE", 768),
+            scene_change_threshold=_int("SCENE_CHANGE_THRESHOLD", 12),
+
+            gzip_min_bytes=_int("GZIP_MIN_BYTES", 1024),
+            gzip_level=_int("GZIP_LEVEL", 5),
+            log_format=os.getenv("LOG_FORMAT", "json"),
+            log_queue_size=_int("LOG_QUEUE_SIZE", 10000),
+            log_max_arg_chars=_int("LOG_MAX_ARG_CHARS", 2000),
+            log_payload_preview_chars=_int("LOG_PAYLOAD_PREVIEW_CHARS", 200),
+            log_payload_sample_rate=_float("LOG_PAYLOAD_SAMPLE_RATE", 0.05),
+        )
+
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """
+    The shared settings, read from the environment on first call.
+    """
+    return Settings.from_env()
@@ -0,0 +1,300 @@
+# app/shared_state.py
+
+"""
+Pluggable state shared between worker processes.
+
+Under `uvicorn --workers N` every process has its own memory, so caches,
+rate-limit buckets and in-flight coalescing keys kept in module globals diverge
+between workers. A `SharedState` backend holds them in one place instead:
+
+- local:  in-process dictionaries (one worker; the default)
+- sqlite: a SQLite database in WAL mode, shared by every worker on the host
+- redis:  a Redis-compatible server (optional `redis` package), shared across hosts
+
+The interface is a small key/value store with TTLs, an atomic set-if-absent
+(for leases) and an atomic token-bucket take (for rate limits). Methods are
+synchronous and the SQLite and Redis backends do blocking I/O, so async callers
+run them with `asyncio.to_thread` to keep the event loop free.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from app.settings import get_settings
+
+# Backend selection (overridable through the environment)
+SHARED_STATE_BACKEND = get_settings().shared_state_backend
+SHARED_STATE_PATH = get_settings().shared_state_path
+SHARED_STATE_URL = get_settings().shared_state_url
+
+# Keys are namespaced so a shared Redis can host other data
+KEY_PREFIX = "creative_agent:"
+
+
+class SharedState:
+    """
+    Interface implemented by every backend. `ttl` is in seconds (None = no expiry).
+    """
+    name = "base"
+
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    def add(self, key: str, value: str, ttl: Optional[float] = None) -> bool:
+        """
+        Sets `key` only if it is absent (or expired). Returns whether it was set.
+        """
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def take(self, bucket: str, amount: float, capacity: float, refill_per_second: float) -> float:
+        """
+        Takes `amount` tokens from a token bucket (created full) if it has them and returns 0.
+        Otherwise takes nothing and returns the seconds until enough tokens will be available.
+        """
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+def _bucket_after(tokens: float, updated: float, now: float, amount: float, capacity: float,
+                  refill_per_second: float) -> Tuple[float, float]:
+    """
+    Token-bucket arithmetic shared by the local and SQLite backends: returns (tokens left, wait).
+    """
+    tokens = min(capacity, tokens + (now - updated) * refill_per_second)
+    if tokens >= amount:
+        return tokens - amount, 0.0
+    return tokens, (amount - tokens) / refill_per_second
+
+
+class LocalState(SharedState):
+    name = "local"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values: Dict[str, Tuple[str, Optional[float]]] = {}
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    def _live(self, key: str, now: float) -> Optional[str]:
+        entry = self._values.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= now:
+            del self._values[key]
+            return None
+        return value
+
+    def get(self, key):
+        with self._lock:
+            return self._live(key, time.time())
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._values[key] = (value, time.time() + ttl if ttl is not None else None)
+
+    def add(self, key, value, ttl=None):
+        now = time.time()
+        with self._lock:
+            if self._live(key, now) is not None:
+                return False
+            self._values[key] = (value, now + ttl if ttl is not None else None)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._values.pop(key, None)
+
+    def take(self, bucket, amount, capacity, refill_per_second):
+        now = time.time()
+        with self._lock:
+            tokens, updated = self._buckets.get(bucket, (capacity, now))
+            tokens, wait = _bucket_after(tokens, updated, now, amount, capacity, refill_per_second)
+            self._buckets[bucket] = (tokens, now)
+            return wait
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            self._buckets.clear()
+
+
+class SQLiteState(SharedState):
+    """
+    WAL mode lets readers in one worker proceed while another writes; writes that must
+    read first (set-if-absent, bucket takes) use BEGIN IMMEDIATE so they are atomic across processes.
+    """
+    name = "sqlite"
+
+    def __init__(self, db_path: str = SHARED_STATE_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Autocommit mode: transactions are opened explicitly where needed
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT value, expires_at FROM kv WHERE key = ?", (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None
+        return row[0]
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                             (key, value, expires_at))
+
+    def add(self, key, value, ttl=None):
+        now = time.time()
+        with self._lock:
+            # Expired rows don't block the insert; the upsert's WHERE makes the check atomic
+            cursor = self._db.execute(
+                "INSERT INTO kv (key, value, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at "
+                "WHERE kv.expires_at IS NOT NULL AND kv.expires_at <= ?",
+                (key, value, now + ttl if ttl is not None else None, now),
+            )
+            return cursor.rowcount == 1
+
+    def delete(self, key):
+        with self._lock:
+            self._db.execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def take(self, bucket, amount, capacity, refill_per_second):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = self._db.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (bucket,)).fetchone()
+                tokens, updated = row if row is not None else (capacity, now)
+                tokens, wait = _bucket_after(tokens, updated, now, amount, capacity, refill_per_second)
+                self._db.execute("INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                                 (bucket, tokens, now))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return wait
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            return self._db.execute("DELETE FROM kv WHERE expires_at <= ?", (time.time(),)).rowcount
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM kv")
+            self._db.execute("DELETE FROM buckets")
+
+
+# Token bucket as one atomic script: KEYS[1] = bucket; ARGV = amount, capacity, refill/s, now
+_TAKE_SCRIPT = """
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local amount, capacity, rate, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + (now - updated) * rate)
+local wait = 0
+if tokens >= amount then tokens = tokens - amount else wait = (amount - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class RedisState(SharedState):
+    """
+    Adapter for Redis and compatible servers (Valkey, KeyDB, ...). Needs `pip install redis`.
+    """
+    name = "redis"
+
+    def __init__(self, url: str = SHARED_STATE_URL):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("SHARED_STATE_BACKEND=redis requires the redis package (pip install redis)")
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+        self._take = self._redis.register_script(_TAKE_SCRIPT)
+
+    @staticmethod
+    def _ms(ttl: Optional[float]) -> Optional[int]:
+        return max(1, int(ttl * 1000)) if ttl is not None else None
+
+    def get(self, key):
+        return self._redis.get(KEY_PREFIX + key)
+
+    def set(self, key, value, ttl=None):
+        self._redis.set(KEY_PREFIX + key, value, px=self._ms(ttl))
+
+    def add(self, key, value, ttl=None):
+        return bool(self._redis.set(KEY_PREFIX + key, value, px=self._ms(ttl), nx=True))
+
+    def delete(self, key):
+        self._redis.delete(KEY_PREFIX + key)
+
+    def take(self, bucket, amount, capacity, refill_per_second):
+        wait = self._take(keys=[KEY_PREFIX + "bucket:" + bucket],
+                          args=[amount, capacity, refill_per_second, time.time()])
+        return float(wait)
+
+    def clear(self):
+        for key in self._redis.scan_iter(match=KEY_PREFIX + "*"):
+            self._redis.delete(key)
+
+
+def open_shared_state(backend: str = SHARED_STATE_BACKEND) -> SharedState:
+    if backend == "local":
+        return LocalState()
+    if backend == "sqlite":
+        return SQLiteState()
+    if backend == "redis":
+        return RedisState()
+    raise ValueError(f"Unknown shared state backend: {backend!r}")
+
+
+class LazySharedState:
+    """
+    Opens the configured backend on first use so importing the app does not touch the filesystem or network.
+    """
+
+    def __init__(self):
+        self._state: Optional[SharedState] = None
+
+    @property
+    def state(self) -> SharedState:
+        if self._state is None:
+            self._state = open_shared_state()
+        return self._state
+
+    @property
+    def is_shared(self) -> bool:
+        """
+        Whether state is visible to other worker processes (i.e. not the local backend).
+        """
+        return self.state.name != "local"
+
+    def __getattr__(self, name):
+        return getattr(self.state, name)
+
+
+# Shared process-wide state backend
+shared_state = LazySharedState()
@@ -132,6 +132,95 @@ async function fetchSurpriseBrief() {
   }
 }
 
+// ================================
+// Streaming Plan Generation (SSE)
+// ================================
+
+const stageLabels = {
+  essence: "Extracting the essence",
+  brainstorm: "Brainstorming ideas",
+  selection: "Picking the boldest idea",
+  one_liner: "Writing the pitch",
+  story: "Expanding the story",
+  revision: "Revising for surprise",
+};
+
+function setLoadingLabel(text) {
+  document.getElementById('loading-label').textContent = text;
+}
+
+function renderPlan(plan, heading) {
+  let pre = document.getElementById('output');
+  if (!pre) {
+    document.body.appendChild(document.createElement('h2')).textContent = heading;
+    pre = document.createElement('pre');
+    pre.id = 'output';
+    pre.appendChild(document.createElement('code'));
+    document.body.appendChild(pre);
+  }
+  document.querySelector('h2').textContent = heading;
+  pre.querySelector('code').innerHTML = syntaxHighlight(plan);
+}
+
+// POSTs a brief to /plans/stream and renders stage progress and plan fields as they arrive.
+// Resolves with the final validated plan.
+async function streamPlan(text) {
+  const response = await fetch('/plans/stream', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ input: text }),
+  });
+  if (!response.ok) {
+    const err = await response.json();
+    throw new Error(err.detail || "Unknown error");
+  }
+
+  const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+  const partialPlan = {};
+  let buffer = '';
+  let plan = null;
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += value;
+
+    // SSE messages are separated by a blank line
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const message = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      let event = 'message';
+      let data = '';
+      for (const line of message.split('\n')) {
+        if (line.startsWith('event: ')) event = line.slice(7);
+        else if (line.startsWith('data: ')) data += line.slice(6);
+      }
+      const payload = data ? JSON.parse(data) : {};
+
+      if (event === 'stage') {
+        // Show what the chain is working on next
+        const stages = Object.keys(stageLabels);
+        const next = stages[stages.indexOf(payload.stage) + 1];
+        setLoadingLabel(next ? stageLabels[next] : "Drafting the plan");
+      } else if (event === 'token') {
+        setLoadingLabel("Drafting the plan");
+      } else if (event === 'field') {
+        partialPlan[payload.name] = payload.value;
+        renderPlan(partialPlan, "Generating Plan...");
+      } else if (event === 'plan') {
+        plan = payload;
+      } else if (event === 'error') {
+        throw new Error(payload.detail || "Unknown error");
+      }
+    }
+  }
+
+  if (!plan) throw new Error("Stream ended before the plan was complete.");
+  return plan;
+}
+
 // ================================
 // Submit Handler
 // ================================
@@ -141,6 +230,7 @@ async function handleFormSubmit(e) {
   e.preventDefault();
   setButtonsDisabled(true);
 
+  setLoadingLabel("Thinking");
   document.getElementById('loading').style.display = 'block';
   const dotsEl = document.getElementById('dots');
   let dotCount = 1;
@@ -151,15 +241,10 @@ async function handleFormSubmit(e) {
 
   try {
     const inputType = inputTypeSelect.value;
-    let response;
+    let plan;
 
     if (inputType === 'text') {
-      const text = inputField.value;
-      response = await fetch('/plans', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ input: text }),
-      });
+      plan = await streamPlan(inputField.value);
     } else {
       const file = fileInput.files[0];
       if (!file) throw new Error('No file selected.');
@@ -167,24 +252,17 @@ async function handleFormSubmit(e) {
       formData.append('file', file);
       const isImage = file.type.startsWith("image/");
       const endpoint = isImage ? '/plans/from-image' : '/plans/from-video';
-      response = await fetch(endpoint, {
+      const response = await fetch(endpoint, {
         method: 'POST',
         body: formData,
       });
+      plan = await response.json();
+      if (!response.ok) throw new Error(plan.detail || "Unknown error");
     }
 
-    const plan = await response.json();
-    if (!response.ok) throw new Error(plan.detail || "Unknown error");
     window.rawJsonPlan = plan;
     clearOutput();
-
-    const pre = document.createElement('pre');
-    pre.id = 'output';
-    const code = document.createElement('code');
-    code.innerHTML = syntaxHighlight(plan);
-    pre.appendChild(code);
-    document.body.appendChild(document.createElement('h2')).textContent = "Generated Plan";
-    document.body.appendChild(pre);
+    renderPlan(plan, "Generated Plan");
 
     createCopyAndDownloadButtons();
   } catch (err) {
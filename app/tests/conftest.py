@@ -0,0 +1,24 @@
+# tests/conftest.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+import pytest
+from app.plan_store import PlanStore, plan_store
+from app.planner import core
+
+
+@pytest.fixture(autouse=True)
+def isolated_brief_index(monkeypatch):
+    # The index is process-wide: without this, a plan from one test is served to a similar brief in another
+    monkeypatch.setattr(core, "BRIEF_INDEX_ENABLED", False)
+    core.brief_index.clear()
+    yield
+    core.brief_index.clear()
+
+
+@pytest.fixture(autouse=True)
+def isolated_plan_store(tmp_path, monkeypatch):
+    # Saved plans go to a per-test database instead of .cache/plans.sqlite3 in the working tree
+    monkeypatch.setattr(plan_store, "_store", PlanStore(str(tmp_path / "plans.sqlite3")))
@@ -0,0 +1,232 @@
+# tests/test_admission.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+import asyncio
+import json
+import pytest
+from fastapi.testclient import TestClient
+from app import api
+from app.main import app
+from app.planner import circuit_breaker, llm_gemini, providers
+from app.planner.admission import AdmissionController, QueueFullError, QueueTimeoutError
+from app.planner.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, get_breaker
+from app.planner.providers import FakeProvider, call_provider
+
+client = TestClient(app)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class FlakyProvider(FakeProvider):
+    """Fails (or hangs) until told to recover."""
+    name = "flaky"
+
+    def __init__(self, hang=False):
+        super().__init__()
+        self.healthy = False
+        self.hang = hang
+
+    async def generate(self, prompt, model=None, config=None):
+        self.calls.append({"prompt": prompt})
+        if self.healthy:
+            return "ok"
+        if self.hang:
+            await asyncio.sleep(5)
+        raise ConnectionError("provider unavailable")
+
+
+# ===========================================
+# Admission controller
+# ===========================================
+
+def test_admission_limits_concurrency_and_serves_waiters_in_order():
+    controller = AdmissionController(max_concurrent=2, max_queue=10, queue_timeout=5)
+    running, peak, order = [0], [0], []
+
+    async def work(i):
+        async with controller.slot():
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+            order.append(i)
+            await asyncio.sleep(0.02)
+            running[0] -= 1
+
+    async def main():
+        await asyncio.gather(*(work(i) for i in range(6)))
+
+    asyncio.run(main())
+    assert peak[0] == 2
+    assert order == list(range(6))
+    assert controller.stats() == {"active": 0, "waiting": 0, "admitted": 6, "rejected": 0, "timed_out": 0}
+
+
+def test_full_queue_is_rejected_immediately_and_slow_queue_times_out():
+    controller = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=0.05)
+
+    async def hold():
+        async with controller.slot():
+            await asyncio.sleep(0.2)
+
+    async def main():
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(controller.slot().__aenter__())
+        await asyncio.sleep(0)
+        with pytest.raises(QueueFullError) as full:
+            async with controller.slot():
+                pass
+        with pytest.raises(QueueTimeoutError):
+            await queued
+        await holder
+        return full.value
+
+    error = asyncio.run(main())
+    assert error.status_code == 429 and error.retry_after >= 1
+    assert controller.stats()["rejected"] == 1 and controller.stats()["timed_out"] == 1
+    assert controller.active == 0 and controller.waiting == 0
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    controller = AdmissionController(max_concurrent=1, max_queue=5, queue_timeout=5)
+
+    async def main():
+        async with controller.slot():
+            waiter = asyncio.create_task(controller.slot().__aenter__())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+        async with controller.slot():
+            pass
+
+    asyncio.run(main())
+    assert controller.active == 0 and controller.waiting == 0
+
+
+# ===========================================
+# Circuit breaker
+# ===========================================
+
+def test_breaker_opens_after_consecutive_failures_and_probes_half_open():
+    clock = FakeClock()
+    breaker = CircuitBreaker("p/m", failure_threshold=3, reset_seconds=30, clock=clock)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    breaker.before_call()
+    breaker.record_success()  # a success resets the count
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == OPEN
+
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.before_call()
+    assert error.value.retry_after == 30
+
+    clock.now += 30
+    breaker.before_call()  # the probe
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # only one probe at a time
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    clock.now += 30
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.opened == 2
+
+
+def test_provider_calls_short_circuit_once_the_breaker_opens(monkeypatch):
+    provider = FlakyProvider()
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+    monkeypatch.setitem(circuit_breaker._breakers, "flaky/fake-1",
+                        CircuitBreaker("flaky/fake-1", failure_threshold=2, reset_seconds=60))
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            asyncio.run(call_provider(provider, "hello"))
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(call_provider(provider, "hello"))
+    assert len(provider.calls) == 2
+
+
+def test_probe_cancelled_while_waiting_for_the_rate_limit_is_given_back(monkeypatch):
+    class SlowLimiter:
+        async def acquire(self, tokens):
+            await asyncio.sleep(5)
+
+    clock = FakeClock()
+    breaker = CircuitBreaker("flaky/fake-1", failure_threshold=1, reset_seconds=30, clock=clock)
+    breaker.record_failure()
+    clock.now += 30
+    monkeypatch.setattr(circuit_breaker, "_breakers", {"flaky/fake-1": breaker})
+    monkeypatch.setattr(providers, "get_rate_limiter", lambda name: SlowLimiter())
+
+    async def main():
+        probe = asyncio.create_task(call_provider(FlakyProvider(), "hello"))
+        await asyncio.sleep(0.01)
+        probe.cancel()
+        await asyncio.gather(probe, return_exceptions=True)
+
+    asyncio.run(main())
+    assert breaker.state == HALF_OPEN and not breaker.probing
+
+
+def test_call_timeouts_count_as_failures(monkeypatch):
+    provider = FlakyProvider(hang=True)
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+    monkeypatch.setattr(providers, "PROVIDER_CALL_TIMEOUT", 0.05)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(call_provider(provider, "hello"))
+    assert get_breaker("flaky", "fake-1").failures == 1
+
+
+# ===========================================
+# Load shedding over HTTP
+# ===========================================
+
+def test_post_plans_sheds_with_retry_after_when_saturated(monkeypatch):
+    monkeypatch.setattr(api, "plan_admission", AdmissionController(max_concurrent=0, max_queue=0))
+    response = client.post("/plans", json={"input": "A snail wins a marathon.", "allow_near_duplicate": False})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+    stream = client.post("/plans/stream", json={"input": "A snail wins a marathon."})
+    assert stream.status_code == 429
+
+
+def test_batch_items_take_admission_slots(monkeypatch):
+    monkeypatch.setattr(api, "plan_admission", AdmissionController(max_concurrent=0, max_queue=0))
+    response = client.post("/plans/batch", json={"inputs": ["A snail wins a marathon.", "A crab learns ballet."]})
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["status"] for line in lines] == ["error", "error"]
+    assert all(line["retry_after"] >= 1 for line in lines)
+
+
+def test_post_plans_returns_503_while_the_circuit_is_open(monkeypatch):
+    provider = FlakyProvider()
+    providers.register_provider("flaky", lambda: provider)
+    monkeypatch.setattr(llm_gemini, "TEXT_PROVIDER", "flaky")
+    monkeypatch.setattr(llm_gemini, "CACHE_ENABLED", False)
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+    breaker = get_breaker("flaky", "fake-1")
+    breaker.record_failure()
+    breaker._open()
+
+    response = client.post("/plans", json={"input": "A snail wins a marathon.", "mode": "single",
+                                           "allow_near_duplicate": False})
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+    assert provider.calls == []
@@ -0,0 +1,71 @@
+# tests/test_batch.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+import asyncio
+import json
+import time
+from fastapi.testclient import TestClient
+from app.main import app
+from app.models import CreativePlan
+from app.planner import core
+from app.planner.rate_limit import ProviderRateLimiter, TokenBucket
+
+client = TestClient(app)
+
+
+# ===========================================
+# Token-bucket rate limiting
+# ===========================================
+
+def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(capacity=2, refill_per_second=20)
+
+    async def main():
+        t0 = time.perf_counter()
+        for _ in range(4):
+            await bucket.acquire()
+        return time.perf_counter() - t0
+
+    # Two immediate, then two more at 20/s
+    assert asyncio.run(main()) >= 0.09
+
+
+def test_provider_rate_limiter_without_limits_never_waits():
+    limiter = ProviderRateLimiter("fake")
+    asyncio.run(limiter.acquire(10_000))
+    assert limiter.stats() == {"acquired": 1, "wait_seconds": 0.0}
+
+
+# ===========================================
+# POST /plans/batch
+# ===========================================
+
+def test_batch_streams_ndjson_and_isolates_failures(monkeypatch):
+    async def fake_plan(user_input, **kwargs):
+        if "broken" in user_input:
+            raise ValueError("Failed to parse LLM response as JSON")
+        return CreativePlan(
+            title=user_input, concept_summary="c", hook="h",
+            visual_style="v", tone="t", scene_ideas=["s"],
+        )
+
+    monkeypatch.setattr(core, "plan_from_brief", fake_plan)
+
+    response = client.post("/plans/batch", json={"inputs": ["first", "broken brief", "third"], "concurrency": 2})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    by_index = {line["index"]: line for line in lines}
+    assert sorted(by_index) == [0, 1, 2]
+    assert by_index[0]["status"] == "ok" and by_index[0]["plan"]["title"] == "first"
+    assert by_index[1]["status"] == "error" and "JSON" in by_index[1]["detail"]
+    assert by_index[2]["status"] == "ok"
+
+
+def test_batch_rejects_empty_input_list():
+    response = client.post("/plans/batch", json={"inputs": []})
+    assert response.status_code == 422
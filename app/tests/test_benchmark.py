@@ -0,0 +1,57 @@
+# tests/test_benchmark.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+import asyncio
+import pytest
+from app.planner import image_captioning, llm_gemini, llm_openai, video_captioning
+from benchmarks.fake_llm import LLMProfile, SimulatedLLMError, SimulatedProvider
+from benchmarks.run import compare, run_benchmark
+
+
+@pytest.fixture
+def restore_providers(monkeypatch):
+    # install() repoints module-level provider settings; put them back afterwards
+    for module, name in [(llm_gemini, "TEXT_PROVIDER"), (llm_gemini, "CACHE_ENABLED"),
+                         (image_captioning, "CAPTION_PROVIDER"), (video_captioning, "CAPTION_PROVIDER"),
+                         (llm_openai, "SURPRISE_PROVIDER")]:
+        monkeypatch.setattr(module, name, getattr(module, name))
+
+
+# ===========================================
+# Simulated LLM
+# ===========================================
+
+def test_simulated_provider_pads_responses_and_injects_errors():
+    padded = SimulatedProvider(LLMProfile(latency_median=0, response_chars=2000))
+    assert len(asyncio.run(padded.generate("Respond with JSON."))) >= 2000
+
+    failing = SimulatedProvider(LLMProfile(latency_median=0, error_rate=1.0))
+    with pytest.raises(SimulatedLLMError):
+        asyncio.run(failing.generate("anything"))
+
+
+# ===========================================
+# Harness
+# ===========================================
+
+def test_asgi_benchmark_reports_latency_lag_and_rss(restore_providers):
+    profile = LLMProfile(latency_median=0.001, latency_sigma=0, seed=1)
+    report = asyncio.run(run_benchmark(["plans", "surprise"], total=6, concurrency=3, profile=profile,
+                                       transports=["asgi"]))
+    for scenario in ("plans", "surprise"):
+        stats = report["results"]["asgi"][scenario]
+        assert stats["errors"] == 0
+        assert stats["p50_ms"] <= stats["p95_ms"] <= stats["p99_ms"]
+        assert {"throughput_rps", "loop_lag_p99_ms", "peak_rss_mb"} <= set(stats)
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    baseline = {"results": {"asgi": {"plans": {"p50_ms": 100, "p95_ms": 200, "p99_ms": 300,
+                                               "loop_lag_p99_ms": 2, "throughput_rps": 50}}}}
+    report = {"results": {"asgi": {"plans": {"p50_ms": 105, "p95_ms": 400, "p99_ms": 310,
+                                             "loop_lag_p99_ms": 5, "throughput_rps": 20}}}}
+    regressions = compare(report, baseline, tolerance=0.25)
+    assert [line.split(":")[0] for line in regressions] == ["asgi/plans p95_ms", "asgi/plans throughput_rps"]
@@ -0,0 +1,149 @@
+# tests/test_brief_index.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.models import CreativePlan
+from app.planner import core, llm_gemini
+from app.planner.brief_index import BriefIndex, same_specifics
+from app.planner.core import plan_from_brief
+from app.planner.providers import FakeProvider, register_provider
+from app.planner.trace import PlanTrace
+
+client = TestClient(app)
+
+WHALE = "A lighthouse keeper adopts a lonely whale during a winter storm."
+STORMS = "A lighthouse keeper adopts a lonely whale during winter storms."
+SEAL = "A lighthouse keeper adopts a lonely seal during a winter storm."
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    provider = FakeProvider()
+    register_provider("brief-index", lambda: provider)
+    monkeypatch.setattr(llm_gemini, "TEXT_PROVIDER", "brief-index")
+    monkeypatch.setattr(llm_gemini, "CACHE_ENABLED", False)
+    return provider
+
+
+@pytest.fixture
+def index(monkeypatch):
+    index = BriefIndex()
+    monkeypatch.setattr(core, "brief_index", index)
+    monkeypatch.setattr(core, "BRIEF_INDEX_ENABLED", True)
+    return index
+
+
+def plan(title="Plan"):
+    return CreativePlan(title=title, concept_summary="", hook="", visual_style="", tone="", scene_ideas=[])
+
+
+def prompts(provider, marker):
+    return [call["prompt"] for call in provider.calls if marker in call["prompt"]]
+
+
+# ===========================================
+# Index lookups
+# ===========================================
+
+def test_reordered_or_repunctuated_brief_matches_the_stored_plan():
+    index = BriefIndex()
+    index.remember("Gen-Z runners on TikTok", "chain", plan("Runners"), {"essence": "Runners"})
+    match = index.lookup("On TikTok: Gen Z runners!", "chain")
+    assert match.kind == "plan" and match.entry.plan.title == "Runners"
+    assert index.lookup("On TikTok: Gen Z runners!", "single") is None
+
+
+def test_moderately_similar_brief_matches_only_the_prefix():
+    index = BriefIndex()
+    index.remember(WHALE, "chain", plan(), {"essence": "Whale essence"})
+    match = index.lookup(STORMS, "chain")
+    assert match.kind == "prefix" and match.entry.prefix == {"essence": "Whale essence"}
+    assert index.lookup(SEAL, "chain") is None
+    assert index.lookup("A robot opens a bakery on Mars.", "chain") is None
+    assert index.stats()["prefix_hits"] == 1 and index.stats()["misses"] == 2
+
+
+@pytest.mark.parametrize("stored, brief", [
+    ("Make an ad for Nike running shoes for beginners", "Make an ad for Adidas running shoes for beginners"),
+    ("Promote our summer sale, 20% off everything", "Promote our summer sale, 50% off everything"),
+    ("Make a funny video about cats", "Make a sad video about cats"),
+])
+def test_briefs_with_different_specifics_do_not_match(stored, brief):
+    index = BriefIndex()
+    index.remember(stored, "chain", plan(), {"essence": "Stored essence"})
+    assert index.lookup(brief, "chain") is None
+
+
+def test_specifics_compare_numbers_and_capitalised_words():
+    assert same_specifics("Gen-Z runners on TikTok", "On TikTok: Gen Z runners")
+    assert not same_specifics("Nike shoes", "Adidas shoes")
+    assert not same_specifics("20% off", "50% off")
+    assert same_specifics(WHALE, WHALE.upper())
+    assert not same_specifics("NIKE SHOES", "Adidas shoes")
+
+
+def test_index_is_bounded():
+    index = BriefIndex(max_entries=2)
+    for brief in ["A cat plays jazz piano.", "Volcanoes erupt glitter.", "Penguins run a bank."]:
+        index.remember(brief, "chain", plan(brief))
+    assert index.stats()["entries"] == 2 and index.stats()["evictions"] == 1
+    assert index.lookup("A cat plays jazz piano.", "chain") is None
+
+
+# ===========================================
+# plan_from_brief reuse
+# ===========================================
+
+def test_near_duplicate_brief_is_served_without_llm_calls(provider, index):
+    first = asyncio.run(plan_from_brief(WHALE, mode="chain"))
+    calls = len(provider.calls)
+
+    trace = PlanTrace()
+    second = asyncio.run(plan_from_brief("A lonely whale, during a winter storm: lighthouse keeper adopts",
+                                         mode="chain", trace=trace))
+    assert second == first
+    assert len(provider.calls) == calls
+    assert trace.near_duplicate == "plan" and trace.similarity >= 0.95
+
+
+def test_similar_brief_reuses_the_chain_prefix(provider, index):
+    asyncio.run(plan_from_brief(WHALE, mode="chain"))
+    assert len(prompts(provider, "Summarize this into")) == 1
+
+    trace = PlanTrace()
+    asyncio.run(plan_from_brief(STORMS, mode="chain", trace=trace))
+    assert trace.near_duplicate == "prefix"
+    assert "essence" in trace.stages_reused and "essence" not in trace.stages_run
+    assert len(prompts(provider, "Summarize this into")) == 1
+    # The later stages still run against the new brief
+    assert any("storms" in p for p in prompts(provider, "Based on the selected idea"))
+
+
+def test_reuse_can_be_disabled_per_call(provider, index):
+    asyncio.run(plan_from_brief(WHALE, mode="chain"))
+    trace = PlanTrace()
+    asyncio.run(plan_from_brief(WHALE, mode="chain", trace=trace, reuse=False))
+    assert trace.near_duplicate == ""
+    assert len(prompts(provider, "Summarize this into")) == 2
+
+
+# ===========================================
+# POST /plans
+# ===========================================
+
+def test_post_plans_reports_near_duplicate_header(provider, index):
+    first = client.post("/plans", json={"input": WHALE, "mode": "chain"})
+    assert "X-Near-Duplicate" not in first.headers
+
+    repeat = client.post("/plans", json={"input": WHALE.upper(), "mode": "chain"})
+    assert repeat.headers["X-Near-Duplicate"].startswith("plan;similarity=")
+    assert repeat.json() == first.json()
+
+    fresh = client.post("/plans", json={"input": WHALE, "mode": "chain", "allow_near_duplicate": False})
+    assert "X-Near-Duplicate" not in fresh.headers
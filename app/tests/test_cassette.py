@@ -0,0 +1,121 @@
+# tests/test_cassette.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+import asyncio
+import time
+import pytest
+from app.planner import core, llm_gemini, providers
+from app.planner.cassette import (Cassette, CassetteEntry, CassetteMissError, RecordingProvider, ReplayProvider,
+                                  install_cassette, save_recording)
+from app.planner.providers import FakeProvider, get_provider
+from benchmarks.compare import Variant, compare_variants
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    # Cassette installation re-registers every provider; keep that local to the test
+    monkeypatch.setattr(providers, "_factories", dict(providers._factories))
+    monkeypatch.setattr(providers, "_instances", {})
+    # ...and keep later app shutdowns from saving this test's recording
+    monkeypatch.setattr("app.planner.cassette._recording", None)
+    monkeypatch.setattr("app.planner.cassette._recording_path", None)
+    monkeypatch.setattr(llm_gemini, "TEXT_PROVIDER", "fake")
+    monkeypatch.setattr(llm_gemini, "CACHE_ENABLED", False)
+
+
+def record_briefs(path: str, briefs, mode: str = "single") -> Cassette:
+    recording = install_cassette("record", path)
+    for brief in briefs:
+        asyncio.run(core.plan_from_brief(brief, mode=mode, reuse=False))
+    save_recording()
+    return recording
+
+
+# ===========================================
+# Recording and replay
+# ===========================================
+
+def test_recorded_plans_replay_identically_offline(registry, tmp_path):
+    path = str(tmp_path / "cassette.jsonl.gz")
+    record_briefs(path, ["A snail wins a marathon."])
+    recorded = get_provider("fake").inner.calls
+
+    cassette = Cassette.load(path)
+    assert {entry.stage for entry in cassette.entries} == {"json_draft"}
+    assert cassette.default_models == {"fake": "fake-1"}
+
+    providers.register_provider("fake", lambda: pytest.fail("replay must not create the live provider"))
+    install_cassette("replay", path, latency_scale=0)
+    replayed = asyncio.run(core.plan_from_brief("A snail wins a marathon.", mode="single", reuse=False))
+    assert replayed.title.startswith("Fake Plan")
+    assert get_provider("fake").calls[0].hit
+    assert replayed.title == core.parse_plan_response(FakeProvider().respond(recorded[0]["prompt"], "fake-1")).title
+
+
+def test_replay_sleeps_the_scaled_recorded_latency():
+    cassette = Cassette([CassetteEntry("story", "p", "m", None, "prompt", "response", latency=0.5)], {"p": "m"})
+    provider = ReplayProvider(cassette, "p", latency_scale=0.1)
+
+    start = time.perf_counter()
+    assert asyncio.run(provider.generate("prompt")) == "response"
+    assert 0.04 <= time.perf_counter() - start < 0.4
+
+
+def test_repeated_prompts_replay_in_recorded_order_and_misses_are_reported():
+    entries = [CassetteEntry("idea", "p", "m", None, "prompt", text, latency=0) for text in ("one", "two")]
+    provider = ReplayProvider(Cassette(entries, {"p": "m"}), "p", latency_scale=0)
+
+    assert [asyncio.run(provider.generate("prompt")) for _ in range(3)] == ["one", "two", "one"]
+    with pytest.raises(CassetteMissError):
+        asyncio.run(provider.generate("another prompt"))
+
+    provider.fallback = FakeProvider()
+    assert asyncio.run(provider.generate("another prompt")).startswith("Fake response")
+    assert [call.hit for call in provider.calls] == [True, True, True, False]
+
+
+def test_media_parts_are_recorded_as_digests(tmp_path):
+    cassette = Cassette()
+    provider = RecordingProvider(FakeProvider(), cassette)
+    part = {"inline_data": {"data": b"\xff\xd8 jpeg bytes", "mime_type": "image/jpeg"}}
+    asyncio.run(provider.generate([part, "Describe this image."], "vision-1"))
+
+    path = str(tmp_path / "cassette.jsonl")
+    cassette.save(path)
+    entry = Cassette.load(path).entries[0]
+    assert entry.prompt[0].startswith("<media:") and entry.prompt[1] == "Describe this image."
+
+    replay = ReplayProvider(Cassette.load(path), "fake", latency_scale=0)
+    assert asyncio.run(replay.generate([part, "Describe this image."], "vision-1")) == entry.response
+
+
+# ===========================================
+# Variant comparison
+# ===========================================
+
+def test_compare_reports_sizes_validity_and_misses(registry, tmp_path):
+    briefs = ["A snail wins a marathon.", "A robot barista solves espresso-related crimes."]
+    cassette = record_briefs(str(tmp_path / "cassette.jsonl"), briefs)
+
+    variants = [Variant.parse("single=single"), Variant.parse("chain=chain:parallel_brainstorm")]
+    report = asyncio.run(compare_variants(variants, briefs, cassette, latency_scale=0))
+
+    single, chain = report["variants"]["single"], report["variants"]["chain"]
+    assert single["misses"] == 0 and single["json_valid_rate"] == 1.0
+    assert single["stages"]["json_draft"]["calls"] == 2
+    assert single["prompt_chars_per_brief"] > 0
+    # The chain's calls were never recorded: every brief fails on its first stage
+    assert chain["failures"] == {"CassetteMissError": 2}
+    assert chain["json_valid_rate"] == 0
+
+
+def test_variant_specs_are_validated():
+    assert Variant.parse("p=chain:parallel_brainstorm@my.prompts") == \
+        Variant("p", "chain", "parallel_brainstorm", "my.prompts")
+    with pytest.raises(ValueError):
+        Variant.parse("x=chain:unknown_graph")
+    with pytest.raises(ValueError):
+        Variant.parse("just-a-name")
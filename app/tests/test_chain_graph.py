@@ -0,0 +1,110 @@
+# tests/test_chain_graph.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+import asyncio
+import pytest
+from app.planner import prompt_chain
+from app.planner.chain_graph import ChainGraph
+
+
+def sleeper(seconds, value=None):
+    async def node(inputs):
+        await asyncio.sleep(seconds)
+        return value if value is not None else sorted(inputs)
+    return node
+
+
+# ===========================================
+# DAG executor
+# ===========================================
+
+def test_independent_nodes_run_concurrently_and_fan_in():
+    graph = ChainGraph()
+    graph.add("root", sleeper(0.01, "root"))
+    ideas = graph.fan_out("idea", 4, lambda inputs, i: sleeper(0.1, f"idea {i}")(inputs), ["root"])
+    graph.add("select", sleeper(0.01), ideas)
+
+    run = asyncio.run(graph.run())
+
+    assert run.results["select"] == ["idea_0", "idea_1", "idea_2", "idea_3"]
+    assert run.wall_time < run.serial_time / 2
+    path, path_time = run.critical_path()
+    assert path[0] == "root" and path[-1] == "select" and path[1].startswith("idea_")
+    assert path_time == pytest.approx(run.wall_time, abs=0.05)
+
+
+def test_max_concurrency_bounds_fan_out():
+    graph = ChainGraph()
+    graph.fan_out("idea", 4, lambda inputs, i: sleeper(0.05, i)(inputs))
+
+    run = asyncio.run(graph.run(max_concurrency=2))
+
+    assert run.wall_time >= 0.1
+
+
+def test_cycles_and_unknown_dependencies_are_rejected():
+    graph = ChainGraph()
+    graph.add("a", sleeper(0), ["b"])
+    graph.add("b", sleeper(0), ["a"])
+    with pytest.raises(ValueError, match="Cycle"):
+        graph.topological_order()
+
+    graph = ChainGraph()
+    graph.add("a", sleeper(0), ["missing"])
+    with pytest.raises(ValueError, match="unknown"):
+        asyncio.run(graph.run())
+
+
+def test_failing_node_cancels_the_rest():
+    async def boom(inputs):
+        raise RuntimeError("provider down")
+
+    graph = ChainGraph()
+    graph.add("a", boom)
+    graph.add("b", sleeper(0), ["a"])
+    graph.add("slow", sleeper(5))
+
+    with pytest.raises(RuntimeError, match="provider down"):
+        asyncio.run(asyncio.wait_for(graph.run(), timeout=1))
+
+
+# ===========================================
+# Default chain graphs
+# ===========================================
+
+def test_sequential_chain_runs_six_llm_stages_in_order(monkeypatch):
+    prompts = []
+
+    async def fake_llm(prompt):
+        prompts.append(prompt)
+        return f"output {len(prompts)}"
+
+    monkeypatch.setattr(prompt_chain, "generate_creative_response", fake_llm)
+    stages = []
+
+    async def on_stage(stage, output):
+        stages.append(stage)
+
+    final_prompt = asyncio.run(prompt_chain.creative_plan_chained_prompt("a brief", on_stage=on_stage))
+
+    assert len(prompts) == 6
+    assert stages == prompt_chain.CHAIN_STAGES
+    assert "output 6" in final_prompt and "a brief" in final_prompt
+
+
+def test_parallel_brainstorm_picks_highest_scored_idea(monkeypatch):
+    async def fake_llm(prompt):
+        if "ONE short-form video idea" in prompt:
+            score = 9 if "camera technique" in prompt else 4
+            return f"An idea.\nScore: {score}"
+        return "stage output"
+
+    monkeypatch.setattr(prompt_chain, "generate_creative_response", fake_llm)
+
+    run = asyncio.run(prompt_chain.run_chain("a brief", graph="parallel_brainstorm"))
+
+    assert run.results["selection"].endswith("Score: 9")
+    assert "json_plan" in run.results
@@ -0,0 +1,118 @@
+# tests/test_chain_session.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+import asyncio
+import pytest
+from app.planner import core, llm_gemini, prompt_chain
+from app.planner.deadline import Deadline
+from app.planner.prompt_accounting import PromptLedger, record_prompt
+from app.planner.providers import MeteredFakeProvider, register_provider
+from app.planner.trace import PlanTrace
+
+BRIEFS = [
+    "A lighthouse keeper befriends a storm that visits every autumn, and the two of them trade stories about "
+    "the ships they have saved and sunk while the village below argues over whether to tear the lighthouse down.",
+    "A retired stunt double teaches a flock of pigeons to perform the falls she once did for a famous action "
+    "star, and they stage a rooftop show on the night the star's final film premieres across the street.",
+]
+
+
+@pytest.fixture
+def metered(monkeypatch):
+    def use(graph: str) -> MeteredFakeProvider:
+        # Stage replies about as long as real ones, and latency that grows with uncached input
+        provider = MeteredFakeProvider(seconds_per_kb=0.01, reply_chars=600)
+        register_provider("metered", lambda: provider)
+        monkeypatch.setattr(llm_gemini, "TEXT_PROVIDER", "metered")
+        monkeypatch.setattr(llm_gemini, "CACHE_ENABLED", False)
+        monkeypatch.setattr(prompt_chain, "CHAIN_GRAPH", graph)
+        return provider
+    return use
+
+
+def plan(brief: str) -> PlanTrace:
+    trace = PlanTrace()
+    asyncio.run(core.plan_from_brief(brief, mode="chain", trace=trace, reuse=False))
+    return trace
+
+
+# ===========================================
+# Session transcript
+# ===========================================
+
+def test_each_turn_extends_the_previous_prompt(metered):
+    provider = metered("session")
+    plan(BRIEFS[0])
+
+    prompts = [call["prompt"] for call in provider.calls]
+    assert [call["stage"] for call in provider.calls] == prompt_chain.CHAIN_STAGES + ["json_draft"]
+    for earlier, later in zip(prompts, prompts[1:]):
+        assert later.startswith(earlier)
+    # The brief is sent once, in the fixed prefix, and only the last turn asks for JSON
+    assert prompts[-1].count(BRIEFS[0]) == 1
+    assert ["JSON" in prompt for prompt in prompts] == [False] * 6 + [True]
+
+
+def test_reused_stages_join_the_transcript_and_skipped_stages_do_not(metered):
+    provider = metered("session")
+    run = asyncio.run(prompt_chain.run_chain(BRIEFS[0], preset={"essence": "A storm as an old friend."}))
+    assert run.reused == ["essence"]
+    assert [call["stage"] for call in provider.calls][0] == "brainstorm"
+    assert "### Response\nA storm as an old friend.\n" in provider.calls[0]["prompt"]
+
+    provider.calls.clear()
+    run = asyncio.run(prompt_chain.run_chain(BRIEFS[0], deadline=Deadline(0)))
+    assert provider.calls == [] and len(run.skipped) == len(prompt_chain.CHAIN_STAGES)
+    assert run.results["json_plan"] == prompt_chain.ChainSession(prompt_chain.session_prefix(BRIEFS[0])).prompt(
+        prompt_chain.SESSION_JSON_STEP)
+
+
+# ===========================================
+# Accounting and savings
+# ===========================================
+
+def test_ledger_reports_sizes_and_reused_prefixes_per_stage():
+    ledger = PromptLedger()
+    ledger.record("essence", "system brief essence?", "concept")
+    ledger.record("brainstorm_1", "system brief essence? concept ideas?", "ideas")
+    ledger.record("brainstorm_2", "unrelated prompt", "x" * 8)
+
+    sizes = ledger.summary()
+    assert sizes["essence"]["reused_prefix_chars"] == 0
+    assert sizes["brainstorm"]["calls"] == 2
+    assert sizes["brainstorm"]["reused_prefix_chars"] == len("system brief essence?")
+    assert sizes["brainstorm"]["new_input_chars"] == len(" concept ideas?") + len("unrelated prompt")
+    assert sizes["total"]["output_chars"] == len("concept") + len("ideas") + 8
+    assert sizes["total"]["output_tokens"] == 1 + 1 + 2
+
+    record_prompt("essence", "outside any plan", "ignored")  # no ledger: a no-op
+
+
+def test_session_sends_less_uncached_input_than_the_stateless_chain(metered):
+    results = {}
+    for graph in ("sequential", "session"):
+        provider = metered(graph)
+        plan(BRIEFS[0])  # warms the provider's prefix cache with the static instructions
+        start, sent, uncached = len(provider.calls), provider.bytes_sent, provider.uncached_bytes
+        trace = plan(BRIEFS[1])
+        results[graph] = {
+            "sent": provider.bytes_sent - sent,
+            "uncached": provider.uncached_bytes - uncached,
+            "latency": {call["stage"]: call["latency"] for call in provider.calls[start:]},
+            "trace": trace,
+        }
+
+    sequential, session = results["sequential"], results["session"]
+    # The transcript resends more bytes, but fewer of them miss the prefix cache
+    assert session["sent"] > sequential["sent"]
+    assert session["uncached"] < 0.9 * sequential["uncached"]
+    for stage, latency in session["latency"].items():
+        assert latency < sequential["latency"][stage], stage
+
+    sizes = session["trace"].prompt_sizes
+    assert sizes["total"]["calls"] == 7
+    assert sizes["json_draft"]["reused_prefix_chars"] > sizes["json_draft"]["new_input_chars"]
+    assert sizes["total"]["new_input_chars"] < sequential["trace"].prompt_sizes["total"]["new_input_chars"]
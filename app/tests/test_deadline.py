@@ -0,0 +1,62 @@
+# tests/test_deadline.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.planner import core, llm_gemini, prompt_chain
+from app.planner.deadline import StageLatencies
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def offline_chain(monkeypatch):
+    # Deterministic fake LLM, no response cache, fresh latency estimates
+    latencies = StageLatencies()
+    monkeypatch.setattr(llm_gemini, "TEXT_PROVIDER", "fake")
+    monkeypatch.setattr(llm_gemini, "CACHE_ENABLED", False)
+    monkeypatch.setattr(core, "stage_latencies", latencies)
+    monkeypatch.setattr(prompt_chain, "stage_latencies", latencies)
+    return latencies
+
+
+# ===========================================
+# Per-request mode and latency budget
+# ===========================================
+
+def test_chain_mode_runs_every_stage():
+    response = client.post("/plans", json={"input": "A snail enters a car race.", "mode": "chain"})
+    assert response.status_code == 200
+    assert response.headers["X-Plan-Mode"] == "chain"
+    assert response.headers["X-Plan-Stages"].split(",") == prompt_chain.CHAIN_STAGES + ["json_draft"]
+    assert response.headers["X-Plan-Stages-Skipped"] == ""
+
+
+def test_tight_budget_skips_refinement_and_still_returns_a_plan(offline_chain):
+    # Pretend stages are slow: 2s each, JSON drafting 3s, against a 4s budget
+    for stage in prompt_chain.CHAIN_STAGES:
+        offline_chain.observe(stage, 2.0)
+    offline_chain.observe("json_draft", 3.0)
+
+    response = client.post("/plans", json={"input": "A ghost dog runs agility courses.", "mode": "chain",
+                                           "latency_budget_ms": 4000})
+    assert response.status_code == 200
+    assert response.json()["title"].startswith("Fake Plan")
+    assert response.headers["X-Plan-Stages"] == "json_draft"
+    assert response.headers["X-Plan-Stages-Skipped"].split(",") == prompt_chain.CHAIN_STAGES
+
+
+def test_auto_mode_falls_back_to_single_shot_when_budget_is_short():
+    response = client.post("/plans", json={"input": "A cloud envies a weather app.", "mode": "auto",
+                                           "latency_budget_ms": 2000})
+    assert response.status_code == 200
+    assert response.headers["X-Plan-Mode"] == "single"
+
+
+def test_unknown_mode_is_rejected():
+    response = client.post("/plans", json={"input": "anything", "mode": "fastest"})
+    assert response.status_code == 422
@@ -0,0 +1,82 @@
+# tests/test_image_preprocess.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+import asyncio
+import io
+from PIL import Image, ImageDraw
+from app.planner import image_captioning
+from app.planner.image_preprocess import (
+    PerceptualCaptionCache, caption_cache, dhash, hamming_distance, preprocess_image,
+)
+from app.planner.providers import get_provider
+
+
+def sample_image(width: int = 1200, height: int = 800) -> Image.Image:
+    image = Image.new("RGB", (width, height), "skyblue")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([width // 4, height // 4, width // 2, height - 50], fill="darkgreen")
+    draw.ellipse([width * 2 // 3, 40, width - 40, height // 3], fill="yellow")
+    return image
+
+
+def encode(image: Image.Image, fmt: str, **params) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, **params)
+    return buffer.getvalue()
+
+
+# ===========================================
+# Preprocessing
+# ===========================================
+
+def test_large_image_is_downscaled_to_max_edge():
+    prepared = preprocess_image(encode(sample_image(4000, 3000), "JPEG"), max_edge=512)
+    assert prepared.original_size == (4000, 3000)
+    assert max(prepared.size) == 512
+    assert Image.open(io.BytesIO(prepared.jpeg)).format == "JPEG"
+
+
+def test_exif_orientation_is_applied():
+    exif = Image.Exif()
+    exif[0x0112] = 6  # rotate 90° clockwise on display
+    prepared = preprocess_image(encode(sample_image(600, 300), "JPEG", exif=exif), max_edge=1000)
+    assert prepared.size == (300, 600)
+
+
+def test_dhash_survives_reencoding_and_resizing():
+    image = sample_image()
+    original = preprocess_image(encode(image, "PNG")).dhash
+    reencoded = preprocess_image(encode(image.resize((600, 400)), "JPEG", quality=60)).dhash
+    different = dhash(image.transpose(Image.Transpose.FLIP_LEFT_RIGHT))
+    assert hamming_distance(original, reencoded) <= 4
+    assert hamming_distance(original, different) > 4
+
+
+# ===========================================
+# Perceptual caption cache
+# ===========================================
+
+def test_cache_matches_near_hashes_within_namespace():
+    cache = PerceptualCaptionCache(max_entries=2, max_distance=2)
+    cache.set("gemini/a", 0b1111, "four ones")
+    assert cache.get("gemini/a", 0b1111) == "four ones"
+    assert cache.get("gemini/a", 0b0111) == "four ones"
+    assert cache.get("gemini/a", 0b0000) is None
+    assert cache.get("gemini/b", 0b1111) is None
+    assert cache.stats() == {"hits": 1, "near_hits": 1, "misses": 2, "entries": 1}
+
+
+def test_reuploaded_image_reuses_cached_caption(monkeypatch):
+    monkeypatch.setattr(image_captioning, "CAPTION_PROVIDER", "fake")
+    caption_cache.clear()
+    fake = get_provider("fake")
+    fake.calls.clear()
+
+    image = sample_image()
+    first = asyncio.run(image_captioning.caption_image(encode(image, "PNG")))
+    second = asyncio.run(image_captioning.caption_image(encode(image.resize((900, 600)), "JPEG", quality=70)))
+    assert first == second
+    assert len(fake.calls) == 1
@@ -0,0 +1,134 @@
+# tests/test_jobs.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+import asyncio
+import hashlib
+import time
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.models import CreativePlan
+from app import jobs
+from app.planner import core
+from app.jobs import JOB_LEASE_SECONDS, JobQueue, JobStore, QueueFullError, job_queue, QUEUED, RUNNING
+
+
+@pytest.fixture(autouse=True)
+def no_surprise_prefetch(monkeypatch):
+    # App startup would otherwise fill the surprise pool through the live OpenAI client
+    monkeypatch.setattr("app.planner.surprise_pool.SURPRISE_PREFETCH_ON_STARTUP", False)
+
+
+def make_plan(title: str) -> CreativePlan:
+    return CreativePlan(title=title, concept_summary="c", hook="h", visual_style="v", tone="t", scene_ideas=["s"])
+
+
+# ===========================================
+# SQLite job store
+# ===========================================
+
+def test_store_claims_highest_priority_first(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    low = store.enqueue("text", "low", priority=0)
+    high = store.enqueue("text", "high", priority=5)
+
+    assert store.claim_next()["id"] == high
+    assert store.claim_next()["id"] == low
+    assert store.claim_next() is None
+
+
+def test_store_enforces_queue_depth(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    store.enqueue("text", "one", max_depth=2)
+    store.enqueue("text", "two", max_depth=2)
+    with pytest.raises(QueueFullError):
+        store.enqueue("text", "three", max_depth=2)
+
+
+def test_interrupted_jobs_survive_restart(tmp_path):
+    db_path = str(tmp_path / "jobs.sqlite3")
+    job_id = JobStore(db_path).enqueue("text", "brief")
+    JobStore(db_path).claim_next()
+
+    restarted = JobStore(db_path)
+    assert restarted.get(job_id)["status"] == RUNNING
+    assert restarted.requeue_interrupted() == 0  # still leased by its (possibly live) worker
+    assert restarted.requeue_interrupted(now=time.time() + JOB_LEASE_SECONDS + 1) == 1
+    assert restarted.get(job_id)["status"] == QUEUED
+
+
+# ===========================================
+# Job endpoints
+# ===========================================
+
+def test_job_runs_in_background_and_long_poll_returns_plan(tmp_path, monkeypatch):
+    async def fake_plan(user_input, **kwargs):
+        await asyncio.sleep(0.05)
+        return make_plan(user_input)
+
+    monkeypatch.setattr(core, "plan_from_brief", fake_plan)
+    monkeypatch.setattr(job_queue, "_store", JobStore(str(tmp_path / "jobs.sqlite3")))
+
+    with TestClient(app) as client:
+        response = client.post("/plans/jobs", json={"input": "moon flowers", "priority": 3})
+        assert response.status_code == 202
+        job_id = response.json()["id"]
+
+        job = client.get(f"/plans/jobs/{job_id}", params={"wait": 5}).json()
+        assert job["status"] == "succeeded"
+        assert job["result"]["title"] == "moon flowers"
+
+
+def test_job_timeout_is_recorded(tmp_path, monkeypatch):
+    async def slow_plan(user_input, **kwargs):
+        await asyncio.sleep(5)
+
+    monkeypatch.setattr(core, "plan_from_brief", slow_plan)
+    monkeypatch.setattr(job_queue, "_store", JobStore(str(tmp_path / "jobs.sqlite3")))
+
+    with TestClient(app) as client:
+        job_id = client.post("/plans/jobs", json={"input": "slow", "timeout_seconds": 0.05}).json()["id"]
+        job = client.get(f"/plans/jobs/{job_id}", params={"wait": 5}).json()
+        assert job["status"] == "timed_out"
+
+
+def test_upload_jobs_read_their_media_file_and_delete_it_when_done(tmp_path, monkeypatch):
+    seen = {}
+
+    async def fake_plan_from_image(image):
+        seen["path"] = image.file.name
+        seen["sha256"], seen["bytes"] = image.sha256, image.read()
+        return make_plan("from image")
+
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(jobs, "plan_from_image", fake_plan_from_image)
+    monkeypatch.setattr(job_queue, "_store", store)
+
+    png = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+    with TestClient(app) as client:
+        job_id = client.post("/plans/jobs/from-image", files={"file": ("a.png", png, "image/png")}).json()["id"]
+        job = client.get(f"/plans/jobs/{job_id}", params={"wait": 5}).json()
+
+    assert job["status"] == "succeeded"
+    assert seen["bytes"] == png and seen["sha256"] == hashlib.sha256(png).hexdigest()
+    assert os.path.dirname(seen["path"]) == store.media_dir
+    assert not os.path.exists(seen["path"])
+
+
+def test_long_polls_that_time_out_leave_no_waiters_behind(tmp_path):
+    queue = JobQueue(JobStore(str(tmp_path / "jobs.sqlite3")))
+
+    async def poll():
+        job_id = await queue.submit("text", "never runs")
+        return await asyncio.gather(queue.wait(job_id, 0.05), queue.wait(job_id, 0.1))
+
+    assert [job["status"] for job in asyncio.run(poll())] == [QUEUED, QUEUED]
+    assert queue._finished == {}
+
+
+def test_unknown_job_returns_404(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_queue, "_store", JobStore(str(tmp_path / "jobs.sqlite3")))
+    assert TestClient(app).get("/plans/jobs/missing").status_code == 404
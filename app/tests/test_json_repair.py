@@ -0,0 +1,129 @@
+# tests/test_json_repair.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+import asyncio
+import json
+import pytest
+from app.planner import core
+from app.planner.json_repair import (
+    JSONExtractor, JSONRepairError, extract_json_object, parse_plan_locally, repair_json, repair_stats,
+)
+
+PLAN = {
+    "title": "Moon Bloom",
+    "concept_summary": "An astronaut opens a flower shop on the moon.",
+    "hook": "Flowers that only grow in zero gravity.",
+    "visual_style": "Pastel retro-futurism",
+    "tone": "Whimsical",
+    "scene_ideas": ["Planting seeds in moon dust", "First customer arrives by rover"],
+}
+
+
+# ===========================================
+# Extraction
+# ===========================================
+
+def test_extracts_first_balanced_object_from_prose():
+    text = 'Sure! Here is the plan:\n```json\n{"title": "a } b", "x": {"y": 1}}\n```\nAnd another {"z": 2}'
+    assert extract_json_object(text) == '{"title": "a } b", "x": {"y": 1}}'
+
+
+def test_extractor_works_on_streamed_chunks():
+    extractor = JSONExtractor()
+    assert not extractor.feed('Plan: {"title": "Moon')
+    assert extractor.candidate() == '{"title": "Moon'
+    assert extractor.feed(' Bloom"} trailing text')
+    assert extractor.candidate() == '{"title": "Moon Bloom"}'
+
+
+# ===========================================
+# Local repair
+# ===========================================
+
+@pytest.mark.parametrize("broken", [
+    '{"title": "a", "tags": ["x", "y",],}',                 # trailing commas
+    '{“title”: “a”, "tags": ["x"]}',                        # smart quotes
+    "{'title': 'it\"s a', 'tags': ['x']}",                  # single quotes
+    '{"title": "a", "tags": ["x", "y',                      # unterminated string, missing brackets
+    '{"title": "a", "tags": ["x"], "tone":',                # dangling key
+])
+def test_repair_produces_valid_json(broken):
+    data = json.loads(repair_json(broken))
+    assert data["title"].endswith("a")
+
+
+def test_smart_quotes_inside_strings_are_kept():
+    broken = '{“title”: “a”, "hook": "He said “hi” and ‘bye’", "tags": ["x",]}'
+    data = json.loads(repair_json(broken))
+    assert data == {"title": "a", "hook": "He said “hi” and ‘bye’", "tags": ["x"]}
+
+
+@pytest.mark.parametrize("broken, value", [
+    ('{"title": "a", "draft": tru', True),
+    ('{"title": "a", "draft": [fals', [False]),
+    ('{"title": "a", "draft": nul', None),
+])
+def test_truncated_literals_are_completed(broken, value):
+    assert json.loads(repair_json(broken)) == {"title": "a", "draft": value}
+
+
+def test_truncated_bare_words_are_dropped():
+    assert json.loads(repair_json('{"title": "a", "draft": truthy')) == {"title": "a"}
+
+
+def test_truncated_plan_is_repaired_locally():
+    text = json.dumps(PLAN)[:-30]
+    plan, outcome = parse_plan_locally(text)
+    assert outcome == "local_repair"
+    assert plan.title == "Moon Bloom"
+    assert plan.scene_ideas[0] == "Planting seeds in moon dust"
+
+
+def test_fields_are_coerced_or_dropped_individually():
+    data = dict(PLAN, scene_ideas="One scene; Another scene", tone=["Warm", "Wry"], audience=42)
+    plan, outcome = parse_plan_locally(json.dumps(data))
+    assert outcome == "local_repair"
+    assert plan.scene_ideas == ["One scene", "Another scene"]
+    assert plan.tone == "Warm; Wry"
+    assert plan.audience is None
+
+
+def test_missing_required_field_is_an_error():
+    data = dict(PLAN)
+    del data["hook"]
+    with pytest.raises(JSONRepairError):
+        parse_plan_locally(json.dumps(data))
+
+
+# ===========================================
+# LLM repair fallback
+# ===========================================
+
+def test_llm_repair_receives_only_the_broken_json(monkeypatch):
+    prompts = []
+
+    async def fake_generate(prompt):
+        prompts.append(prompt)
+        return json.dumps(PLAN)
+
+    monkeypatch.setattr(core, "generate_creative_response", fake_generate)
+    broken = '{"title": "Moon Bloom" "hook": "no comma"}'
+    before = repair_stats["llm_repair"]
+
+    plan = asyncio.run(core.parse_or_repair_plan_response(f"Preamble text. {broken} Postscript."))
+    assert plan.title == "Moon Bloom"
+    assert len(prompts) == 1
+    assert broken in prompts[0] and "Preamble" not in prompts[0]
+    assert repair_stats["llm_repair"] == before + 1
+
+
+def test_no_json_at_all_fails_without_llm_call(monkeypatch):
+    async def fake_generate(prompt):
+        raise AssertionError("should not be called")
+
+    monkeypatch.setattr(core, "generate_creative_response", fake_generate)
+    with pytest.raises(ValueError):
+        asyncio.run(core.parse_or_repair_plan_response("I cannot help with that."))
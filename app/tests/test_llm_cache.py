@@ -0,0 +1,110 @@
+# tests/test_llm_cache.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+import asyncio
+import threading
+from app.planner.llm_cache import LLMCache, make_cache_key
+
+
+# ===========================================
+# LLM response cache tests
+# ===========================================
+
+def test_cache_key_depends_on_model_settings_and_prompt():
+    base = make_cache_key("model-a", {"temperature": 0.5}, "hello")
+    assert base == make_cache_key("model-a", {"temperature": 0.5}, "hello")
+    assert base != make_cache_key("model-b", {"temperature": 0.5}, "hello")
+    assert base != make_cache_key("model-a", {"temperature": 0.9}, "hello")
+    assert base != make_cache_key("model-a", {"temperature": 0.5}, "hello!")
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = LLMCache(max_entries=2, db_path=None)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"  # "b" is now least recently used
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.stats()["misses"] == 1
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl(tmp_path):
+    clock = FakeClock()
+    cache = LLMCache(ttl_seconds=60, db_path=str(tmp_path / "cache.sqlite3"), clock=clock)
+    cache.set("a", "1")
+    clock.now = 1060.0
+    assert cache.get("a") == "1"
+
+    clock.now = 1061.0
+    assert cache.get("a") is None
+    assert LLMCache(ttl_seconds=60, db_path=str(tmp_path / "cache.sqlite3"), clock=clock).get("a") is None
+
+
+def test_expired_rows_are_purged_periodically_not_on_every_write(tmp_path):
+    clock = FakeClock()
+    cache = LLMCache(ttl_seconds=60, db_path=str(tmp_path / "cache.sqlite3"), purge_interval=3600, clock=clock)
+    cache.set("old", "1")
+    clock.now += 120
+    cache.set("new", "2")  # the first write purged; the next purge is an hour later
+    rows = lambda: [key for (key,) in cache._connect().execute("SELECT key FROM llm_cache ORDER BY key")]
+    assert rows() == ["new", "old"]
+
+    clock.now += 3600
+    cache.set("newest", "3")
+    assert rows() == ["newest"]
+
+
+def test_disk_tier_survives_new_instance(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite3")
+    LLMCache(db_path=db_path).set("a", "persisted")
+
+    fresh = LLMCache(db_path=db_path)
+    assert fresh.get("a") == "persisted"
+    assert fresh.get("a") == "persisted"
+    assert fresh.stats()["disk_hits"] == 1
+    assert fresh.stats()["memory_hits"] == 1
+
+
+def test_async_api_reads_the_disk_tier_in_a_worker_thread(tmp_path, monkeypatch):
+    cache = LLMCache(db_path=str(tmp_path / "cache.sqlite3"))
+    threads = []
+    disk_get = cache._disk_get
+    monkeypatch.setattr(cache, "_disk_get", lambda key, now: threads.append(threading.get_ident()) or disk_get(key, now))
+
+    async def main():
+        await cache.aset("a", "1")
+        cache._memory.clear()
+        return await cache.aget("a"), await cache.aget("a")
+
+    assert asyncio.run(main()) == ("1", "1")
+    assert len(threads) == 1 and threads[0] != threading.get_ident()
+    assert cache.stats()["disk_hits"] == 1 and cache.stats()["memory_hits"] == 1
+
+
+def test_generate_creative_response_uses_cache(monkeypatch):
+    from app.planner import llm_gemini
+    from app.planner.providers import FakeProvider, register_provider
+
+    fake = FakeProvider()
+    register_provider("fake-cache-test", lambda: fake)
+    monkeypatch.setattr(llm_gemini, "TEXT_PROVIDER", "fake-cache-test")
+    monkeypatch.setattr(llm_gemini, "llm_cache", LLMCache(db_path=None))
+
+    first = asyncio.run(llm_gemini.generate_creative_response("same prompt"))
+    assert asyncio.run(llm_gemini.generate_creative_response("same prompt")) == first
+    assert len(fake.calls) == 1
+
+    asyncio.run(llm_gemini.generate_creative_response("same prompt", use_cache=False))
+    assert len(fake.calls) == 2
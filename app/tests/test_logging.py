@@ -0,0 +1,98 @@
+# tests/test_logging.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+import json
+import logging
+import queue
+from app import logger as app_logger
+from app.logger import JSONFormatter, NonBlockingQueueHandler, TraceContextFilter, log_payload, trace_id_var
+
+
+def make_record(msg, *args, **extra):
+    record = logging.LogRecord("creative_agent", logging.INFO, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+# ===========================================
+# Queue handler
+# ===========================================
+
+def test_queue_handler_drops_instead_of_blocking_when_full():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=2))
+    for i in range(5):
+        handler.handle(make_record("record %d", i))
+
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+    assert handler.queue.get_nowait().msg == "record 0"
+
+
+def test_queue_handler_renders_message_on_enqueue():
+    handler = NonBlockingQueueHandler(queue.Queue())
+    payload = ["a"]
+    handler.handle(make_record("items: %s", payload))
+    payload.append("b")
+
+    queued = handler.queue.get_nowait()
+    assert queued.getMessage() == "items: ['a']"
+
+
+# ===========================================
+# Structured records and truncation
+# ===========================================
+
+def test_json_formatter_emits_trace_and_stage():
+    record = make_record("hello %s", "world", trace_id="t-1", stage="essence", payload_chars=42)
+    entry = json.loads(JSONFormatter().format(record))
+    assert entry["msg"] == "hello world"
+    assert entry["trace_id"] == "t-1"
+    assert entry["stage"] == "essence"
+    assert entry["payload_chars"] == 42
+    assert entry["level"] == "INFO"
+
+
+def test_filter_truncates_long_arguments(monkeypatch):
+    monkeypatch.setattr(app_logger, "LOG_MAX_ARG_CHARS", 10)
+    record = make_record("%s", "x" * 50)
+    TraceContextFilter().filter(record)
+    assert record.getMessage().startswith("x" * 10 + "…")
+    assert "50 chars" in record.getMessage()
+
+    full = make_record("%s", "x" * 50, full_payload=True)
+    TraceContextFilter().filter(full)
+    assert full.getMessage() == "x" * 50
+
+
+# ===========================================
+# Payload sampling
+# ===========================================
+
+def test_log_payload_previews_unsampled_requests(monkeypatch, caplog):
+    monkeypatch.setattr(app_logger, "LOG_PAYLOAD_SAMPLE_RATE", 0.0)
+    monkeypatch.setattr(app_logger, "LOG_PAYLOAD_PREVIEW_CHARS", 20)
+    with caplog.at_level(logging.INFO, logger="creative_agent"):
+        log_payload("Raw LLM response", "y" * 500)
+        log_payload("Unparseable LLM response", "z" * 500, level=logging.ERROR, full=True)
+
+    preview, error = caplog.records
+    assert "y" * 21 not in preview.getMessage()
+    assert preview.payload_chars == 500
+    assert error.getMessage().endswith("z" * 500)
+
+
+def test_payload_sampling_is_per_trace(monkeypatch):
+    monkeypatch.setattr(app_logger, "LOG_PAYLOAD_SAMPLE_RATE", 0.5)
+    decisions = {}
+    for i in range(200):
+        token = trace_id_var.set(f"trace-{i}")
+        try:
+            first, second = app_logger.payload_sampled(), app_logger.payload_sampled()
+        finally:
+            trace_id_var.reset(token)
+        assert first == second
+        decisions[i] = first
+    assert 40 < sum(decisions.values()) < 160
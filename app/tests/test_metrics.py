@@ -0,0 +1,70 @@
+# tests/test_metrics.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+import logging
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.metrics import MetricsRegistry
+from app.planner import llm_gemini
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    monkeypatch.setattr(llm_gemini, "TEXT_PROVIDER", "fake")
+    monkeypatch.setattr(llm_gemini, "CACHE_ENABLED", False)
+
+
+# ===========================================
+# Registry
+# ===========================================
+
+def test_registry_renders_prometheus_text_format():
+    registry = MetricsRegistry()
+    requests = registry.counter("demo_requests_total", "Requests", ["route"])
+    latency = registry.histogram("demo_seconds", "Latency", ["route"], buckets=(0.1, 1))
+    requests.inc(route='/a"b')
+    latency.observe(0.5, route="/a")
+    latency.observe(5, route="/a")
+
+    text = registry.render()
+    assert "# TYPE demo_requests_total counter" in text
+    assert 'demo_requests_total{route="/a\\"b"} 1' in text
+    assert 'demo_seconds_bucket{route="/a",le="0.1"} 0' in text
+    assert 'demo_seconds_bucket{route="/a",le="1"} 1' in text
+    assert 'demo_seconds_bucket{route="/a",le="+Inf"} 2' in text
+    assert 'demo_seconds_sum{route="/a"} 5.5' in text
+
+
+# ===========================================
+# /metrics endpoint and trace IDs
+# ===========================================
+
+def test_plan_request_is_reflected_in_metrics(offline):
+    assert client.post("/plans", json={"input": "A lighthouse keeper adopts a whale.", "mode": "single"}).status_code == 200
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    assert 'creative_agent_stage_seconds_count{stage="json_draft"}' in text
+    assert 'creative_agent_llm_prompt_tokens_total{provider="fake",model="fake-1",stage="json_draft"}' in text
+    assert 'creative_agent_http_request_seconds_count{method="POST",route="/plans",status="200"}' in text
+    assert 'creative_agent_http_requests_in_flight{route="/metrics"} 1' in text
+    assert "creative_agent_llm_cache{stat=" in text
+    assert "creative_agent_plan_parse_total{outcome=" in text
+
+
+def test_trace_id_is_echoed_and_attached_to_logs(offline, caplog):
+    with caplog.at_level(logging.INFO, logger="creative_agent"):
+        response = client.post("/plans", json={"input": "A kite learns to swim.", "mode": "single"},
+                               headers={"X-Request-ID": "trace-abc"})
+    assert response.headers["X-Trace-ID"] == "trace-abc"
+    traced = [record for record in caplog.records if record.trace_id == "trace-abc"]
+    assert traced
+    assert any(record.stage == "json_draft" for record in traced)
@@ -0,0 +1,103 @@
+# tests/test_model_tiers.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+import asyncio
+import io
+import pytest
+from PIL import Image
+from app.planner import core, image_captioning, llm_gemini
+from app.planner.cassette import Cassette
+from app.planner.image_preprocess import caption_cache
+from app.planner.model_tiers import ModelTiers, StageModel, model_tiers
+from app.planner.providers import FakeProvider, OpenAIProvider, register_provider
+from benchmarks.compare import Variant, compare_variants
+from benchmarks.profile_models import cost_per_brief, recommend
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    provider = FakeProvider()
+    register_provider("tiered", lambda: provider)
+    monkeypatch.setattr(llm_gemini, "TEXT_PROVIDER", "tiered")
+    monkeypatch.setattr(llm_gemini, "CACHE_ENABLED", False)
+    return provider
+
+
+# ===========================================
+# Tier configuration
+# ===========================================
+
+def test_stages_fall_back_to_their_base_stage_then_default():
+    tiers = ModelTiers.from_mapping({
+        "story": {"model": "strong-1", "max_output_tokens": 400, "config": {"temperature": 0.9}},
+        "default": "fast-1",
+    })
+    assert tiers.resolve("story_2", "base-1", {"temperature": 0.5, "top_p": 0.9}) == \
+        ("strong-1", {"temperature": 0.9, "top_p": 0.9, "max_output_tokens": 400})
+    assert tiers.resolve("essence", "base-1") == ("fast-1", None)
+    assert ModelTiers().resolve("essence", "base-1", {}) == ("base-1", None)
+
+    with pytest.raises(ValueError):
+        StageModel.parse({"model": "m", "max_tokens": 10})
+
+
+def test_openai_requests_translate_the_output_cap():
+    request = OpenAIProvider.__new__(OpenAIProvider)._request("hi", "gpt-4o-mini", {"max_output_tokens": 50})
+    assert request["max_tokens"] == 50 and "max_output_tokens" not in request
+
+
+# ===========================================
+# Planner and captioners
+# ===========================================
+
+def test_each_chain_stage_calls_its_own_model(fake, monkeypatch):
+    monkeypatch.setattr(model_tiers, "tiers", ModelTiers.from_mapping({
+        "essence": {"model": "fast-1", "max_output_tokens": 100},
+        "selection": "fast-1",
+    }).tiers)
+    asyncio.run(core.plan_from_brief("A snail wins a marathon.", mode="chain", reuse=False))
+
+    models = [call["model"] for call in fake.calls]
+    assert models == ["fast-1", "fake-1", "fast-1", "fake-1", "fake-1", "fake-1", "fake-1"]
+    assert fake.calls[0]["config"] == {"max_output_tokens": 100}
+    assert fake.calls[1]["config"] is None
+
+
+def test_image_captions_use_the_caption_image_tier(monkeypatch):
+    provider = FakeProvider()
+    register_provider("tiered-vision", lambda: provider)
+    monkeypatch.setattr(image_captioning, "CAPTION_PROVIDER", "tiered-vision")
+    monkeypatch.setattr(model_tiers, "tiers", {"caption_image": StageModel("vision-lite", max_output_tokens=80)})
+    caption_cache.clear()
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), "orange").save(buffer, format="PNG")
+    asyncio.run(image_captioning.caption_image(buffer.getvalue()))
+    assert provider.calls[0]["model"] == "vision-lite"
+    assert provider.calls[0]["config"] == {"max_output_tokens": 80}
+
+
+# ===========================================
+# Profiling
+# ===========================================
+
+def test_profiling_recommends_the_cheapest_valid_assignment(fake):
+    candidates = {"strong": {}, "cheap": {"default": "fast-1", "json_draft": "fake-1"}}
+    variants = [Variant(name, "chain", tiers=tiers) for name, tiers in candidates.items()]
+    report = asyncio.run(compare_variants(variants, ["A snail wins a marathon."], Cassette(), latency_scale=0,
+                                          fallback=fake))
+
+    cheap = report["variants"]["cheap"]
+    assert cheap["stages"]["essence"]["model"] == "fast-1"
+    assert cheap["stages"]["json_draft"]["model"] == "fake-1"
+    assert model_tiers.tiers == {}  # restored after the run
+
+    prices = {"fake-1": {"input": 10, "output": 30}, "fast-1": {"input": 0.1, "output": 0.3}}
+    assert cost_per_brief(cheap, prices) < cost_per_brief(report["variants"]["strong"], prices)
+    assert recommend(report, prices, min_valid=1.0) == "cheap"
+
+    report["variants"]["cheap"]["json_valid_rate"] = 0.5
+    assert recommend(report, prices, min_valid=1.0) == "strong"
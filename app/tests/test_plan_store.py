@@ -0,0 +1,107 @@
+# tests/test_plan_store.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+import gzip
+import json
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.plan_store import PlanStore, etag_matches, plan_store
+from app.planner import llm_gemini
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_gemini, "TEXT_PROVIDER", "fake")
+    monkeypatch.setattr(llm_gemini, "CACHE_ENABLED", False)
+    store = PlanStore(str(tmp_path / "plans.sqlite3"))
+    monkeypatch.setattr(plan_store, "_store", store)
+    return store
+
+
+# ===========================================
+# Store
+# ===========================================
+
+def test_same_content_gets_same_id(tmp_path):
+    store = PlanStore(str(tmp_path / "plans.sqlite3"))
+    first = store.save("brief", "single", {"title": "A"}, {"essence": "x"}, {"essence": 1.0})
+    again = store.save("brief", "single", {"title": "A"})
+    other = store.save("brief", "chain", {"title": "A"})
+
+    assert first.id == again.id
+    assert first.etag == again.etag
+    assert other.id != first.id
+    assert store.count() == 2
+    assert json.loads(PlanStore(store.db_path).get(first.id).body)["stage_outputs"] == {"essence": "x"}
+
+
+def test_etag_matching_is_weak():
+    assert etag_matches('W/"abc"', 'W/"abc"')
+    assert etag_matches('"xyz", "abc"', 'W/"abc"')
+    assert etag_matches("*", 'W/"abc"')
+    assert not etag_matches('"abd"', 'W/"abc"')
+    assert not etag_matches(None, 'W/"abc"')
+
+
+# ===========================================
+# GET /plans/{id}
+# ===========================================
+
+def test_saved_plan_is_retrievable_with_conditional_get(store):
+    response = client.post("/plans", json={"input": "A moth opens a lamp shop.", "mode": "single"})
+    assert response.status_code == 200
+    plan_id = response.headers["X-Plan-ID"]
+
+    stored = client.get(f"/plans/{plan_id}")
+    assert stored.status_code == 200
+    record = stored.json()
+    assert record["id"] == plan_id
+    assert record["input"] == "A moth opens a lamp shop."
+    assert record["mode"] == "single"
+    assert record["plan"] == response.json()
+    etag = stored.headers["ETag"]
+
+    revalidated = client.get(f"/plans/{plan_id}", headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert revalidated.headers["ETag"] == etag
+
+
+def test_unknown_plan_returns_404(store):
+    assert client.get("/plans/doesnotexist").status_code == 404
+
+
+# ===========================================
+# Serialization negotiation
+# ===========================================
+
+def test_responses_are_compact_unless_pretty_requested(store):
+    compact = client.get("/health")
+    assert compact.content == b'{"status":"ok"}'
+
+    pretty = client.get("/health?pretty=1")
+    assert pretty.content.decode().startswith('{\n  "status"')
+    assert pretty.headers["content-length"] == str(len(pretty.content))
+
+
+def test_large_json_is_gzipped_when_accepted(store):
+    plan_id = client.post("/plans", json={"input": "A glacier trains for a marathon. " * 40,
+                                          "mode": "single"}).headers["X-Plan-ID"]
+
+    raw = client.get(f"/plans/{plan_id}", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in raw.headers
+
+    compressed = client.get(f"/plans/{plan_id}", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in compressed.headers["vary"]
+    assert compressed.json() == raw.json()
+
+    streamed = client.post("/plans/stream", json={"input": "A kite learns to swim.", "mode": "single"},
+                           headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in streamed.headers
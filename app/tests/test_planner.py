@@ -7,6 +7,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../.
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
+from app.planner import llm_gemini
 
 
 # ===========================================
@@ -16,7 +17,10 @@ from app.main import app
 client = TestClient(app)
 
 
-def test_post_plan_success():
+def test_post_plan_success(monkeypatch):
+    # Use the deterministic offline provider instead of the real Gemini API
+    monkeypatch.setattr(llm_gemini, "TEXT_PROVIDER", "fake")
+    monkeypatch.setattr(llm_gemini, "CACHE_ENABLED", False)
     payload = {
         "input": "An astronaut tries to start a flower shop on the moon."
     }
@@ -0,0 +1,76 @@
+# tests/test_providers.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+import asyncio
+import json
+import pytest
+from app.models import CreativePlan
+from app.planner import hedging
+from app.planner.providers import FakeProvider, get_provider, register_provider
+
+
+class SlowFirstProvider(FakeProvider):
+    """Fake whose first call hangs, simulating a tail-latency outlier."""
+    name = "slow-first"
+
+    async def generate(self, prompt, model=None, config=None):
+        self.calls.append({"prompt": prompt, "model": model})
+        if len(self.calls) == 1:
+            await asyncio.sleep(5)
+        return f"answer {len(self.calls)}"
+
+
+# ===========================================
+# Provider registry
+# ===========================================
+
+def test_registry_returns_shared_instances():
+    assert get_provider("fake") is get_provider("fake")
+    with pytest.raises(ValueError):
+        get_provider("no-such-provider")
+
+
+def test_fake_provider_is_deterministic_and_returns_valid_plans():
+    fake = FakeProvider()
+    first = asyncio.run(fake.generate("Respond only with a single valid JSON object."))
+    assert first == asyncio.run(fake.generate("Respond only with a single valid JSON object."))
+    CreativePlan(**json.loads(first))
+    assert asyncio.run(fake.generate("Summarize this brief")).startswith("Fake response")
+
+
+# ===========================================
+# Hedged requests
+# ===========================================
+
+def test_hedge_wins_when_primary_is_slow():
+    provider = SlowFirstProvider()
+    before = hedging.hedge_stats.as_dict()
+
+    result = asyncio.run(asyncio.wait_for(hedging.hedged_call(provider, "prompt", delay=0.05), timeout=2))
+
+    assert result == "answer 2"
+    assert hedging.hedge_stats.fired == before["fired"] + 1
+    assert hedging.hedge_stats.won == before["won"] + 1
+
+
+def test_no_hedge_when_primary_is_fast():
+    provider = FakeProvider()
+    before = hedging.hedge_stats.as_dict()
+
+    asyncio.run(hedging.hedged_call(provider, "prompt", delay=1))
+
+    assert len(provider.calls) == 1
+    assert hedging.hedge_stats.fired == before["fired"]
+
+
+def test_hedge_can_target_an_alternate_provider(monkeypatch):
+    alternate = FakeProvider()
+    register_provider("fake-alternate", lambda: alternate)
+    monkeypatch.setattr(hedging, "HEDGE_ALTERNATE", "fake-alternate:fake-mini")
+
+    asyncio.run(asyncio.wait_for(hedging.hedged_call(SlowFirstProvider(), "prompt", delay=0.05), timeout=2))
+
+    assert alternate.calls[0]["model"] == "fake-mini"
@@ -0,0 +1,196 @@
+# tests/test_shared_state.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+import asyncio
+import subprocess
+import threading
+import time
+import pytest
+from app.jobs import JobStore, QUEUED, RUNNING
+from app.planner.llm_cache import LLMCache
+from app.planner.rate_limit import ProviderRateLimiter, SharedTokenBucket
+from app.planner.singleflight import SingleFlight
+from app.shared_state import LocalState, SQLiteState, open_shared_state
+
+STR_CODEC = (lambda value: value, lambda text: text)
+
+
+@pytest.fixture(params=["local", "sqlite"])
+def state(request, tmp_path):
+    if request.param == "local":
+        return LocalState()
+    return SQLiteState(str(tmp_path / "shared.sqlite3"))
+
+
+# ===========================================
+# Backends
+# ===========================================
+
+def test_get_set_add_and_expiry(state):
+    assert state.get("k") is None
+    state.set("k", "v1")
+    assert state.get("k") == "v1"
+    assert state.add("k", "v2") is False
+    assert state.get("k") == "v1"
+
+    assert state.add("lease", "a", ttl=0.05) is True
+    assert state.add("lease", "b", ttl=0.05) is False
+    time.sleep(0.06)
+    assert state.get("lease") is None
+    assert state.add("lease", "b", ttl=5) is True  # an expired lease can be taken over
+    assert state.get("lease") == "b"
+
+    state.delete("k")
+    assert state.get("k") is None
+
+
+def test_take_empties_the_bucket_then_reports_the_wait(state):
+    assert state.take("b", 1, capacity=2, refill_per_second=10) == 0
+    assert state.take("b", 1, capacity=2, refill_per_second=10) == 0
+    wait = state.take("b", 1, capacity=2, refill_per_second=10)
+    assert 0 < wait <= 0.1
+    time.sleep(wait)
+    assert state.take("b", 1, capacity=2, refill_per_second=10) == 0
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        open_shared_state("memcached")
+
+
+def test_sqlite_takes_are_atomic_across_processes(tmp_path):
+    db_path = str(tmp_path / "shared.sqlite3")
+    SQLiteState(db_path)  # create the schema before the processes race
+    script = (
+        "import sys; sys.path.insert(0, sys.argv[2]); from app.shared_state import SQLiteState\n"
+        "state = SQLiteState(sys.argv[1])\n"
+        "print(sum(state.take('b', 1, 30, 0.001) == 0 for _ in range(20)))\n"
+    )
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+    processes = [subprocess.Popen([sys.executable, "-c", script, db_path, root], stdout=subprocess.PIPE, text=True)
+                 for _ in range(3)]
+    granted = sum(int(process.communicate(timeout=30)[0]) for process in processes)
+    assert granted == 30  # 60 attempts, exactly `capacity` succeed
+
+
+# ===========================================
+# Cache, rate limits and coalescing on shared state
+# ===========================================
+
+def test_llm_cache_entries_are_visible_to_other_workers(tmp_path):
+    state = SQLiteState(str(tmp_path / "shared.sqlite3"))
+    first, second = LLMCache(db_path=None, shared=state), LLMCache(db_path=None, shared=state)
+    first.set("key", "response")
+    assert second.get("key") == "response"
+
+
+def test_rate_limit_buckets_are_shared(tmp_path):
+    state = SQLiteState(str(tmp_path / "shared.sqlite3"))
+    first = ProviderRateLimiter("p", requests_per_minute=60, state=state)
+    second = ProviderRateLimiter("p", requests_per_minute=60, state=state)
+    assert isinstance(first.requests, SharedTokenBucket)
+
+    async def main():
+        for _ in range(60):
+            await first.acquire()
+        start = time.monotonic()
+        await second.acquire()  # the other "worker" drained the shared bucket
+        return time.monotonic() - start
+
+    assert asyncio.run(main()) >= 0.5
+
+
+def test_identical_calls_in_two_workers_run_once(tmp_path):
+    state = SQLiteState(str(tmp_path / "shared.sqlite3"))
+    first = SingleFlight("plan", shared=state, poll_interval=0.01)
+    second = SingleFlight("plan", shared=state, poll_interval=0.01)
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "plan"
+
+    async def main():
+        return await asyncio.gather(first.do("brief", work, STR_CODEC), second.do("brief", work, STR_CODEC))
+
+    assert asyncio.run(main()) == ["plan", "plan"]
+    assert calls == [1]
+    assert first.stats()["remote"] + second.stats()["remote"] == 1
+
+
+def test_waiting_worker_takes_over_when_the_owner_fails(tmp_path):
+    state = SQLiteState(str(tmp_path / "shared.sqlite3"))
+    first = SingleFlight("plan", shared=state, poll_interval=0.01)
+    second = SingleFlight("plan", shared=state, poll_interval=0.01)
+
+    async def failing():
+        await asyncio.sleep(0.03)
+        raise RuntimeError("provider down")
+
+    async def succeeding():
+        return "plan"
+
+    async def main():
+        return await asyncio.gather(first.do("brief", failing, STR_CODEC), second.do("brief", succeeding, STR_CODEC),
+                                    return_exceptions=True)
+
+    failed, result = asyncio.run(main())
+    assert isinstance(failed, RuntimeError)
+    assert result == "plan"
+
+
+def test_shared_state_is_not_called_on_the_event_loop_thread():
+    class ThreadRecordingState(LocalState):
+        def __init__(self):
+            super().__init__()
+            self.threads = set()
+
+        def get(self, key):
+            self.threads.add(threading.get_ident())
+            return super().get(key)
+
+        def add(self, key, value, ttl=None):
+            self.threads.add(threading.get_ident())
+            return super().add(key, value, ttl)
+
+        def take(self, bucket, amount, capacity, refill_per_second):
+            self.threads.add(threading.get_ident())
+            return super().take(bucket, amount, capacity, refill_per_second)
+
+    state = ThreadRecordingState()
+    flight = SingleFlight("plan", shared=state, poll_interval=0.01)
+    bucket = SharedTokenBucket("p", capacity=1, refill_per_second=100, state=state)
+
+    async def work():
+        return "plan"
+
+    async def main():
+        await bucket.acquire()
+        await bucket.acquire()
+        return await flight.do("brief", work, STR_CODEC)
+
+    assert asyncio.run(main()) == "plan"
+    assert state.threads and threading.get_ident() not in state.threads
+
+
+# ===========================================
+# Job leases
+# ===========================================
+
+def test_only_lapsed_job_leases_are_requeued(tmp_path):
+    db_path = str(tmp_path / "jobs.sqlite3")
+    worker_a, worker_b = JobStore(db_path), JobStore(db_path)
+    live = worker_a.enqueue("text", "a brief", None, priority=1, timeout=60)
+    dead = worker_a.enqueue("text", "another brief", None, priority=0, timeout=60)
+    assert worker_a.claim_next(lease_seconds=60)["id"] == live
+    assert worker_b.claim_next(lease_seconds=0.01)["id"] == dead
+    assert worker_b.claim_next() is None  # nothing is claimed twice
+
+    time.sleep(0.02)
+    assert worker_b.requeue_interrupted() == 1
+    assert worker_b.get(live)["status"] == RUNNING
+    assert worker_b.get(dead)["status"] == QUEUED
@@ -0,0 +1,87 @@
+# tests/test_singleflight.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+import asyncio
+import pytest
+from app.planner.singleflight import SingleFlight, normalize_brief
+
+
+# ===========================================
+# Single-flight coalescing
+# ===========================================
+
+def test_normalize_brief_ignores_case_and_whitespace():
+    assert normalize_brief("  Gen Z   runners\non TikTok ") == normalize_brief("gen z runners on tiktok")
+
+
+def test_concurrent_identical_calls_share_one_task():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "plan"
+
+    async def main():
+        return await asyncio.gather(*(flight.do("brief", work) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["plan"] * 5
+    assert len(calls) == 1
+    assert flight.stats() == {"started": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_cancelled_waiter_does_not_cancel_shared_task():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "plan"
+
+    async def main():
+        first = asyncio.create_task(flight.do("brief", work))
+        second = asyncio.create_task(flight.do("brief", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "plan"
+
+
+def test_shared_task_is_cancelled_when_every_waiter_leaves():
+    flight = SingleFlight()
+    finished = []
+
+    async def work():
+        await asyncio.sleep(1)
+        finished.append(1)
+
+    async def main():
+        waiter = asyncio.create_task(flight.do("brief", work))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        await asyncio.sleep(0)
+        return flight.stats()["in_flight"]
+
+    assert asyncio.run(main()) == 0
+    assert finished == []
+
+
+def test_errors_are_delivered_to_every_waiter():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.01)
+        raise ValueError("bad json")
+
+    async def main():
+        return await asyncio.gather(*(flight.do("brief", work) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, ValueError) for r in results)
@@ -0,0 +1,96 @@
+# tests/test_startup.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+import asyncio
+import json
+import subprocess
+from app.planner.providers import FakeProvider, register_provider, warm_providers
+from app.settings import Settings
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+
+# Generous bound for CI machines; importing the provider SDKs alone used to take longer
+COLD_IMPORT_BUDGET_SECONDS = 2.0
+
+COLD_IMPORT_SCRIPT = """
+import json, sys, time
+t0 = time.perf_counter()
+import app.main
+print(json.dumps({
+    "seconds": time.perf_counter() - t0,
+    "sdks": [m for m in ("google.generativeai", "openai") if m in sys.modules],
+}))
+"""
+
+
+class WarmupProvider(FakeProvider):
+    def __init__(self, delay=0.0, error=None):
+        super().__init__()
+        self.delay = delay
+        self.error = error
+        self.warmed = False
+
+    async def warm_up(self):
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        self.warmed = True
+
+
+# ===========================================
+# Cold import
+# ===========================================
+
+def test_cold_import_skips_provider_sdks_and_stays_fast():
+    result = subprocess.run([sys.executable, "-c", COLD_IMPORT_SCRIPT], cwd=ROOT, capture_output=True,
+                            text=True, timeout=60, env={**os.environ, "WARM_PROVIDERS": ""})
+    assert result.returncode == 0, result.stderr
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    assert report["sdks"] == []
+    assert report["seconds"] < COLD_IMPORT_BUDGET_SECONDS
+
+
+# ===========================================
+# Settings and warm-up
+# ===========================================
+
+def test_settings_read_provider_selection_from_environment(monkeypatch):
+    monkeypatch.setenv("LLM_PROVIDER", "openai")
+    monkeypatch.setenv("LLM_MODEL", "")
+    monkeypatch.setenv("WARM_PROVIDERS", "gemini, openai,,")
+    settings = Settings.from_env()
+    assert settings.llm_provider == "openai"
+    assert settings.llm_model is None
+    assert settings.warm_providers == ("gemini", "openai")
+
+
+def test_settings_read_tuning_knobs_from_environment(monkeypatch):
+    monkeypatch.setenv("ADMISSION_MAX_CONCURRENT", "3")
+    monkeypatch.setenv("LLM_CACHE_ENABLED", "0")
+    monkeypatch.setenv("BRIEF_INDEX_ENABLED", "1")
+    monkeypatch.setenv("GEMINI_RPM", "60")
+    monkeypatch.setenv("UPLOAD_MAX_IMAGE_MB", "2.5")
+    monkeypatch.delenv("PLAN_STORE_PATH", raising=False)
+    settings = Settings.from_env()
+    assert settings.admission_max_concurrent == 3
+    assert settings.llm_cache_enabled is False and settings.brief_index_enabled is True
+    assert settings.gemini_rpm == 60.0 and settings.upload_max_image_mb == 2.5
+    assert settings.plan_store_path == Settings().plan_store_path
+
+
+def test_warm_up_failures_and_timeouts_do_not_block_startup():
+    providers = {
+        "warm-ok": WarmupProvider(),
+        "warm-broken": WarmupProvider(error=ConnectionError("offline")),
+        "warm-slow": WarmupProvider(delay=5),
+    }
+    for name, provider in providers.items():
+        register_provider(name, lambda provider=provider: provider)
+
+    result = asyncio.run(warm_providers(["warm-ok", "warm-broken", "warm-slow", "warm-ok"], timeout=0.2))
+    assert result == {"warm-ok": True, "warm-broken": False, "warm-slow": False}
+    assert providers["warm-ok"].warmed and not providers["warm-slow"].warmed
+    assert asyncio.run(warm_providers([], timeout=1)) == {}
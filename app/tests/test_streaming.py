@@ -0,0 +1,128 @@
+# tests/test_streaming.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+import asyncio
+import json
+from fastapi.testclient import TestClient
+from app.main import app
+from app.planner import core
+from app.planner.brief_index import BriefIndex
+from app.planner.json_stream import JSONFieldStream
+from app.planner.prompt_accounting import ledger_var, record_prompt
+from app.planner.trace import PlanTrace
+from app.logger import stage_var
+
+client = TestClient(app)
+
+PLAN = {
+    "title": "Moon Bloom",
+    "concept_summary": "An astronaut opens a flower shop on the moon.",
+    "hook": "Flowers that only grow in zero gravity.",
+    "visual_style": "Pastel retro-futurism",
+    "tone": "Whimsical",
+    "scene_ideas": ["Planting seeds in moon dust", "First customer arrives by rover"],
+}
+
+
+def parse_sse(body: str):
+    events = []
+    for message in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in message.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+# ===========================================
+# Incremental JSON field parsing
+# ===========================================
+
+def test_json_field_stream_yields_fields_as_they_complete():
+    stream = JSONFieldStream()
+    assert stream.feed('```json\n{"title": "A, {tricky}", "scene_ideas": ["x",') == [("title", "A, {tricky}")]
+    assert stream.feed(' "y"], "tone": "odd"}\n```') == [("scene_ideas", ["x", "y"]), ("tone", "odd")]
+    assert stream.closed
+
+
+# ===========================================
+# SSE endpoint
+# ===========================================
+
+def test_stream_plan_emits_stages_fields_and_plan(monkeypatch):
+    async def fake_chain(user_input, on_stage=None, **kwargs):
+        for stage in ["essence", "brainstorm"]:
+            await on_stage(stage, f"{stage} output")
+        return "final prompt"
+
+    async def fake_stream(prompt):
+        text = json.dumps(PLAN)
+        for i in range(0, len(text), 16):
+            yield text[i:i + 16]
+
+    monkeypatch.setattr(core, "creative_plan_chained_prompt", fake_chain)
+    monkeypatch.setattr(core, "stream_creative_response", fake_stream)
+
+    response = client.post("/plans/stream", json={"input": "An astronaut tries to start a flower shop on the moon."})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = parse_sse(response.text)
+    names = [event for event, _ in events]
+    assert names[:2] == ["stage", "stage"]
+    assert events[0][1] == {"stage": "essence", "output": "essence output"}
+    assert "token" in names
+    assert [data["name"] for event, data in events if event == "field"] == list(PLAN)
+    assert events[-1][0] == "plan"
+    assert events[-1][1]["title"] == "Moon Bloom"
+
+
+def test_stream_plan_reports_invalid_json_as_error_event(monkeypatch):
+    async def fake_chain(user_input, on_stage=None, **kwargs):
+        return "final prompt"
+
+    async def fake_stream(prompt):
+        yield "not json at all"
+
+    monkeypatch.setattr(core, "creative_plan_chained_prompt", fake_chain)
+    monkeypatch.setattr(core, "stream_creative_response", fake_stream)
+
+    events = parse_sse(client.post("/plans/stream", json={"input": "anything"}).text)
+    assert events[-1][0] == "error"
+
+
+# ===========================================
+# Trace, prompt sizes and brief index
+# ===========================================
+
+def test_stream_plan_records_trace_and_restores_context(monkeypatch):
+    async def fake_chain(user_input, on_stage=None, trace=None, **kwargs):
+        trace.stage_outputs["essence"] = "essence output"
+        record_prompt("essence", "essence prompt", "essence output")
+        await on_stage("essence", "essence output")
+        return "final prompt"
+
+    async def fake_stream(prompt):
+        record_prompt("json_draft", prompt, json.dumps(PLAN))
+        yield json.dumps(PLAN)
+
+    index = BriefIndex()
+    monkeypatch.setattr(core, "creative_plan_chained_prompt", fake_chain)
+    monkeypatch.setattr(core, "stream_creative_response", fake_stream)
+    monkeypatch.setattr(core, "brief_index", index)
+    monkeypatch.setattr(core, "BRIEF_INDEX_ENABLED", True)
+
+    async def run(trace):
+        outer = stage_var.get()
+        events = [event async for event, _ in core.stream_plan_from_brief("A moon flower shop.", "chain", trace=trace)]
+        return events, outer, stage_var.get(), ledger_var.get()
+
+    trace = PlanTrace()
+    events, outer, after, ledger = asyncio.run(run(trace))
+    assert events[-1] == "plan"
+    assert after == outer and ledger is None
+    assert "json_draft" in trace.stages_run and "json_draft" in trace.timings
+    assert trace.prompt_sizes["total"]["calls"] == 2
+    match = index.lookup("A moon flower shop.", "chain")
+    assert match.entry.plan.title == "Moon Bloom" and match.entry.prefix == {"essence": "essence output"}
@@ -0,0 +1,146 @@
+# tests/test_surprise_pool.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.planner import llm_openai, surprise_pool as surprise_pool_module
+from app.planner.minhash import MinHashIndex, jaccard, shingles
+from app.planner.providers import FakeProvider, register_provider
+from app.planner.surprise_pool import SurprisePool
+
+client = TestClient(app)
+
+SUBJECTS = ["A lighthouse", "A retired robot", "A jellyfish", "A tax auditor", "A haunted piano",
+            "A cactus", "An elevator", "A sleepy volcano", "A librarian ghost", "A paper boat"]
+ACTIONS = ["opens a bakery on the moon", "learns tap dancing underwater", "runs for mayor of a pond",
+           "starts a podcast about fog", "becomes a wedding planner", "hosts a midnight quiz show"]
+
+
+class BriefProvider(FakeProvider):
+    """Returns distinct briefs for every batch choice, plus an exact repeat of the first one."""
+    name = "briefs"
+
+    def __init__(self):
+        super().__init__()
+        self.batches = 0
+
+    async def generate_many(self, prompt, n, model=None, config=None):
+        self.calls.append({"prompt": prompt, "n": n})
+        start = self.batches * n
+        self.batches += 1
+        briefs = [f"{SUBJECTS[i % len(SUBJECTS)]} {ACTIONS[i % len(ACTIONS)]}." for i in range(start, start + n)]
+        return briefs + [f'"{briefs[0]}"']
+
+
+@pytest.fixture
+def brief_provider(monkeypatch):
+    provider = BriefProvider()
+    register_provider("briefs", lambda: provider)
+    monkeypatch.setattr(llm_openai, "SURPRISE_PROVIDER", "briefs")
+    return provider
+
+
+# ===========================================
+# MinHash index
+# ===========================================
+
+def test_minhash_estimates_jaccard_similarity():
+    index = MinHashIndex(num_perm=128, bands=32)
+    a = "A cat runs a bakery on Mars at midnight"
+    b = "A cat runs a bakery on Venus at midnight"
+    exact = jaccard(shingles(a), shingles(b))
+    estimate = index.hasher.similarity(index.hasher.signature(a), index.hasher.signature(b))
+    assert abs(estimate - exact) < 0.15
+
+
+def test_index_finds_near_duplicates_and_evicts_oldest():
+    index = MinHashIndex(threshold=0.5, max_entries=2)
+    index.add("cat", "A cat runs a bakery on Mars at midnight")
+    index.add("dog", "An accountant dog competes in synchronized swimming")
+
+    assert [m.key for m in index.query("a cat runs a bakery on mars, at midnight!")] == ["cat"]
+    assert index.query("Volcanoes knit scarves for penguins") == []
+
+    index.add("fog", "Fog machines unionize at a rock concert")
+    assert len(index) == 2
+    assert "dog" not in index  # "cat" was refreshed by the query above
+    assert index.evictions == 1
+
+
+# ===========================================
+# Pool
+# ===========================================
+
+def test_refill_batches_and_rejects_near_duplicates(brief_provider):
+    pool = SurprisePool(size=8, low_water=3, batch_size=4)
+    asyncio.run(pool.refill())
+
+    assert len(pool) == 8
+    assert brief_provider.batches == 2
+    assert all(call["n"] == 4 for call in brief_provider.calls)
+    assert pool.duplicates == 2  # the repeated brief in each batch
+
+
+def test_take_is_served_from_memory_and_triggers_refill_below_low_water(brief_provider):
+    async def scenario():
+        pool = SurprisePool(size=4, low_water=2, batch_size=4)
+        await pool.refill()
+        calls = len(brief_provider.calls)
+        served = [pool.take(), pool.take()]
+        assert len(brief_provider.calls) == calls  # still at the low-water mark
+        served.append(pool.take())
+        assert pool.refilling()
+        await pool._refill_task
+        return pool, served
+
+    pool, served = asyncio.run(scenario())
+    assert all(served) and len(set(served)) == 3
+    assert len(pool) >= 4
+
+
+def test_startup_prefetch_can_be_turned_off(brief_provider, monkeypatch):
+    async def start(pool):
+        await pool.start()
+        return pool.refilling()
+
+    assert asyncio.run(start(SurprisePool(size=4, low_water=2))) is True
+    monkeypatch.setattr(surprise_pool_module, "SURPRISE_PREFETCH_ON_STARTUP", False)
+    assert asyncio.run(start(SurprisePool(size=4, low_water=2))) is False
+    assert brief_provider.calls == []
+
+
+def test_failed_refill_backs_off(monkeypatch):
+    async def failing(n):
+        raise RuntimeError("upstream down")
+    monkeypatch.setattr(llm_openai, "generate_surprise_briefs", failing)
+
+    async def scenario():
+        pool = SurprisePool(size=4, low_water=2)
+        await pool.refill()
+        pool.maybe_refill()
+        return pool
+
+    pool = asyncio.run(scenario())
+    assert pool.errors == 1
+    assert pool._refill_task is None
+
+
+# ===========================================
+# /surprise endpoint
+# ===========================================
+
+def test_surprise_endpoint_serves_pooled_briefs(brief_provider, monkeypatch):
+    pool = SurprisePool(size=4, low_water=1, batch_size=4)
+    asyncio.run(pool.refill())
+    monkeypatch.setattr(surprise_pool_module, "surprise_pool", pool)
+    monkeypatch.setattr("app.api.surprise_pool", pool)
+
+    response = client.get("/surprise")
+    assert response.status_code == 200
+    assert response.headers["X-Surprise-Source"] == "pool"
+    assert response.json()["brief"].startswith(SUBJECTS[0])
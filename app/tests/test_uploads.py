@@ -0,0 +1,105 @@
+# tests/test_uploads.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+import asyncio
+import hashlib
+import io
+import json
+import pytest
+from fastapi import UploadFile
+from fastapi.testclient import TestClient
+from PIL import Image
+from app import uploads
+from app.main import app
+from app.plan_store import plan_store
+from app.planner import llm_gemini, image_captioning, video_captioning
+from app.planner.providers import get_provider
+from app.uploads import UploadTooLargeError, sniff_mime_type, spool_upload
+
+client = TestClient(app)
+
+# Minimal MP4 header: size, "ftyp", brand
+MP4_BYTES = b"\x00\x00\x00\x18ftypmp42" + b"\x00" * 4096
+
+
+def png_bytes() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), "orange").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    monkeypatch.setattr(llm_gemini, "TEXT_PROVIDER", "fake")
+    monkeypatch.setattr(llm_gemini, "CACHE_ENABLED", False)
+    monkeypatch.setattr(image_captioning, "CAPTION_PROVIDER", "fake")
+    monkeypatch.setattr(video_captioning, "CAPTION_PROVIDER", "fake")
+
+
+# ===========================================
+# Spooling, limits and hashing
+# ===========================================
+
+def test_sniff_mime_type_ignores_client_claims():
+    assert sniff_mime_type(png_bytes()[:16]) == "image/png"
+    assert sniff_mime_type(MP4_BYTES[:16]) == "video/mp4"
+    assert sniff_mime_type(b"plain text file") is None
+
+
+def test_spool_hashes_incrementally_and_enforces_size(monkeypatch):
+    monkeypatch.setattr(uploads, "CHUNK_SIZE", 1000)
+    upload = asyncio.run(spool_upload(UploadFile(io.BytesIO(MP4_BYTES), filename="clip.mp4"), "video"))
+    assert upload.size == len(MP4_BYTES)
+    assert upload.sha256 == hashlib.sha256(MP4_BYTES).hexdigest()
+    assert upload.read() == MP4_BYTES
+
+    monkeypatch.setitem(uploads.MAX_BYTES, "video", 2000)
+    with pytest.raises(UploadTooLargeError):
+        asyncio.run(spool_upload(UploadFile(io.BytesIO(MP4_BYTES), filename="clip.mp4"), "video"))
+
+
+def test_oversized_and_wrong_type_uploads_are_rejected(monkeypatch):
+    response = client.post("/plans/from-image", files={"file": ("notes.png", b"not an image", "image/png")})
+    assert response.status_code == 415
+
+    monkeypatch.setitem(uploads.MAX_BYTES, "image", 10)
+    response = client.post("/plans/from-image", files={"file": ("tiny.png", png_bytes(), "image/png")})
+    assert response.status_code == 413
+
+
+# ===========================================
+# Captioning paths
+# ===========================================
+
+def test_image_upload_is_captioned_from_the_spool(offline):
+    response = client.post("/plans/from-image", files={"file": ("tiny.png", png_bytes(), "image/png")})
+    assert response.status_code == 200
+    assert response.json()["title"].startswith("Fake Plan")
+
+
+def test_plans_from_uploads_are_saved_with_their_caption(offline):
+    response = client.post("/plans/from-video", files={"file": ("clip.mp4", MP4_BYTES, "video/mp4")})
+    record = json.loads(plan_store.get(response.headers["X-Plan-ID"]).body)
+    assert record["plan"] == response.json()
+    assert record["input"] == record["stage_outputs"]["caption"] and record["input"]
+    assert "caption" in record["timings"]
+
+    stored = client.get(f"/plans/{response.headers['X-Plan-ID']}")
+    assert stored.status_code == 200 and "ETag" in stored.headers
+
+
+def test_large_video_uses_file_upload_instead_of_inline_data(offline, monkeypatch):
+    monkeypatch.setattr(video_captioning, "INLINE_VIDEO_MAX_BYTES", 1024)
+    fake = get_provider("fake")
+    fake.calls.clear()
+
+    response = client.post("/plans/from-video", files={"file": ("clip.mp4", MP4_BYTES, "video/mp4")})
+    assert response.status_code == 200
+
+    uploaded = [call["upload"] for call in fake.calls if "upload" in call]
+    assert len(uploaded) == 1 and uploaded[0]["mime_type"] == "video/mp4"
+    caption_call = next(call for call in fake.calls if "prompt" in call and uploaded[0] in call["prompt"])
+    assert not any("inline_data" in part for part in caption_call["prompt"] if isinstance(part, dict))
@@ -0,0 +1,128 @@
+# tests/test_variants.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.planner import llm_gemini
+from app.planner.core import plan_variants_from_brief
+from app.planner.prompt_chain import split_ideas
+from app.planner.providers import FakeProvider, register_provider
+from app.planner.trace import PlanTrace
+
+client = TestClient(app)
+
+
+class ChainProvider(FakeProvider):
+    """Answers brainstorm and selection prompts with numbered lists and tracks peak concurrency."""
+    name = "chain"
+
+    def __init__(self):
+        super().__init__(latency=0.02)
+        self.active = 0
+        self.peak = 0
+
+    def respond(self, prompt, model=None, choice=0):
+        if "Brainstorm 5" in prompt:
+            return "\n".join(f"{i}. Idea number {i} about a {word}." for i, word in
+                             enumerate(["glacier", "lantern", "tuba", "moth", "canyon"], 1))
+        if "most visually original ideas" in prompt:
+            return "1. Idea about a tuba — loud.\n2. Idea about a moth —\n   drawn to light.\n3. Idea about a glacier — slow."
+        return super().respond(prompt, model)
+
+    async def generate(self, prompt, model=None, config=None):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            return await super().generate(prompt, model, config)
+        finally:
+            self.active -= 1
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    provider = ChainProvider()
+    register_provider("chain", lambda: provider)
+    monkeypatch.setattr(llm_gemini, "TEXT_PROVIDER", "chain")
+    monkeypatch.setattr(llm_gemini, "CACHE_ENABLED", False)
+    return provider
+
+
+def prompts(provider, marker):
+    return [call["prompt"] for call in provider.calls if marker in call["prompt"]]
+
+
+# ===========================================
+# Idea splitting
+# ===========================================
+
+def test_split_ideas_handles_numbering_bullets_and_continuations():
+    assert split_ideas("1. First\n  continued\n2) Second\n- Third") == ["First continued", "Second", "Third"]
+    assert split_ideas("Just one idea.") == ["Just one idea."]
+    assert split_ideas("") == []
+
+
+# ===========================================
+# Shared prefix, concurrent branches
+# ===========================================
+
+def test_variants_share_prefix_and_run_branches_concurrently(provider):
+    trace = PlanTrace()
+    plans = asyncio.run(plan_variants_from_brief("A brass band on a glacier.", 3, trace=trace))
+
+    assert len(plans) == 3
+    assert len({plan.title for plan in plans}) == 3
+    # One essence, brainstorm and selection call; four calls (3 refinements + JSON) per variant
+    assert len(prompts(provider, "Summarize this into")) == 1
+    assert len(prompts(provider, "Brainstorm 5")) == 1
+    assert len(prompts(provider, "most visually original ideas")) == 1
+    assert len(provider.calls) == 3 + 4 * 3
+    one_liners = prompts(provider, "Based on the selected idea")
+    assert any("tuba" in p for p in one_liners) and any("drawn to light" in p for p in one_liners)
+    assert provider.peak >= 3
+
+    assert trace.mode == "chain"
+    branch = trace.branch(1)
+    assert set(branch.stage_outputs) == {"essence", "brainstorm", "selection", "one_liner", "story", "revision"}
+    assert branch.stage_outputs["one_liner"] == trace.stage_outputs["one_liner_1"]
+    assert "json_draft" in branch.stages_run
+
+
+def test_selection_shortfall_is_topped_up_from_brainstorm(provider, monkeypatch):
+    original = provider.respond
+
+    def short_selection(prompt, model=None, choice=0):
+        if "most visually original ideas" in prompt:
+            return "1. Idea about a tuba — loud."
+        return original(prompt, model, choice)
+
+    monkeypatch.setattr(provider, "respond", short_selection)
+    asyncio.run(plan_variants_from_brief("A brass band on a glacier.", 2))
+    one_liners = prompts(provider, "Based on the selected idea")
+    assert any("tuba" in p for p in one_liners)
+    assert any("glacier" in p and "Idea number 1" in p for p in one_liners)
+
+
+# ===========================================
+# POST /plans with variants
+# ===========================================
+
+def test_post_plans_with_variants_returns_a_list(provider, tmp_path, monkeypatch):
+    from app.plan_store import PlanStore, plan_store
+    monkeypatch.setattr(plan_store, "_store", PlanStore(str(tmp_path / "plans.sqlite3")))
+
+    response = client.post("/plans", json={"input": "A lighthouse keeper adopts a whale.", "variants": 2})
+    assert response.status_code == 200
+    assert isinstance(response.json(), list) and len(response.json()) == 2
+    ids = response.headers["X-Plan-ID"].split(",")
+    assert len(ids) == 2
+    stored = client.get(f"/plans/{ids[1]}").json()
+    assert stored["plan"] == response.json()[1]
+    assert "one_liner" in stored["stage_outputs"]
+
+    single = client.post("/plans", json={"input": "A lighthouse keeper adopts a whale.", "mode": "single", "variants": 2})
+    assert single.status_code == 400
@@ -0,0 +1,101 @@
+# tests/test_video_keyframes.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+import asyncio
+from fastapi.testclient import TestClient
+from PIL import Image, ImageDraw
+from app.main import app
+from app.planner import video_captioning, video_keyframes
+from app.planner.image_preprocess import caption_cache
+from app.planner.providers import FakeProvider, register_provider
+from app.planner.video_keyframes import select_scene_frames
+
+client = TestClient(app)
+
+
+def scene(color: str, shape: str) -> Image.Image:
+    image = Image.new("RGB", (640, 360), color)
+    draw = ImageDraw.Draw(image)
+    if shape == "circle":
+        draw.ellipse([60, 60, 300, 300], fill="white")
+    else:
+        draw.rectangle([380, 40, 600, 320], fill="black")
+    return image
+
+
+def clip(scenes, seconds_per_scene: int = 3, fps: int = 2):
+    """Synthetic decoded frames: each scene held for a few seconds."""
+    t = 0.0
+    for image in scenes:
+        for _ in range(seconds_per_scene * fps):
+            yield t, image
+            t += 1 / fps
+
+
+# ===========================================
+# Scene-change selection
+# ===========================================
+
+def test_one_keyframe_per_scene():
+    frames = select_scene_frames(clip([scene("red", "circle"), scene("blue", "box"), scene("red", "circle")]))
+    assert [round(frame.timestamp) for frame in frames] == [0, 3, 6]
+    assert all(max(frame.image.size) <= video_keyframes.KEYFRAME_MAX_EDGE for frame in frames)
+
+
+def test_keyframes_are_thinned_evenly_to_the_limit():
+    scenes = [scene("red", "circle"), scene("blue", "box")] * 5
+    frames = select_scene_frames(clip(scenes, seconds_per_scene=1), max_frames=4)
+    assert len(frames) == 4
+    assert frames[0].timestamp == 0 and frames[-1].timestamp == 9
+
+
+def test_long_clips_encode_only_the_kept_frames(monkeypatch):
+    encoded = []
+    prepare = video_keyframes.prepare_decoded
+    monkeypatch.setattr(video_keyframes, "prepare_decoded", lambda *args: encoded.append(args[0]) or prepare(*args))
+
+    scenes = [scene("red", "circle"), scene("blue", "box")] * 50
+    frames = select_scene_frames(clip(scenes, seconds_per_scene=1), max_frames=4)
+    assert len(frames) == len(encoded) == 4
+    assert frames[0].timestamp == 0 and frames[-1].timestamp == 99
+
+
+# ===========================================
+# Parallel frame captioning
+# ===========================================
+
+def test_keyframe_captions_run_concurrently_with_a_bound_and_merge_in_order(monkeypatch):
+    active = {"now": 0, "peak": 0}
+
+    class CountingProvider(FakeProvider):
+        name = "counting"
+
+        async def generate(self, prompt, model=None, config=None):
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+            await asyncio.sleep(0.02)
+            active["now"] -= 1
+            return f"frame caption {len(self.calls)}."
+
+    scenes = [scene(color, shape) for color in ("red", "blue", "green") for shape in ("circle", "box")]
+    frames = select_scene_frames(clip(scenes))
+    register_provider("counting", CountingProvider)
+    caption_cache.clear()
+    monkeypatch.setattr(video_captioning, "CAPTION_PROVIDER", "counting")
+    monkeypatch.setattr(video_captioning, "FRAME_CAPTION_CONCURRENCY", 2)
+    monkeypatch.setattr(video_captioning, "extract_keyframes", lambda source: frames)
+
+    paragraph = asyncio.run(video_captioning.caption_video(b"fake video bytes", mode="keyframes"))
+    assert paragraph.startswith(f"A video in {len(frames)} scenes.")
+    assert paragraph.index("At 0:00:") < paragraph.index("At 0:03:")
+    assert active["peak"] == 2
+
+
+def test_keyframes_mode_requires_pyav(monkeypatch):
+    monkeypatch.setattr(video_keyframes, "av", None)
+    response = client.post("/plans/from-video", files={"file": ("clip.mp4", b"\x00" * 64, "video/mp4")},
+                           data={"caption_mode": "keyframes"})
+    assert response.status_code == 400
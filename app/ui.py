@@ -11,7 +11,8 @@ from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 
 from app.logger import logger
-from app.planner.core import plan_from_brief
+from app.planner.admission import plan_admission
+from app.planner.core import coalesced_plan_from_brief
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
@@ -30,7 +31,8 @@ async def submit_form(request: Request, input: str = Form(...)):
     and renders the result or error message back to the same page.
     """
     try:
-        plan = await plan_from_brief(input)
+        async with plan_admission.slot():
+            plan = await coalesced_plan_from_brief(input)
         plan_json = json.dumps(plan.model_dump(), indent=2, ensure_ascii=False)
         return templates.TemplateResponse("index.html", {
             "request": request,
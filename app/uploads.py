@@ -0,0 +1,139 @@
+# app/uploads.py
+
+"""
+Bounded-memory handling of image and video uploads.
+
+Uploads are copied in fixed-size chunks into a SpooledTemporaryFile that stays
+in memory while small and rolls over to disk when large. The size limit and the
+content type are checked as the chunks arrive, and the sha256 digest is computed
+along the way, so an upload is never held in memory as one bytes object just to be
+validated or hashed.
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from typing import BinaryIO, Optional
+
+from fastapi import UploadFile
+
+from app.settings import get_settings
+
+# Size limits per upload kind, in bytes
+MAX_IMAGE_BYTES = int(get_settings().upload_max_image_mb * 1024 * 1024)
+MAX_VIDEO_BYTES = int(get_settings().upload_max_video_mb * 1024 * 1024)
+
+# Read size per chunk, and how much of an upload is kept in memory before spilling to disk
+CHUNK_SIZE = 1024 * 1024
+SPOOL_MAX_MEMORY = int(get_settings().upload_spool_memory_mb * 1024 * 1024)
+
+ALLOWED_TYPES = {
+    "image": {"image/jpeg", "image/png", "image/gif", "image/webp"},
+    "video": {"video/mp4", "video/quicktime", "video/webm"},
+}
+MAX_BYTES = {"image": MAX_IMAGE_BYTES, "video": MAX_VIDEO_BYTES}
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds the size limit for its kind."""
+
+
+class UnsupportedMediaTypeError(ValueError):
+    """Raised when an upload's content is not an allowed image or video type."""
+
+
+def sniff_mime_type(head: bytes) -> Optional[str]:
+    """
+    Detects the media type from the first bytes of a file, independent of the
+    client-supplied Content-Type.
+    """
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:8] == b"ftyp":
+        return "video/quicktime" if head[8:12] == b"qt  " else "video/mp4"
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        return "video/webm"
+    return None
+
+
+@dataclass
+class SpooledUpload:
+    """
+    A validated upload: the spooled file, its size, sha256 digest, and detected MIME type.
+    """
+    file: BinaryIO
+    size: int
+    sha256: str
+    mime_type: str
+    filename: Optional[str] = None
+
+    def read(self) -> bytes:
+        """
+        Returns the whole upload as bytes. Only for uploads known to be small enough.
+        """
+        self.file.seek(0)
+        return self.file.read()
+
+    def close(self) -> None:
+        self.file.close()
+
+    def save(self, path: str) -> None:
+        """
+        Copies the upload to `path` chunk by chunk. Blocking.
+        """
+        self.file.seek(0)
+        with open(path, "wb") as out:
+            shutil.copyfileobj(self.file, out, CHUNK_SIZE)
+
+    @classmethod
+    def open(cls, path: str, sha256: str) -> "SpooledUpload":
+        """
+        Reopens an upload saved with `save` (its digest was computed when it was spooled).
+        """
+        file = open(path, "rb")
+        mime_type = sniff_mime_type(file.read(16))
+        file.seek(0)
+        return cls(file=file, size=os.path.getsize(path), sha256=sha256, mime_type=mime_type)
+
+
+async def spool_upload(upload: UploadFile, kind: str) -> SpooledUpload:
+    """
+    Copies `upload` chunk by chunk into a spooled temporary file, enforcing the size
+    limit and allowed content types for `kind` ("image" or "video") while streaming
+    and hashing incrementally.
+    """
+    max_bytes = MAX_BYTES[kind]
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    digest = hashlib.sha256()
+    size = 0
+    mime_type = None
+    try:
+        while chunk := await upload.read(CHUNK_SIZE):
+            if mime_type is None:
+                mime_type = sniff_mime_type(chunk[:16])
+                if mime_type not in ALLOWED_TYPES[kind]:
+                    raise UnsupportedMediaTypeError(
+                        f"Unsupported {kind} type: {mime_type or upload.content_type or 'unknown'}"
+                    )
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLargeError(f"{kind.capitalize()} exceeds the {max_bytes // (1024 * 1024)} MB limit")
+            digest.update(chunk)
+            spool.write(chunk)
+        if size == 0:
+            raise UnsupportedMediaTypeError(f"Empty {kind} upload")
+    except Exception:
+        spool.close()
+        raise
+
+    spool.seek(0)
+    return SpooledUpload(file=spool, size=size, sha256=digest.hexdigest(), mime_type=mime_type,
+                         filename=upload.filename)
@@ -0,0 +1,6 @@
+# benchmarks/__init__.py
+
+"""
+Load-test and benchmark harness for the Creative Agent, driven by a simulated LLM backend.
+Run `python -m benchmarks.run --help` for options.
+"""
@@ -0,0 +1,253 @@
+# benchmarks/compare.py
+
+"""
+Compares planning variants offline by replaying recorded provider calls.
+
+Each variant runs every brief of a corpus through the planner with the text
+provider replaced by a cassette replay (see app/planner/cassette.py), and the
+report shows per-stage prompt and response sizes, how much of each plan's input
+is new rather than a repeated prefix (see app/planner/prompt_accounting.py),
+recorded LLM latency, the simulated wall time and how often the final JSON
+parsed cleanly.
+
+A variant is `name=mode[:graph][@module]`:
+- mode:   single, trends or chain
+- graph:  a chain graph from prompt_chain.CHAIN_GRAPHS (default: sequential)
+- module: a module whose public names (e.g. `essence_prompt`, `JSON_FIELDS_PROMPT`)
+          replace the same names in prompt_chain / prompt_template for that variant
+
+Calls missing from the cassette (e.g. a reworded prompt) fail the brief by
+default. `--on-miss live` sends them to the real provider and records them
+onto the cassette, so a new variant costs API calls only once; `--on-miss fake`
+uses the deterministic fake provider for dry runs.
+
+Examples:
+    python -m benchmarks.compare --cassette benchmarks/cassettes/briefs.jsonl.gz --on-miss live \\
+        --variant chain=chain                                    # record once
+    python -m benchmarks.compare --cassette benchmarks/cassettes/briefs.jsonl.gz \\
+        --variant chain=chain --variant parallel=chain:parallel_brainstorm --latency-scale 0.1
+    python -m benchmarks.compare --cassette /tmp/empty.jsonl --on-miss fake \\
+        --variant chain=chain --variant session=chain:session     # dry run of the session graph
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import logging
+import os
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.planner import core, hedging, llm_gemini, prompt_chain, prompt_template
+from app.planner.cassette import Cassette, RecordingProvider, ReplayProvider
+from app.planner.deadline import base_stage
+from app.planner.json_repair import repair_stats
+from app.planner.model_tiers import ModelTiers, model_tiers
+from app.planner.providers import FakeProvider, LLMProvider, register_provider, registered_providers
+from app.planner.trace import PlanTrace
+
+DEFAULT_BRIEFS = os.path.join(os.path.dirname(__file__), "briefs.txt")
+
+# Modules whose names a variant's prompt module may replace
+PROMPT_MODULES = (prompt_chain, prompt_template, core)
+
+
+@dataclass
+class Variant:
+    name: str
+    mode: str
+    graph: Optional[str] = None
+    prompts: Optional[str] = None
+    tiers: Optional[Dict[str, Any]] = None   # per-stage model assignment (see model_tiers.py)
+
+    @classmethod
+    def parse(cls, spec: str) -> "Variant":
+        name, _, rest = spec.partition("=")
+        if not rest:
+            raise ValueError(f"Variant must look like name=mode[:graph][@module], got {spec!r}")
+        rest, _, prompts = rest.partition("@")
+        mode, _, graph = rest.partition(":")
+        if mode not in ("single", "trends", "chain"):
+            raise ValueError(f"Unknown planning mode in variant {spec!r}: {mode!r}")
+        if graph and graph not in prompt_chain.CHAIN_GRAPHS:
+            raise ValueError(f"Unknown chain graph in variant {spec!r}: {graph!r}")
+        return cls(name, mode, graph or None, prompts or None)
+
+
+@contextmanager
+def applied(variant: Variant) -> Iterator[None]:
+    """
+    Installs the variant's chain graph, prompt overrides and model tiers, restoring the originals afterwards.
+    """
+    saved_tiers = model_tiers.tiers
+    if variant.tiers is not None:
+        model_tiers.tiers = ModelTiers.from_mapping(variant.tiers).tiers
+    overrides = {"CHAIN_GRAPH": variant.graph} if variant.graph else {}
+    if variant.prompts:
+        module = importlib.import_module(variant.prompts)
+        overrides.update({name: value for name, value in vars(module).items() if not name.startswith("_")})
+    saved = []
+    for target in PROMPT_MODULES:
+        for name, value in overrides.items():
+            if hasattr(target, name):
+                saved.append((target, name, getattr(target, name)))
+                setattr(target, name, value)
+    try:
+        yield
+    finally:
+        for target, name, value in reversed(saved):
+            setattr(target, name, value)
+        model_tiers.tiers = saved_tiers
+
+
+def _mean(values: List[float]) -> float:
+    return round(sum(values) / len(values), 1) if values else 0.0
+
+
+async def run_variant(variant: Variant, briefs: List[str], provider: ReplayProvider) -> dict:
+    """
+    Plans every brief with the variant and summarizes the replayed calls.
+    """
+    provider.cassette.rewind()
+    provider.calls.clear()
+    outcomes_before = dict(repair_stats)
+    failures: Dict[str, int] = defaultdict(int)
+    wall_times = []
+    new_input_chars = 0
+    with applied(variant):
+        for brief in briefs:
+            t0 = time.perf_counter()
+            trace = PlanTrace()
+            try:
+                await core.plan_from_brief(brief, mode=variant.mode, trace=trace, reuse=False)
+            except Exception as e:
+                failures[type(e).__name__] += 1
+            wall_times.append(time.perf_counter() - t0)
+            new_input_chars += trace.prompt_sizes.get("total", {}).get("new_input_chars", 0)
+
+    outcomes = {key: repair_stats[key] - outcomes_before.get(key, 0) for key in ("clean", "local_repair",
+                                                                               "llm_repair", "failed")}
+    stages: Dict[str, list] = defaultdict(list)
+    models: Dict[str, list] = defaultdict(list)
+    for call in provider.calls:
+        stages[base_stage(call.stage)].append(call)
+        models[call.model].append(call)
+    count = len(briefs)
+    scale = provider.latency_scale
+    return {
+        "briefs": count,
+        "failures": dict(failures),
+        "json_clean_rate": round(outcomes["clean"] / count, 3),
+        "json_valid_rate": round((outcomes["clean"] + outcomes["local_repair"] + outcomes["llm_repair"]) / count, 3),
+        "json_outcomes": outcomes,
+        "calls_per_brief": round(len(provider.calls) / count, 2),
+        "prompt_chars_per_brief": round(sum(c.prompt_chars for c in provider.calls) / count, 1),
+        # Prompt characters not repeating an earlier prompt's prefix (what a prefix cache cannot serve)
+        "new_input_chars_per_brief": round(new_input_chars / count, 1),
+        "response_chars_per_brief": round(sum(c.response_chars for c in provider.calls) / count, 1),
+        "llm_seconds_per_brief": round(sum(c.latency for c in provider.calls) / count, 3),
+        # Replayed latencies are slept at `scale`; dividing gives back recorded-time wall clock
+        "wall_seconds_per_brief": round(sum(wall_times) / count / scale, 3) if scale > 0 else None,
+        "misses": sum(not c.hit for c in provider.calls),
+        "stages": {
+            stage: {
+                "model": ",".join(sorted({c.model for c in calls})),
+                "calls": len(calls),
+                "prompt_chars": _mean([c.prompt_chars for c in calls]),
+                "response_chars": _mean([c.response_chars for c in calls]),
+                "latency_s": round(sum(c.latency for c in calls) / len(calls), 3),
+                "misses": sum(not c.hit for c in calls),
+            }
+            for stage, calls in stages.items()
+        },
+        # Totals per model over all briefs, for pricing
+        "models": {
+            model: {"calls": len(calls), "prompt_chars": sum(c.prompt_chars for c in calls),
+                    "response_chars": sum(c.response_chars for c in calls)}
+            for model, calls in models.items()
+        },
+    }
+
+
+def format_report(report: dict) -> str:
+    columns = ("calls_per_brief", "prompt_chars_per_brief", "new_input_chars_per_brief", "response_chars_per_brief",
+               "llm_seconds_per_brief", "wall_seconds_per_brief", "json_clean_rate", "json_valid_rate", "misses")
+    lines = [f"{'variant':<16}" + "".join(f"{c:>{len(c) + 2}}" for c in columns)]
+    for name, result in report["variants"].items():
+        lines.append(f"{name:<16}" + "".join(f"{str(result.get(c)):>{len(c) + 2}}" for c in columns))
+        for stage, stats in result["stages"].items():
+            lines.append(f"  {stage:<14}" + "  ".join(f"{k}={v}" for k, v in stats.items()))
+        if result["failures"]:
+            lines.append(f"  failures: {result['failures']}")
+    return "\n".join(lines)
+
+
+async def compare_variants(variants: List[Variant], briefs: List[str], cassette: Cassette,
+                           latency_scale: float, fallback: Optional[LLMProvider] = None) -> dict:
+    """
+    Runs each variant over the same briefs against one cassette replay of the text provider.
+    """
+    name = llm_gemini.TEXT_PROVIDER
+    provider = ReplayProvider(cassette, name, latency_scale, fallback)
+    original = registered_providers().get(name)
+    register_provider(name, lambda: provider)
+    # Every call must reach the provider: no cache hits, near-duplicate reuse or hedged duplicates
+    saved = (llm_gemini.CACHE_ENABLED, hedging.HEDGE_ENABLED)
+    llm_gemini.CACHE_ENABLED, hedging.HEDGE_ENABLED = False, False
+    try:
+        results = {variant.name: await run_variant(variant, briefs, provider) for variant in variants}
+    finally:
+        llm_gemini.CACHE_ENABLED, hedging.HEDGE_ENABLED = saved
+        if original is not None:
+            register_provider(name, original)
+    return {
+        "config": {"briefs": len(briefs), "latency_scale": latency_scale, "provider": name,
+                   "variants": {v.name: asdict(v) for v in variants}},
+        "variants": results,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare planning variants by replaying recorded provider calls.")
+    parser.add_argument("--cassette", required=True, help="Cassette to replay (created if missing with --on-miss live)")
+    parser.add_argument("--briefs", default=DEFAULT_BRIEFS, help="Text file with one brief per line")
+    parser.add_argument("--variant", action="append", required=True, help="name=mode[:graph][@module]; repeatable")
+    parser.add_argument("--latency-scale", type=float, default=0.1,
+                        help="Replay recorded latencies at this factor (0 = instant; wall time is then not reported)")
+    parser.add_argument("--on-miss", choices=["error", "fake", "live"], default="error",
+                        help="What serves calls that are not on the cassette")
+    parser.add_argument("--json", help="Also write the report to this JSON file")
+    args = parser.parse_args(argv)
+
+    logging.getLogger("creative_agent").setLevel(logging.WARNING)
+    variants = [Variant.parse(spec) for spec in args.variant]
+    with open(args.briefs, encoding="utf-8") as f:
+        briefs = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    cassette = Cassette.load(args.cassette) if os.path.exists(args.cassette) else Cassette()
+
+    fallback = None
+    if args.on_miss == "fake":
+        fallback = FakeProvider()
+    elif args.on_miss == "live":
+        live = registered_providers()[llm_gemini.TEXT_PROVIDER]()
+        fallback = RecordingProvider(live, cassette)
+
+    report = asyncio.run(compare_variants(variants, briefs, cassette, args.latency_scale, fallback))
+    print(format_report(report))
+
+    if args.on_miss == "live":
+        cassette.save(args.cassette)
+        print(f"Saved {len(cassette.entries)} recorded calls to {args.cassette}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+# benchmarks/fake_llm.py
+
+"""
+Simulated LLM backend for benchmarks.
+
+`SimulatedProvider` behaves like the deterministic FakeProvider but adds a
+configurable latency distribution, error rate and response size, so the app's own
+throughput and tail latency can be measured without network calls. `install()`
+routes every planner call (text, captioning, surprise briefs) to it.
+"""
+
+import asyncio
+import random
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+from app.planner import image_captioning, llm_gemini, llm_openai, video_captioning
+from app.planner.providers import FakeProvider, register_provider
+
+PROVIDER_NAME = "simulated"
+
+
+class SimulatedLLMError(RuntimeError):
+    """Raised by the simulated provider to model upstream failures."""
+
+
+@dataclass
+class LLMProfile:
+    """
+    Behaviour of the simulated backend. Latency is lognormal around `latency_median`
+    (seconds) with shape `latency_sigma`; 0 sigma gives a fixed latency.
+    """
+    latency_median: float = 0.05
+    latency_sigma: float = 0.5
+    error_rate: float = 0.0
+    response_chars: int = 0
+    stream_chunk_chars: int = 64
+    seed: Optional[int] = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class SimulatedProvider(FakeProvider):
+    name = PROVIDER_NAME
+    default_model = "simulated-1"
+
+    def __init__(self, profile: Optional[LLMProfile] = None):
+        super().__init__()
+        self.profile = profile or LLMProfile()
+        self._rng = random.Random(self.profile.seed)
+
+    def _latency(self) -> float:
+        if self.profile.latency_sigma <= 0:
+            return self.profile.latency_median
+        return self._rng.lognormvariate(0, self.profile.latency_sigma) * self.profile.latency_median
+
+    def _maybe_fail(self) -> None:
+        if self._rng.random() < self.profile.error_rate:
+            raise SimulatedLLMError("Simulated upstream LLM error")
+
+    def respond(self, prompt, model=None, choice=0) -> str:
+        text = super().respond(prompt, model, choice)
+        padding = self.profile.response_chars - len(text)
+        if padding <= 0:
+            return text
+        if text.startswith("{"):
+            # Grow a free-text field so the JSON stays a valid plan
+            return text.replace('"hook": "', '"hook": "' + "x" * padding + " ", 1)
+        return text + " " + "lorem " * (padding // 6)
+
+    async def generate(self, prompt, model=None, config=None) -> str:
+        self.calls.append({"prompt": prompt, "model": model, "config": config})
+        await asyncio.sleep(self._latency())
+        self._maybe_fail()
+        return self.respond(prompt, model)
+
+    async def generate_many(self, prompt, n, model=None, config=None):
+        self.calls.append({"prompt": prompt, "model": model, "config": config, "n": n})
+        await asyncio.sleep(self._latency())
+        self._maybe_fail()
+        return [self.respond(prompt, model, choice) for choice in range(n)]
+
+    async def stream(self, prompt, model=None, config=None):
+        self.calls.append({"prompt": prompt, "model": model, "config": config, "stream": True})
+        text = self.respond(prompt, model)
+        size = self.profile.stream_chunk_chars
+        chunks = [text[i:i + size] for i in range(0, len(text), size)] or [""]
+        # Half the latency before the first token, the rest spread over the chunks
+        total = self._latency()
+        await asyncio.sleep(total / 2)
+        self._maybe_fail()
+        for chunk in chunks:
+            await asyncio.sleep(total / 2 / len(chunks))
+            yield chunk
+
+
+def install(profile: Optional[LLMProfile] = None) -> SimulatedProvider:
+    """
+    Registers the simulated provider and points every planner call at it.
+    Disables the LLM response cache so each request does real (simulated) work.
+    """
+    provider = SimulatedProvider(profile)
+    register_provider(PROVIDER_NAME, lambda: provider)
+    llm_gemini.TEXT_PROVIDER = PROVIDER_NAME
+    llm_gemini.CACHE_ENABLED = False
+    image_captioning.CAPTION_PROVIDER = PROVIDER_NAME
+    video_captioning.CAPTION_PROVIDER = PROVIDER_NAME
+    llm_openai.SURPRISE_PROVIDER = PROVIDER_NAME
+    return provider
@@ -0,0 +1,127 @@
+# benchmarks/profile_models.py
+
+"""
+Profiles candidate per-stage model assignments (see app/planner/model_tiers.py).
+
+Runs a brief corpus through the planner once per candidate and reports, per
+stage, the model used, its latency and output length, plus each candidate's final
+JSON validity and estimated cost. It recommends the cheapest candidate whose
+JSON valid rate meets --min-valid.
+
+Candidates are a JSON file of {name: tier mapping}, e.g.
+    {"pro": {}, "flash-prefix": {"essence": "models/gemini-1.5-flash-latest", "selection": "..."}}
+
+Calls go through a cassette (benchmarks/compare.py): by default the first run of
+a candidate calls the real provider and records it (--on-miss live), so re-runs
+and report tweaks are free and reproducible. Cost uses --prices, a JSON file of
+{model: {"input": USD per 1M tokens, "output": USD per 1M tokens}}; without it
+candidates are ranked by recorded LLM seconds per brief instead.
+
+Example:
+    python -m benchmarks.profile_models --candidates benchmarks/model_candidates.json \\
+        --prices prices.json --mode chain --min-valid 1.0
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+from typing import Dict, List, Optional
+
+from app.planner.cassette import Cassette, RecordingProvider
+from app.planner.providers import FakeProvider, registered_providers
+from app.planner import llm_gemini
+from benchmarks.compare import DEFAULT_BRIEFS, Variant, compare_variants, format_report
+
+DEFAULT_CASSETTE = ".cache/model_profile.jsonl.gz"
+
+# Characters per token, as in rate_limit.estimate_tokens
+CHARS_PER_TOKEN = 4
+
+
+def cost_per_brief(result: dict, prices: Dict[str, dict]) -> Optional[float]:
+    """
+    Estimated USD per brief from per-model character totals, or None if a model has no price.
+    """
+    total = 0.0
+    for model, usage in result["models"].items():
+        price = prices.get(model)
+        if price is None:
+            return None
+        total += (usage["prompt_chars"] * price.get("input", 0)
+                  + usage["response_chars"] * price.get("output", 0)) / CHARS_PER_TOKEN / 1_000_000
+    return round(total / result["briefs"], 6)
+
+
+def recommend(report: dict, prices: Optional[Dict[str, dict]], min_valid: float) -> Optional[str]:
+    """
+    The cheapest candidate (by cost, else recorded LLM seconds) whose JSON valid rate is at least `min_valid`.
+    """
+    eligible = []
+    for name, result in report["variants"].items():
+        if result["json_valid_rate"] < min_valid:
+            continue
+        cost = cost_per_brief(result, prices) if prices else None
+        eligible.append((cost if cost is not None else float("inf"), result["llm_seconds_per_brief"], name))
+    return min(eligible)[2] if eligible else None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Profile per-stage model assignments on a brief corpus.")
+    parser.add_argument("--candidates", required=True, help="JSON file of {name: model tier mapping}")
+    parser.add_argument("--briefs", default=DEFAULT_BRIEFS, help="Text file with one brief per line")
+    parser.add_argument("--mode", choices=["single", "trends", "chain"], default="chain")
+    parser.add_argument("--graph", help="Chain graph (default: prompt_chain.CHAIN_GRAPH)")
+    parser.add_argument("--cassette", default=DEFAULT_CASSETTE)
+    parser.add_argument("--on-miss", choices=["error", "fake", "live"], default="live")
+    parser.add_argument("--latency-scale", type=float, default=0,
+                        help="Replay recorded latencies at this factor (0 = instant)")
+    parser.add_argument("--prices", help="JSON file of {model: {input, output}} in USD per 1M tokens")
+    parser.add_argument("--min-valid", type=float, default=1.0, help="Minimum JSON valid rate to recommend")
+    parser.add_argument("--json", help="Also write the report to this JSON file")
+    args = parser.parse_args(argv)
+
+    logging.getLogger("creative_agent").setLevel(logging.WARNING)
+    with open(args.candidates, encoding="utf-8") as f:
+        candidates = json.load(f)
+    with open(args.briefs, encoding="utf-8") as f:
+        briefs = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    prices = None
+    if args.prices:
+        with open(args.prices, encoding="utf-8") as f:
+            prices = json.load(f)
+    variants = [Variant(name, args.mode, args.graph, tiers=tiers) for name, tiers in candidates.items()]
+    cassette = Cassette.load(args.cassette) if os.path.exists(args.cassette) else Cassette()
+
+    fallback = None
+    if args.on_miss == "fake":
+        fallback = FakeProvider()
+    elif args.on_miss == "live":
+        fallback = RecordingProvider(registered_providers()[llm_gemini.TEXT_PROVIDER](), cassette)
+
+    report = asyncio.run(compare_variants(variants, briefs, cassette, args.latency_scale, fallback))
+    for name, result in report["variants"].items():
+        result["cost_per_brief"] = cost_per_brief(result, prices) if prices else None
+    report["recommended"] = recommend(report, prices, args.min_valid)
+
+    print(format_report(report))
+    for name, result in report["variants"].items():
+        if result["cost_per_brief"] is not None:
+            print(f"{name}: ~${result['cost_per_brief']:.6f} per brief")
+    if report["recommended"]:
+        print(f"Recommended: {report['recommended']} (cheapest with JSON valid rate >= {args.min_valid:g})")
+    else:
+        print(f"No candidate reached a JSON valid rate of {args.min_valid:g}")
+
+    if args.on_miss == "live":
+        cassette.save(args.cassette)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,373 @@
+# benchmarks/run.py
+
+"""
+Drives the Creative Agent endpoints at a fixed concurrency against a simulated LLM
+and reports throughput, latency percentiles, event-loop lag and peak RSS.
+
+Transports:
+- asgi:    in-process through httpx's ASGI transport (no sockets; isolates app overhead)
+- uvicorn: a real uvicorn server in a subprocess (includes HTTP parsing and networking)
+
+`--workers 1,2,4` repeats the uvicorn runs with that many worker processes
+(reported as uvicorn_x2, uvicorn_x4, ...) to show how throughput scales. Multi-worker
+servers share state through SHARED_STATE_BACKEND, which defaults to sqlite here.
+
+Examples:
+    python -m benchmarks.run --scenarios plans,surprise --requests 200 --concurrency 20
+    python -m benchmarks.run --save benchmarks/baselines/default.json
+    python -m benchmarks.run --compare benchmarks/baselines/default.json
+    python -m benchmarks.run --transport uvicorn --workers 1,2,4 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+import httpx
+from PIL import Image
+
+from benchmarks.fake_llm import LLMProfile
+
+SCENARIOS = ("plans", "image", "video", "surprise")
+
+# Metrics where a higher value is a regression; throughput is checked the other way round
+LOWER_IS_BETTER = ("p50_ms", "p95_ms", "p99_ms", "loop_lag_p99_ms")
+DEFAULT_TOLERANCE = 0.25
+# Millisecond metrics must also worsen by at least this much (a single GC pause can double a small p99)
+ABSOLUTE_SLACK_MS = 10
+
+# Warm-up requests use inputs that never collide with measured ones
+WARMUP_OFFSET = 1_000_000
+
+# Minimal MP4 header; the simulated captioner never decodes it
+VIDEO_BYTES = b"\x00\x00\x00\x18ftypmp42" + b"\x00" * 64 * 1024
+
+
+class LoopLagMonitor:
+    """
+    Measures event-loop lag: how late a periodic timer wakes up beyond its interval.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            t0 = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - t0 - self.interval))
+
+    def start(self) -> None:
+        self.samples.clear()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "loop_lag_p99_ms": round(percentile(self.samples, 0.99) * 1000, 2),
+            "loop_lag_max_ms": round(max(self.samples, default=0.0) * 1000, 2),
+        }
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux (bytes on macOS)
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _image_bytes(i: int) -> bytes:
+    # Random noise so each upload has a distinct perceptual hash (no caption cache hits)
+    rng = random.Random(i)
+    image = Image.new("RGB", (64, 64))
+    image.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(64 * 64)])
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def build_request(scenario: str, i: int, plan_mode: str) -> Callable[[httpx.AsyncClient], "asyncio.Future"]:
+    """
+    Returns a coroutine function issuing request `i` of `scenario`. Inputs vary by
+    index so request coalescing and caches don't hide the work.
+    """
+    if scenario == "plans":
+        payload = {"input": f"Benchmark brief #{i}: a robot opens a bakery.", "mode": plan_mode}
+        return lambda client: client.post("/plans", json=payload)
+    if scenario == "image":
+        files = {"file": (f"bench-{i}.png", _image_bytes(i), "image/png")}
+        return lambda client: client.post("/plans/from-image", files=files)
+    if scenario == "video":
+        files = {"file": (f"bench-{i}.mp4", VIDEO_BYTES + i.to_bytes(4, "big"), "video/mp4")}
+        return lambda client: client.post("/plans/from-video", files=files)
+    if scenario == "surprise":
+        return lambda client: client.get("/surprise")
+    raise ValueError(f"Unknown scenario: {scenario!r}")
+
+
+async def run_load(client: httpx.AsyncClient, scenario: str, total: int, concurrency: int,
+                   plan_mode: str = "single", offset: int = 0) -> Dict[str, float]:
+    """
+    Sends `total` requests for `scenario`, at most `concurrency` at a time.
+    Request inputs are numbered from `offset`.
+    """
+    if total <= 0:
+        return {}
+    requests = [build_request(scenario, i, plan_mode) for i in range(offset, offset + total)]
+    latencies: List[float] = []
+    errors = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for request in requests:
+        queue.put_nowait(request)
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            request = queue.get_nowait()
+            t0 = time.perf_counter()
+            try:
+                response = await request(client)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - t0)
+            errors += not ok
+
+    t_start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, total))))
+    elapsed = time.perf_counter() - t_start
+    return {
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(total / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+# ================================
+# Transports
+# ================================
+
+async def bench_asgi(scenarios: List[str], total: int, concurrency: int, profile: LLMProfile,
+                     plan_mode: str, warmup: int = 0) -> Dict[str, dict]:
+    from benchmarks.fake_llm import install
+    from app.main import app
+
+    install(profile)
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        for scenario in scenarios:
+            await run_load(client, scenario, warmup, concurrency, plan_mode, offset=WARMUP_OFFSET)
+            monitor = LoopLagMonitor()
+            monitor.start()
+            stats = await run_load(client, scenario, total, concurrency, plan_mode)
+            await monitor.stop()
+            results[scenario] = {**stats, **monitor.summary(), "peak_rss_mb": peak_rss_mb()}
+    return results
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def bench_uvicorn(scenarios: List[str], total: int, concurrency: int, profile: LLMProfile,
+                        plan_mode: str, warmup: int = 0, workers: int = 1) -> Dict[str, dict]:
+    port = _free_port()
+    env = dict(os.environ)
+    state_dir = tempfile.TemporaryDirectory()
+    if workers > 1:
+        # Workers must share caches, rate-limit buckets and in-flight keys; a fresh database per run
+        env.setdefault("SHARED_STATE_BACKEND", "sqlite")
+        env.setdefault("SHARED_STATE_PATH", os.path.join(state_dir.name, "shared_state.sqlite3"))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.server", "--port", str(port), "--profile", json.dumps(profile.to_dict()),
+         "--workers", str(workers)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    results = {}
+    try:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+            for _ in range(100):
+                try:
+                    if (await client.get("/health")).status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    pass
+                await asyncio.sleep(0.1)
+            else:
+                raise RuntimeError("Benchmark server did not start")
+
+            for scenario in scenarios:
+                await run_load(client, scenario, warmup, concurrency, plan_mode, offset=WARMUP_OFFSET)
+                if workers > 1:
+                    # Loop lag and RSS are per process; only the client-side numbers apply
+                    results[scenario] = await run_load(client, scenario, total, concurrency, plan_mode)
+                    continue
+                await client.post("/__bench/reset")
+                stats = await run_load(client, scenario, total, concurrency, plan_mode)
+                server_stats = (await client.get("/__bench/stats")).json()
+                results[scenario] = {**stats, **server_stats}
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+        state_dir.cleanup()
+    return results
+
+
+# ================================
+# Baselines
+# ================================
+
+def compare(report: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """
+    Returns a description of every metric that regressed by more than `tolerance` (a fraction).
+    """
+    regressions = []
+    for transport, scenarios in report["results"].items():
+        for scenario, stats in scenarios.items():
+            before = baseline.get("results", {}).get(transport, {}).get(scenario)
+            if not before:
+                continue
+            for metric in LOWER_IS_BETTER:
+                if metric not in before:
+                    continue
+                limit = max(before[metric] * (1 + tolerance), before[metric] + ABSOLUTE_SLACK_MS)
+                if stats[metric] > limit:
+                    regressions.append(f"{transport}/{scenario} {metric}: {before[metric]} -> {stats[metric]}")
+            if before.get("throughput_rps") and stats["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+                regressions.append(f"{transport}/{scenario} throughput_rps: "
+                                   f"{before['throughput_rps']} -> {stats['throughput_rps']}")
+    return regressions
+
+
+def format_scaling(report: dict) -> str:
+    """
+    Throughput of each multi-worker run relative to the single-worker uvicorn run.
+    """
+    single = report["results"].get("uvicorn", {})
+    lines = []
+    for transport, scenarios in report["results"].items():
+        if not transport.startswith("uvicorn_x"):
+            continue
+        for scenario, stats in scenarios.items():
+            if single.get(scenario, {}).get("throughput_rps"):
+                speedup = stats["throughput_rps"] / single[scenario]["throughput_rps"]
+                lines.append(f"{transport}/{scenario}: {speedup:.2f}x single-worker throughput")
+    return "\n".join(lines)
+
+
+def format_report(report: dict) -> str:
+    columns = ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "errors", "loop_lag_p99_ms", "peak_rss_mb")
+    lines = [f"{'transport/scenario':<22}" + "".join(f"{c:>16}" for c in columns)]
+    for transport, scenarios in report["results"].items():
+        for scenario, stats in scenarios.items():
+            lines.append(f"{transport + '/' + scenario:<22}" + "".join(f"{stats.get(c, ''):>16}" for c in columns))
+    return "\n".join(lines)
+
+
+async def run_benchmark(scenarios: List[str], total: int, concurrency: int, profile: LLMProfile,
+                        transports: List[str], plan_mode: str = "single", warmup: int = 0,
+                        workers: Sequence[int] = (1,)) -> dict:
+    """
+    Runs every scenario on every transport (uvicorn once per worker count). `warmup`
+    unmeasured requests per scenario absorb one-off costs (lazy imports, schema builds) before measuring.
+    """
+    results = {}
+    if "asgi" in transports:
+        results["asgi"] = await bench_asgi(scenarios, total, concurrency, profile, plan_mode, warmup)
+    if "uvicorn" in transports:
+        for count in workers:
+            key = "uvicorn" if count == 1 else f"uvicorn_x{count}"
+            results[key] = await bench_uvicorn(scenarios, total, concurrency, profile, plan_mode, warmup, count)
+    return {
+        "config": {"scenarios": scenarios, "requests": total, "concurrency": concurrency, "warmup": warmup,
+                   "plan_mode": plan_mode, "workers": list(workers), "profile": profile.to_dict()},
+        "results": results,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the Creative Agent against a simulated LLM.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated: " + ", ".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=100, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=10, help="Unmeasured requests per scenario before measuring")
+    parser.add_argument("--transport", choices=["asgi", "uvicorn", "both"], default="both")
+    parser.add_argument("--plan-mode", choices=["single", "chain"], default="single",
+                        help="Planning mode for /plans requests")
+    parser.add_argument("--latency-median", type=float, default=0.05, help="Simulated LLM median latency (s)")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Lognormal shape; 0 for fixed latency")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--response-chars", type=int, default=0, help="Pad simulated responses to this size")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workers", default="1", help="Comma-separated uvicorn worker counts, e.g. 1,2,4")
+    parser.add_argument("--save", help="Write the report to this JSON file as a baseline")
+    parser.add_argument("--compare", help="Compare against a saved baseline; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    logging.getLogger("creative_agent").setLevel(logging.WARNING)
+    profile = LLMProfile(latency_median=args.latency_median, latency_sigma=args.latency_sigma,
+                         error_rate=args.error_rate, response_chars=args.response_chars, seed=args.seed)
+    transports = ["asgi", "uvicorn"] if args.transport == "both" else [args.transport]
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+
+    workers = [int(w) for w in args.workers.split(",") if w.strip()]
+
+    report = asyncio.run(run_benchmark(scenarios, args.requests, args.concurrency, profile, transports,
+                                       args.plan_mode, args.warmup, workers))
+    print(format_report(report))
+    scaling = format_scaling(report)
+    if scaling:
+        print(scaling)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print("No regressions beyond tolerance.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
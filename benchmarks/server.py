@@ -0,0 +1,79 @@
+# benchmarks/server.py
+
+"""
+Runs the Creative Agent under uvicorn with the simulated LLM installed, for
+`benchmarks.run --transport uvicorn`. Adds two bench-only routes:
+
+- POST /__bench/reset: restart event-loop lag sampling
+- GET  /__bench/stats: loop lag since the last reset and the process's peak RSS
+
+With `--workers N` (N > 1) uvicorn forks N worker processes through the
+`bench_app` factory instead; the bench-only routes are per-process there, so
+they are left out.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+
+import uvicorn
+
+from benchmarks.fake_llm import LLMProfile, install
+from benchmarks.run import LoopLagMonitor, peak_rss_mb
+
+# Worker processes read the simulated LLM profile from here
+PROFILE_ENV = "BENCH_PROFILE"
+
+
+async def serve(port: int, profile: LLMProfile) -> None:
+    install(profile)
+    from app.main import app
+
+    monitor = LoopLagMonitor()
+
+    @app.post("/__bench/reset", include_in_schema=False)
+    async def reset():
+        monitor.samples.clear()
+        return {"status": "ok"}
+
+    @app.get("/__bench/stats", include_in_schema=False)
+    async def stats():
+        return {**monitor.summary(), "peak_rss_mb": peak_rss_mb()}
+
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+    monitor.start()
+    try:
+        await uvicorn.Server(config).serve()
+    finally:
+        await monitor.stop()
+
+
+def bench_app():
+    """
+    App factory for multi-worker runs: each worker process installs the simulated LLM itself.
+    """
+    install(LLMProfile(**json.loads(os.environ.get(PROFILE_ENV, "{}"))))
+    from app.main import app
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--profile", default="{}", help="LLMProfile fields as JSON")
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    logging.getLogger("creative_agent").setLevel(logging.WARNING)
+    if args.workers > 1:
+        os.environ[PROFILE_ENV] = args.profile
+        uvicorn.run("benchmarks.server:bench_app", factory=True, host="127.0.0.1", port=args.port,
+                    workers=args.workers, log_level="warning", access_log=False)
+    else:
+        asyncio.run(serve(args.port, LLMProfile(**json.loads(args.profile))))
+
+
+if __name__ == "__main__":
+    main()